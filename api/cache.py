@@ -0,0 +1,65 @@
+#Cache em memória dos livros por UPC, invalidado pelos avisos do loader
+from database.notifications import dataset_listener
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
+import threading
+
+
+# Quantos livros ficam em cache por processo (LRU)
+BOOK_CACHE_SIZE = 5000
+
+
+class BookCache:
+    """
+    Livros já consultados, por UPC. Só é usado enquanto o listener do dataset
+    está conectado: cada versão publicada pelo loader remove exatamente os UPCs
+    alterados, e sem conexão não há como saber o que mudou.
+    """
+
+    def __init__(self, max_size: int = BOOK_CACHE_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[str, Any]" = OrderedDict()
+        # Incrementada a cada invalidação; leituras do banco anteriores a ela não entram no cache
+        self.generation = 0
+
+    @property
+    def enabled(self) -> bool:
+        return dataset_listener.connected
+
+    def get(self, upc: str) -> Tuple[bool, Any]:
+        """(encontrado, valor); o valor pode ser None (livro inexistente)"""
+        if not self.enabled:
+            return False, None
+        with self._lock:
+            if upc not in self._items:
+                return False, None
+            self._items.move_to_end(upc)
+            return True, self._items[upc]
+
+    def put(self, upc: str, value: Any, generation: int):
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._items[upc] = value
+            self._items.move_to_end(upc)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def on_change(self, version: int, upcs: Optional[List[str]]):
+        """Inscrito no listener: remove os livros alterados (todos, se upcs for None)"""
+        with self._lock:
+            self.generation += 1
+            if upcs is None:
+                self._items.clear()
+            else:
+                for upc in upcs:
+                    self._items.pop(upc, None)
+
+    def stats(self) -> dict:
+        return {'enabled': self.enabled, 'size': len(self._items), 'generation': self.generation}
+
+
+book_cache = BookCache()
@@ -1,21 +1,25 @@
 #Importando bibliotecas 
 from database.connection import get_connection
-from models.livros import Livro_Generico
+from database.currency import currency_rates
+from api.cache import book_cache
+from models.livros import Categoria, Livro_Generico, Livro_Preco
 from typing import Dict, Any
 import psycopg2.extras
 
 
 #Função padrão para retornar todos os livros sem filtros
 def get_generic_livros(limit: int = 25, offset: int = 0) -> Dict[str, Any]:
-    sql = """
+    sql = f"""
         SELECT
             upc_livro,
             titulo,
             categoria,
+            categoria_id,
             valor_principal_em_euros,
-            valor_principal_em_reais,
+            {currency_rates.price_sql('reais', required=False)} AS valor_principal_em_reais,
             review,
-            link
+            link,
+            imagem_sha256
         FROM livros
         ORDER BY titulo
         LIMIT %s OFFSET %s
@@ -40,34 +44,42 @@ def get_generic_livros(limit: int = 25, offset: int = 0) -> Dict[str, Any]:
 
 #Função para buscar um livro específico pelo ID
 def get_livro_by_id(livro_id: str) -> Dict[str, Any]:
-    sql = """
+    sql = f"""
         SELECT
             upc_livro,
             titulo,
             categoria,
+            categoria_id,
             valor_principal_em_euros,
-            valor_principal_em_reais,
+            {currency_rates.price_sql('reais', required=False)} AS valor_principal_em_reais,
             review,
-            link
+            link,
+            imagem_sha256
         FROM livros
         WHERE upc_livro = %s
     """
+    # O preço em reais depende da cotação: entradas calculadas com outra não servem
+    reais_rate = currency_rates.rate('reais')
+    found, cached = book_cache.get(livro_id)
+    if found and cached[0] == reais_rate:
+        return cached[1]
+    
+    generation = book_cache.generation
     conn = get_connection()
     try:
         cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
         cursor.execute(sql, (livro_id,))
         result = cursor.fetchone()
         
-        if result is None:
-            return None
-        
-        livro = Livro_Generico(**dict(result))
-        return livro.model_dump()
+        livro = Livro_Generico(**dict(result)).model_dump() if result is not None else None
+        book_cache.put(livro_id, (reais_rate, livro), generation)
+        return livro
     finally:
         conn.close()
 
 #Função para buscar livros com filtros de título e categoria
-def search_livros(title: str = None, category: str = None, limit: int = 25, offset: int = 0) -> Dict[str, Any]:
+def search_livros(title: str = None, category: str = None, category_id: int = None,
+                  limit: int = 25, offset: int = 0) -> Dict[str, Any]:
     conditions = []
     params = []
     
@@ -75,10 +87,16 @@ def search_livros(title: str = None, category: str = None, limit: int = 25, offs
         conditions.append("titulo ILIKE %s")
         params.append(f"%{title}%")
     
+    # Os dois filtros de categoria viram um range no índice (categoria_id, titulo);
+    # o ILIKE roda só sobre a tabela pequena de categorias
     if category:
-        conditions.append("categoria ILIKE %s")
+        conditions.append("categoria_id IN (SELECT id FROM categorias WHERE nome ILIKE %s)")
         params.append(f"%{category}%")
     
+    if category_id is not None:
+        conditions.append("categoria_id = %s")
+        params.append(category_id)
+    
     where_clause = ""
     if conditions:
         where_clause = "WHERE " + " AND ".join(conditions)
@@ -88,10 +106,12 @@ def search_livros(title: str = None, category: str = None, limit: int = 25, offs
             upc_livro,
             titulo,
             categoria,
+            categoria_id,
             valor_principal_em_euros,
-            valor_principal_em_reais,
+            {currency_rates.price_sql('reais', required=False)} AS valor_principal_em_reais,
             review,
-            link
+            link,
+            imagem_sha256
         FROM livros
         {where_clause}
         ORDER BY titulo
@@ -120,23 +140,29 @@ def search_livros(title: str = None, category: str = None, limit: int = 25, offs
 
 #Função para retornar todas as categorias
 def get_all_categories() -> Dict[str, Any]:
+    # Lista a partir da tabela de categorias; cada contagem é um index-only scan
+    # em livros_categoria_id_idx, sem DISTINCT/ordenação sobre todos os livros
     sql = """
-        SELECT DISTINCT categoria
-        FROM livros
-        WHERE categoria IS NOT NULL AND categoria != ''
-        ORDER BY categoria
+        SELECT c.id, c.nome, n.total_livros
+        FROM categorias c
+        CROSS JOIN LATERAL (
+            SELECT COUNT(*) AS total_livros FROM livros l WHERE l.categoria_id = c.id
+        ) n
+        WHERE n.total_livros > 0
+        ORDER BY c.nome
     """
     conn = get_connection()
     try:
-        cursor = conn.cursor()
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
         cursor.execute(sql)
-        result = cursor.fetchall()
+        rows = cursor.fetchall()
         
-        categories = [row[0] for row in result]
+        details = [Categoria(**dict(row)) for row in rows]
         
         return {
-            "categories": categories,
-            "total_categories": len(categories)
+            "categories": [categoria.nome for categoria in details],
+            "total_categories": len(details),
+            "category_details": [categoria.model_dump() for categoria in details]
         }
     finally:
         conn.close()
@@ -144,15 +170,17 @@ def get_all_categories() -> Dict[str, Any]:
 
 #Função para retornar os livros mais bem avaliados
 def get_top_rated_books(limit: int = 25, offset: int = 0) -> Dict[str, Any]:
-    sql = """
+    sql = f"""
         SELECT
             upc_livro,
             titulo,
             categoria,
+            categoria_id,
             valor_principal_em_euros,
-            valor_principal_em_reais,
+            {currency_rates.price_sql('reais', required=False)} AS valor_principal_em_reais,
             review,
-            link
+            link,
+            imagem_sha256
         FROM livros
         WHERE review IS NOT NULL AND review != ''
         ORDER BY 
@@ -190,16 +218,17 @@ def get_books_by_price_range(min_price: float = None, max_price: float = None, c
     conditions = []
     params = []
     
-    # Determina qual coluna de preço usar
-    price_column = "valor_principal_em_euros" if currency == "euros" else "valor_principal_em_reais"
+    # Os limites são convertidos para euros (e não cada linha para a moeda pedida),
+    # então o filtro e a ordenação usam o índice de valor_principal_em_euros
+    min_euros, max_euros, max_inclusive = currency_rates.euro_bounds(currency, min_price, max_price)
     
-    if min_price is not None:
-        conditions.append(f"{price_column} >= %s")
-        params.append(min_price)
+    if min_euros is not None:
+        conditions.append("valor_principal_em_euros >= %s")
+        params.append(min_euros)
     
-    if max_price is not None:
-        conditions.append(f"{price_column} <= %s")
-        params.append(max_price)
+    if max_euros is not None:
+        conditions.append("valor_principal_em_euros <= %s" if max_inclusive else "valor_principal_em_euros < %s")
+        params.append(max_euros)
     
     where_clause = ""
     if conditions:
@@ -210,13 +239,16 @@ def get_books_by_price_range(min_price: float = None, max_price: float = None, c
             upc_livro,
             titulo,
             categoria,
+            categoria_id,
             valor_principal_em_euros,
-            valor_principal_em_reais,
+            {currency_rates.price_sql('reais', required=False)} AS valor_principal_em_reais,
             review,
-            link
+            link,
+            imagem_sha256,
+            {currency_rates.price_sql(currency)} AS valor_na_moeda
         FROM livros
         {where_clause}
-        ORDER BY {price_column} ASC, titulo ASC
+        ORDER BY valor_principal_em_euros ASC, titulo ASC
         LIMIT %s OFFSET %s
     """
     
@@ -228,7 +260,7 @@ def get_books_by_price_range(min_price: float = None, max_price: float = None, c
         cursor.execute(sql, params)
         rows = cursor.fetchall()
         
-        livros = [Livro_Generico(**dict(row)) for row in rows]
+        livros = [Livro_Preco(**dict(row)) for row in rows]
         
         return {
             "limit": limit,
@@ -0,0 +1,58 @@
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from books_data.imagens import ArmazemImagens, SHA256_VALIDO
+from typing import Optional
+import os
+
+# Router das capas armazenadas pelo loader (público: <img> não envia o token)
+router = APIRouter(prefix="/api/v1/images", tags=["Images"])
+
+# O conteúdo de uma URL nunca muda (o nome é o hash), então o navegador/CDN pode guardar para sempre
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+image_store = ArmazemImagens()
+
+
+def _media_type(path: str) -> str:
+    """Tipo do original pelos primeiros bytes (os arquivos não têm extensão)"""
+    with open(path, 'rb') as f:
+        head = f.read(12)
+    if head.startswith(b'\x89PNG'):
+        return "image/png"
+    if head.startswith(b'GIF8'):
+        return "image/gif"
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return "image/webp"
+    return "image/jpeg"
+
+
+def _serve(request: Request, sha256: str, width: Optional[int] = None):
+    if not SHA256_VALIDO.match(sha256):
+        raise HTTPException(status_code=404, detail="Image not found")
+    if width is not None and width not in image_store.larguras:
+        raise HTTPException(status_code=404, detail=f"Available widths: {list(image_store.larguras)}")
+
+    etag = f'"{sha256}-{width or "original"}"'
+    headers = {"Cache-Control": CACHE_CONTROL, "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    path = image_store.caminho(sha256, width)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    # FileResponse lê o arquivo em blocos (ou usa pathsend, se o servidor ASGI suportar)
+    media_type = "image/jpeg" if width is not None else _media_type(path)
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
+@router.get("/{sha256}")
+def get_image(sha256: str, request: Request):
+    """Capa original, pelo sha256 do conteúdo (campo imagem_sha256 dos livros)"""
+    return _serve(request, sha256)
+
+
+@router.get("/{sha256}/{width}")
+def get_thumbnail(sha256: str, width: int, request: Request):
+    """Miniatura JPEG da capa, numa das larguras geradas pelo loader"""
+    return _serve(request, sha256, width)
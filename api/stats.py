@@ -1,10 +1,23 @@
 #Importando bibliotecas 
 from database.connection import get_connection
-from typing import Dict, Any
+from database.currency import currency_rates
+from typing import Dict, Any, Optional
 import psycopg2.extras
 
 
-def get_overview_stats() -> Dict[str, Any]:
+def _converted(value_euros: Optional[float], rate: Optional[float]) -> Optional[float]:
+    """Média/mínimo/máximo em euros convertido para outra moeda (escala linear, mesma conta)"""
+    if rate is None:
+        return None
+    return round(value_euros * rate, 2) if value_euros else 0.0
+
+
+def get_overview_stats(currency: Optional[str] = None) -> Dict[str, Any]:
+    # Resolve antes de abrir a conexão: moeda desconhecida vira erro 400.
+    # Sem cotação de BRL os campos em reais saem nulos, sem derrubar a resposta
+    reais_rate = currency_rates.rate('reais')
+    code, rate = currency_rates.resolve(currency) if currency else (None, None)
+    
     conn = get_connection()
     try:
         cursor = conn.cursor()
@@ -19,10 +32,8 @@ def get_overview_stats() -> Dict[str, Any]:
         avg_price_result = cursor.fetchone()
         avg_price_euros = round(avg_price_result[0], 2) if avg_price_result[0] else 0.0
         
-        # Preço médio em reais
-        cursor.execute("SELECT AVG(valor_principal_em_reais) FROM livros WHERE valor_principal_em_reais > 0")
-        avg_price_reais_result = cursor.fetchone()
-        avg_price_reais = round(avg_price_reais_result[0], 2) if avg_price_reais_result[0] else 0.0
+        # Preço médio em reais (e na moeda pedida) pela cotação vigente
+        avg_price_reais = _converted(avg_price_result[0], reais_rate)
         
         # Distribuição de ratings
         cursor.execute("""
@@ -55,6 +66,8 @@ def get_overview_stats() -> Dict[str, Any]:
             "total_books": total_books,
             "average_price_euros": avg_price_euros,
             "average_price_reais": avg_price_reais,
+            "currency": code,
+            "average_price": _converted(avg_price_result[0], rate) if code else None,
             "ratings_distribution": ratings_dict,
             "top_categories": top_categories_list
         }
@@ -62,7 +75,10 @@ def get_overview_stats() -> Dict[str, Any]:
         conn.close()
 
 
-def get_category_stats() -> Dict[str, Any]:
+def get_category_stats(currency: Optional[str] = None) -> Dict[str, Any]:
+    reais_rate = currency_rates.rate('reais')
+    code, rate = currency_rates.resolve(currency) if currency else (None, None)
+    
     conn = get_connection()
     try:
         cursor = conn.cursor()
@@ -72,10 +88,7 @@ def get_category_stats() -> Dict[str, Any]:
                 COUNT(*) as total_books,
                 AVG(valor_principal_em_euros) as avg_price_euros,
                 MIN(valor_principal_em_euros) as min_price_euros,
-                MAX(valor_principal_em_euros) as max_price_euros,
-                AVG(valor_principal_em_reais) as avg_price_reais,
-                MIN(valor_principal_em_reais) as min_price_reais,
-                MAX(valor_principal_em_reais) as max_price_reais
+                MAX(valor_principal_em_euros) as max_price_euros
             FROM livros 
             WHERE categoria IS NOT NULL AND categoria != ''
             GROUP BY categoria
@@ -91,14 +104,18 @@ def get_category_stats() -> Dict[str, Any]:
                 "avg_price_euros": round(row[2], 2) if row[2] else 0.0,
                 "min_price_euros": round(row[3], 2) if row[3] else 0.0,
                 "max_price_euros": round(row[4], 2) if row[4] else 0.0,
-                "avg_price_reais": round(row[5], 2) if row[5] else 0.0,
-                "min_price_reais": round(row[6], 2) if row[6] else 0.0,
-                "max_price_reais": round(row[7], 2) if row[7] else 0.0
+                "avg_price_reais": _converted(row[2], reais_rate),
+                "min_price_reais": _converted(row[3], reais_rate),
+                "max_price_reais": _converted(row[4], reais_rate),
+                "avg_price": _converted(row[2], rate) if code else None,
+                "min_price": _converted(row[3], rate) if code else None,
+                "max_price": _converted(row[4], rate) if code else None
             })
         
         return {
             "categories": categories_data,
-            "total_categories": len(categories_data)
+            "total_categories": len(categories_data),
+            "currency": code
         }
     finally:
         conn.close()
\ No newline at end of file
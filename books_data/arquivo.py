@@ -0,0 +1,162 @@
+#Arquivo local das páginas baixadas: registros zstd (um frame por página) num arquivo só de acréscimos
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+import zstandard
+
+# Cabeçalhos HTTP guardados junto com o corpo de cada página
+CABECALHOS_ARQUIVADOS = ('Content-Type', 'ETag', 'Last-Modified', 'Date')
+
+
+class ArquivoPaginas:
+    """
+    Guarda o HTML baixado em `diretorio/paginas.zst`, um arquivo em que só se
+    acrescenta: cada página é um frame zstd independente com uma linha JSON de
+    cabeçalho (url, status, cabeçalhos HTTP, data) seguida do corpo, no estilo
+    de um WARC. O índice (`indice.sqlite`) guarda o offset e o tamanho de cada
+    frame, então qualquer página é lida com um seek e uma descompressão.
+
+    Uma página igual à última versão arquivada da mesma URL não é gravada de novo.
+    Pode ser usado de várias threads (o crawler grava via asyncio.to_thread): a
+    compressão roda em paralelo, com um (des)compressor zstd por thread, e só a
+    escrita no arquivo e no índice é serializada.
+    """
+
+    def __init__(self, diretorio, nivel=9):
+        self.diretorio = diretorio
+        self.nivel = nivel
+        os.makedirs(diretorio, exist_ok=True)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        self.indice = sqlite3.connect(os.path.join(diretorio, 'indice.sqlite'), check_same_thread=False)
+        self.indice.execute("""
+            CREATE TABLE IF NOT EXISTS registros (
+                id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                tamanho INTEGER NOT NULL,
+                tamanho_original INTEGER NOT NULL,
+                status INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                buscado_em TEXT NOT NULL
+            )
+        """)
+        self.indice.execute("CREATE INDEX IF NOT EXISTS idx_registros_url ON registros (url, id)")
+        self.indice.commit()
+
+        self.dados = open(os.path.join(diretorio, 'paginas.zst'), 'a+b')
+        # Um frame gravado pela metade (processo morto antes de indexar) é descartado
+        fim = self.indice.execute("SELECT COALESCE(MAX(offset + tamanho), 0) FROM registros").fetchone()[0]
+        self.dados.truncate(fim)
+
+    def _zstd(self):
+        """(compressor, descompressor) da thread atual: os objetos zstd não são thread-safe"""
+        if not hasattr(self._local, 'compressor'):
+            self._local.compressor = zstandard.ZstdCompressor(level=self.nivel)
+            self._local.descompressor = zstandard.ZstdDecompressor()
+        return self._local.compressor, self._local.descompressor
+
+    def _ultimo_sha256(self, url):
+        ultimo = self.indice.execute(
+            "SELECT sha256 FROM registros WHERE url = ? ORDER BY id DESC LIMIT 1", (url,)
+        ).fetchone()
+        return ultimo[0] if ultimo else None
+
+    def gravar(self, url, conteudo, status=200, cabecalhos=None):
+        """Arquiva o corpo (bytes) de uma resposta; retorna False se igual ao último da URL"""
+        sha256 = hashlib.sha256(conteudo).hexdigest()
+        # A maioria das páginas não muda entre cargas: confere antes de gastar a compressão
+        with self._lock:
+            if self._ultimo_sha256(url) == sha256:
+                return False
+
+        cabecalhos = {nome: cabecalhos[nome] for nome in CABECALHOS_ARQUIVADOS if cabecalhos and nome in cabecalhos}
+        buscado_em = datetime.now(timezone.utc).isoformat()
+        cabecalho = json.dumps({'url': url, 'status': status, 'cabecalhos': cabecalhos, 'buscado_em': buscado_em})
+        frame = self._zstd()[0].compress(cabecalho.encode('utf-8') + b'\n' + conteudo)
+
+        with self._lock:
+            # Outra thread pode ter arquivado a mesma página durante a compressão
+            if self._ultimo_sha256(url) == sha256:
+                return False
+
+            self.dados.seek(0, os.SEEK_END)
+            offset = self.dados.tell()
+            self.dados.write(frame)
+            self.dados.flush()
+            self.indice.execute(
+                "INSERT INTO registros (url, offset, tamanho, tamanho_original, status, sha256, buscado_em) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, offset, len(frame), len(conteudo), status, sha256, buscado_em),
+            )
+            self.indice.commit()
+        return True
+
+    def _ler_frame(self, offset, tamanho):
+        with self._lock:
+            self.dados.seek(offset)
+            frame = self.dados.read(tamanho)
+        cabecalho, conteudo = self._zstd()[1].decompress(frame).split(b'\n', 1)
+        return json.loads(cabecalho), conteudo
+
+    def ler(self, url):
+        """(cabeçalho, corpo) da versão mais recente da URL; None se não arquivada"""
+        with self._lock:
+            linha = self.indice.execute(
+                "SELECT offset, tamanho FROM registros WHERE url = ? ORDER BY id DESC LIMIT 1", (url,)
+            ).fetchone()
+        return self._ler_frame(*linha) if linha else None
+
+    def registros(self):
+        """Gera (cabeçalho, corpo) da versão mais recente de cada URL, na ordem do arquivo"""
+        linhas = self.indice.execute("""
+            SELECT offset, tamanho FROM registros
+            WHERE id IN (SELECT MAX(id) FROM registros GROUP BY url)
+            ORDER BY offset
+        """).fetchall()
+        for offset, tamanho in linhas:
+            yield self._ler_frame(offset, tamanho)
+
+    def resumo(self):
+        urls, registros, comprimido, original = self.indice.execute(
+            "SELECT COUNT(DISTINCT url), COUNT(*), COALESCE(SUM(tamanho), 0), COALESCE(SUM(tamanho_original), 0) "
+            "FROM registros"
+        ).fetchone()
+        return {
+            'urls': urls,
+            'registros': registros,
+            'bytes_comprimidos': comprimido,
+            'bytes_originais': original,
+            'taxa_compressao': round(original / comprimido, 1) if comprimido else None,
+        }
+
+    def fechar(self):
+        self.dados.close()
+        self.indice.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description='Consulta um arquivo de páginas do loader')
+    parser.add_argument('diretorio')
+    parser.add_argument('--url', help='Escreve o HTML arquivado desta URL na saída padrão')
+    args = parser.parse_args()
+
+    arquivo = ArquivoPaginas(args.diretorio)
+    try:
+        if args.url:
+            registro = arquivo.ler(args.url)
+            if registro is None:
+                sys.exit(f'{args.url} não está no arquivo')
+            sys.stdout.buffer.write(registro[1])
+        else:
+            print(json.dumps(arquivo.resumo(), indent=2))
+    finally:
+        arquivo.fechar()
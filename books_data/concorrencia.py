@@ -0,0 +1,132 @@
+#Controle de concorrência das buscas: limite fixo ou adaptativo (AIMD)
+import asyncio
+import time
+
+from handsome_log import get_logger
+
+logger = get_logger(__name__)
+
+
+def _percentil(ordenados, fracao):
+    return ordenados[min(len(ordenados) - 1, int(fracao * len(ordenados)))]
+
+
+class ControleConcorrencia:
+    """
+    Limita as requisições em voo. Com minimo < maximo o limite é ajustado a cada
+    janela no estilo AIMD, a partir das latências e dos erros observados:
+
+    - 429, ou taxa de erros (rede/5xx) acima de `taxa_erros_maxima`: limite * fator_erro
+    - p95 da latência acima do alvo: limite * fator_latencia
+    - caso contrário, se o limite chegou a segurar requisições: limite + 1
+
+    Sem `latencia_alvo`, o alvo é `fator_base` vezes o menor p50 já observado.
+    """
+
+    janela = 1.0
+    amostras_minimas = 8
+    taxa_erros_maxima = 0.05
+    fator_erro = 0.5
+    fator_latencia = 0.8
+    fator_base = 3.0
+
+    def __init__(self, inicial, minimo=None, maximo=None, latencia_alvo=None):
+        self.minimo = minimo or inicial
+        self.maximo = maximo or inicial
+        self.limite = max(self.minimo, min(self.maximo, inicial))
+        self.latencia_alvo = latencia_alvo
+        self.adaptativo = self.minimo < self.maximo
+
+        self.em_voo = 0
+        self._condicao = asyncio.Condition()
+        self._inicio = time.monotonic()
+        self._base_p50 = None
+        self.historico = []
+        # Referências das tarefas de aviso em andamento (o loop só guarda referências fracas)
+        self._tarefas = set()
+        self._nova_janela()
+
+    def _nova_janela(self):
+        self._inicio_janela = time.monotonic()
+        self._latencias = []
+        self._erros = 0
+        self._limitados = 0
+        self._saturado = False
+
+    async def __aenter__(self):
+        async with self._condicao:
+            if self.em_voo >= self.limite:
+                self._saturado = True
+            await self._condicao.wait_for(lambda: self.em_voo < self.limite)
+            self.em_voo += 1
+            if self.em_voo >= self.limite:
+                self._saturado = True
+
+    async def __aexit__(self, *exc):
+        async with self._condicao:
+            self.em_voo -= 1
+            self._condicao.notify_all()
+
+    def registrar(self, latencia, status=None):
+        """Registra uma tentativa: status HTTP, ou None se falhou na rede"""
+        if status == 429:
+            self._limitados += 1
+        elif status is None or status >= 500:
+            self._erros += 1
+        else:
+            self._latencias.append(latencia)
+
+        total = len(self._latencias) + self._erros + self._limitados
+        if self.adaptativo and time.monotonic() - self._inicio_janela >= self.janela and total >= self.amostras_minimas:
+            self._ajustar(total)
+
+    def _ajustar(self, total):
+        latencias = sorted(self._latencias)
+        p50 = _percentil(latencias, 0.5) if latencias else None
+        p95 = _percentil(latencias, 0.95) if latencias else None
+        if p50 is not None:
+            self._base_p50 = p50 if self._base_p50 is None else min(self._base_p50, p50)
+        alvo = self.latencia_alvo or (self._base_p50 * self.fator_base if self._base_p50 else None)
+        taxa_erros = self._erros / total
+
+        anterior = self.limite
+        if self._limitados or taxa_erros > self.taxa_erros_maxima:
+            motivo = '429' if self._limitados else 'erros'
+            self.limite = max(self.minimo, int(self.limite * self.fator_erro))
+        elif alvo is not None and p95 is not None and p95 > alvo:
+            motivo = 'latência'
+            self.limite = max(self.minimo, int(self.limite * self.fator_latencia))
+        elif self._saturado:
+            motivo = 'aumento'
+            self.limite = min(self.maximo, self.limite + 1)
+        else:
+            motivo = 'estável'
+
+        self.historico.append({
+            'segundos': round(time.monotonic() - self._inicio, 2),
+            'limite': self.limite,
+            'p50': round(p50, 4) if p50 is not None else None,
+            'p95': round(p95, 4) if p95 is not None else None,
+            'taxa_erros': round(taxa_erros, 3),
+            'respostas_429': self._limitados,
+            'motivo': motivo,
+        })
+        if self.limite != anterior:
+            p95_txt = f'{p95 * 1000:.0f}ms' if p95 is not None else '-'
+            logger.info(f'Concorrência {anterior} -> {self.limite} ({motivo}; p95 {p95_txt}, '
+                        f'erros {taxa_erros:.0%}, 429: {self._limitados})')
+
+        if self.limite > anterior:
+            # Acorda quem estava esperando por uma vaga
+            tarefa = asyncio.get_running_loop().create_task(self._notificar())
+            self._tarefas.add(tarefa)
+            tarefa.add_done_callback(self._tarefas.discard)
+        self._nova_janela()
+
+    async def _notificar(self):
+        async with self._condicao:
+            self._condicao.notify_all()
+
+    def resumo(self):
+        limites = [registro['limite'] for registro in self.historico] or [self.limite]
+        return {'final': self.limite, 'minimo': min(limites), 'maximo': max(limites), 'janelas': len(self.historico)}
@@ -0,0 +1,51 @@
+#Cotações usadas pela API para mostrar os preços (guardados em euros) em outras moedas
+from datetime import date
+
+
+def listar_cotacoes(cur):
+    """Todas as cotações cadastradas, marcando a vigente de cada moeda"""
+    cur.execute("""
+        SELECT moeda, vigente_desde, por_euro,
+               vigente_desde = MAX(vigente_desde) FILTER (WHERE vigente_desde <= CURRENT_DATE)
+                               OVER (PARTITION BY moeda) AS vigente
+        FROM cotacoes
+        ORDER BY moeda, vigente_desde
+    """)
+    return cur.fetchall()
+
+
+def definir_cotacao(cur, moeda, por_euro, vigente_desde=None):
+    """Cadastra (ou corrige) quantas unidades de `moeda` valem 1 euro a partir de uma data"""
+    cur.execute("""
+        INSERT INTO cotacoes (moeda, vigente_desde, por_euro)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (moeda, vigente_desde) DO UPDATE SET por_euro = EXCLUDED.por_euro
+    """, (moeda.upper(), vigente_desde or date.today(), por_euro))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from books_data.loader_data import conectar, criar_tabela
+
+    parser = argparse.ArgumentParser(
+        description='Lista ou cadastra cotações (a API usa a nova cotação em até 60 s)')
+    parser.add_argument('--moeda', help='Código ISO da moeda, ex.: BRL, USD')
+    parser.add_argument('--por-euro', type=float, help='Quantas unidades da moeda valem 1 euro')
+    parser.add_argument('--desde', type=date.fromisoformat, default=None,
+                        help='Data de início da vigência (AAAA-MM-DD); padrão: hoje')
+    args = parser.parse_args()
+
+    if (args.moeda is None) != (args.por_euro is None):
+        parser.error('--moeda e --por-euro devem ser usados juntos')
+
+    con = conectar()
+    try:
+        with con.cursor() as cur:
+            criar_tabela(cur)
+            if args.moeda is not None:
+                definir_cotacao(cur, args.moeda, args.por_euro, args.desde)
+            for moeda, desde, por_euro, vigente in listar_cotacoes(cur):
+                print(f"{moeda:<5} {desde}  {por_euro:>12}{'  (vigente)' if vigente else ''}")
+    finally:
+        con.close()
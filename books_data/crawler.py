@@ -0,0 +1,159 @@
+#Crawler assíncrono (httpx) para o Books to Scrape
+import asyncio
+import random
+import time
+
+import httpx
+from handsome_log import get_logger
+
+from books_data.concorrencia import ControleConcorrencia
+from books_data.parsers import extrair_listagem, extrair_atributos_livro
+
+logger = get_logger(__name__)
+
+
+# Status que valem nova tentativa (sobrecarga/erros temporários do servidor)
+STATUS_PARA_REPETIR = {429, 500, 502, 503, 504}
+
+
+def urls_de_listagem(url_inicial, total):
+    """URLs das páginas de listagem 2..total a partir da página inicial do site"""
+    return [str(httpx.URL(url_inicial).join(f'catalogue/page-{pagina}.html')) for pagina in range(2, total + 1)]
+
+
+class AsyncCrawler:
+    """
+    Busca páginas com um único httpx.AsyncClient (conexões keep-alive reaproveitadas
+    por host), limitando as requisições simultâneas e repetindo falhas temporárias
+    com backoff exponencial. Com `concorrencia_minima`/`concorrencia_maxima` o
+    limite se ajusta sozinho (ver ControleConcorrencia).
+    """
+
+    def __init__(self, concorrencia=16, timeout=15.0, tentativas=3, backoff=0.5, arquivo=None,
+                 concorrencia_minima=None, concorrencia_maxima=None, latencia_alvo=None, metricas=None,
+                 espera_maxima=60.0):
+        if tentativas < 1:
+            raise ValueError(f'tentativas deve ser pelo menos 1 (recebido: {tentativas})')
+        self.concorrencia = concorrencia
+        self.concorrencia_minima = concorrencia_minima
+        # Teto de requisições em voo; o pipeline cria uma tarefa de busca para cada
+        self.concorrencia_maxima = concorrencia_maxima or concorrencia
+        self.latencia_alvo = latencia_alvo
+        # ArquivoPaginas opcional: toda página baixada com sucesso é arquivada
+        self.arquivo = arquivo
+        # MetricasCarga opcional: latência, status e bytes de cada tentativa
+        self.metricas = metricas
+        self.timeout = timeout
+        self.tentativas = tentativas
+        self.backoff = backoff
+        # Teto de cada espera entre tentativas, inclusive a pedida pelo Retry-After
+        self.espera_maxima = espera_maxima
+        self.client = None
+        self.controle = None
+
+    async def __aenter__(self):
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=self.concorrencia_maxima,
+                                max_keepalive_connections=self.concorrencia_maxima),
+            timeout=httpx.Timeout(self.timeout),
+            follow_redirects=True,
+        )
+        self.controle = ControleConcorrencia(
+            self.concorrencia, self.concorrencia_minima, self.concorrencia_maxima, self.latencia_alvo
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.client.aclose()
+
+    def _espera(self, tentativa, resposta=None):
+        """
+        Backoff exponencial com jitter; respeita Retry-After quando o servidor manda,
+        até espera_maxima (um Retry-After de horas não pode travar a carga)
+        """
+        if resposta is not None and resposta.headers.get('Retry-After', '').isdigit():
+            espera = float(resposta.headers['Retry-After'])
+        else:
+            espera = self.backoff * (2 ** tentativa) * (0.5 + random.random())
+        return min(espera, self.espera_maxima)
+
+    def _registrar(self, duracao, resposta=None):
+        status = resposta.status_code if resposta is not None else None
+        self.controle.registrar(duracao, status)
+        if self.metricas is not None:
+            self.metricas.registrar_busca(duracao, status, len(resposta.content) if resposta is not None else 0)
+
+    async def buscar_resposta(self, url, cabecalhos=None):
+        """GET com limite de concorrência e novas tentativas; retorna a resposta (inclusive 304)"""
+        for tentativa in range(self.tentativas):
+            ultima = tentativa == self.tentativas - 1
+            try:
+                async with self.controle:
+                    inicio = time.perf_counter()
+                    try:
+                        resposta = await self.client.get(url, headers=cabecalhos)
+                    except httpx.TransportError:
+                        self._registrar(time.perf_counter() - inicio)
+                        raise
+                    self._registrar(time.perf_counter() - inicio, resposta)
+            except httpx.TransportError as e:
+                if ultima:
+                    raise
+                logger.warning(f'Erro de rede em {url} ({e!r}), tentando novamente')
+                await asyncio.sleep(self._espera(tentativa))
+                continue
+
+            if resposta.status_code in STATUS_PARA_REPETIR and not ultima:
+                logger.warning(f'Status {resposta.status_code} em {url}, tentando novamente')
+                await asyncio.sleep(self._espera(tentativa, resposta))
+                continue
+
+            # 304 é a resposta esperada de uma requisição condicional, não um erro
+            if resposta.status_code != 304:
+                resposta.raise_for_status()
+            if self.arquivo is not None and resposta.status_code == 200:
+                # Hash, compressão e escrita em disco fora do event loop
+                await asyncio.to_thread(self.arquivo.gravar, url, resposta.content, resposta.status_code,
+                                        resposta.headers)
+            return resposta
+
+    async def buscar(self, url):
+        """GET que retorna o HTML decodificado"""
+        resposta = await self.buscar_resposta(url)
+        # O site não informa o charset; o conteúdo é UTF-8
+        return resposta.content.decode('utf-8')
+
+    async def coletar_listagens(self, url_inicial):
+        """
+        Busca todas as páginas de listagem. A primeira informa o total de páginas
+        ('Page 1 of 50'), e as demais são buscadas em paralelo.
+        """
+        html = await self.buscar(url_inicial)
+        listagens = [extrair_listagem(html, url_inicial)]
+        logger.success(f'Requisição bem-sucedida para {url_inicial}')
+
+        total = listagens[0].total_paginas
+        if total and total > 1:
+            urls = urls_de_listagem(url_inicial, total)
+            paginas = await asyncio.gather(*(self.buscar(url) for url in urls))
+            listagens.extend(extrair_listagem(html, url) for url, html in zip(urls, paginas))
+            logger.success(f'{total} páginas de listagem processadas')
+        return listagens
+
+    async def coletar_links(self, url_inicial):
+        """Coleta os links de todos os livros, sem duplicados"""
+        listagens = await self.coletar_listagens(url_inicial)
+        # Remove duplicados mantendo a ordem
+        return list(dict.fromkeys(link for listagem in listagens for link in listagem.links))
+
+    async def coletar_livros(self, links):
+        """Busca e extrai os livros concorrentemente; gera (link, livro, erro) à medida que terminam"""
+        async def coletar(link):
+            try:
+                html = await self.buscar(link)
+                return link, extrair_atributos_livro(html, link), None
+            except Exception as e:
+                return link, None, e
+
+        for tarefa in asyncio.as_completed([coletar(link) for link in links]):
+            yield await tarefa
@@ -0,0 +1,198 @@
+#Fronteira persistente (SQLite) da carga: URLs descobertas, em andamento, concluídas e com falha
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from books_data.incremental import LOADER_CACHE_DIR
+
+ESTADOS = ('descoberto', 'em_andamento', 'concluido', 'falhou')
+
+
+class Fronteira:
+    """
+    Fila de trabalho da carga gravada em disco. Cada URL entra uma única vez
+    (deduplicação pela chave primária) e passa por descoberto -> em_andamento ->
+    concluido/falhou. Se o processo morrer, a próxima execução continua de onde
+    parou: o que estava em andamento volta a ficar disponível quando o prazo da
+    reivindicação expira. Vários processos podem usar o mesmo arquivo ao mesmo
+    tempo; cada reivindicação é atômica, então nenhum pega o trabalho do outro.
+    """
+
+    def __init__(self, caminho=None, prazo_reivindicacao=600.0):
+        self.caminho = caminho or os.path.join(LOADER_CACHE_DIR, 'fronteira.sqlite')
+        os.makedirs(os.path.dirname(self.caminho) or '.', exist_ok=True)
+        self.prazo_reivindicacao = prazo_reivindicacao
+        self.dono = f'{socket.gethostname()}:{os.getpid()}'
+        self._lock = threading.Lock()
+
+        # isolation_level=None: transações explícitas (BEGIN IMMEDIATE) nas reivindicações
+        self.con = sqlite3.connect(self.caminho, timeout=30, isolation_level=None, check_same_thread=False)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS fronteira (
+                url TEXT PRIMARY KEY,
+                tipo TEXT NOT NULL,
+                estado TEXT NOT NULL DEFAULT 'descoberto',
+                tentativas INTEGER NOT NULL DEFAULT 0,
+                dono TEXT,
+                reivindicado_em REAL,
+                erro TEXT,
+                atualizado_em REAL NOT NULL
+            )
+        """)
+        self.con.execute("CREATE INDEX IF NOT EXISTS idx_fronteira_estado ON fronteira (estado, tipo)")
+
+    def adicionar(self, urls, tipo):
+        """Registra URLs descobertas; as já conhecidas são ignoradas. Retorna quantas eram novas"""
+        agora = time.time()
+        with self._lock:
+            antes = self.con.total_changes
+            self.con.executemany(
+                "INSERT OR IGNORE INTO fronteira (url, tipo, atualizado_em) VALUES (?, ?, ?)",
+                [(url, tipo, agora) for url in urls],
+            )
+            return self.con.total_changes - antes
+
+    def iniciar(self, url_inicial):
+        """
+        Registra a página inicial da varredura. Se a varredura anterior já terminou
+        (página inicial concluída e nada descoberto ou em andamento), a fronteira é
+        zerada e começa uma nova; retorna True nesse caso. A verificação e a limpeza
+        são uma transação só, então processos iniciados juntos entram na mesma varredura.
+        """
+        with self._lock:
+            self.con.execute("BEGIN IMMEDIATE")
+            try:
+                terminada = self.con.execute("""
+                    SELECT EXISTS (SELECT 1 FROM fronteira WHERE url = ? AND estado = 'concluido')
+                       AND NOT EXISTS (SELECT 1 FROM fronteira WHERE estado IN ('descoberto', 'em_andamento'))
+                """, (url_inicial,)).fetchone()[0] == 1
+                if terminada:
+                    self.con.execute("DELETE FROM fronteira")
+                self.con.execute(
+                    "INSERT OR IGNORE INTO fronteira (url, tipo, atualizado_em) VALUES (?, 'listagem', ?)",
+                    (url_inicial, time.time()),
+                )
+                self.con.execute("COMMIT")
+            except Exception:
+                self.con.execute("ROLLBACK")
+                raise
+        return terminada
+
+    def sincronizar(self, urls, tipo):
+        """
+        Faz de `urls` a fila de trabalho (ex.: os livros com detalhes pendentes no
+        banco): as novas entram, as já concluídas ou com falha voltam a ficar
+        disponíveis e as que saíram da lista são removidas. O que está em andamento
+        em outro processo não muda. Retorna quantas URLs ficaram disponíveis.
+        """
+        agora = time.time()
+        with self._lock:
+            self.con.execute("BEGIN IMMEDIATE")
+            try:
+                self.con.execute("CREATE TEMP TABLE IF NOT EXISTS sincronizar (url TEXT PRIMARY KEY)")
+                self.con.execute("DELETE FROM sincronizar")
+                self.con.executemany("INSERT OR IGNORE INTO sincronizar (url) VALUES (?)", [(url,) for url in urls])
+                self.con.execute("""
+                    DELETE FROM fronteira
+                    WHERE estado != 'em_andamento' AND url NOT IN (SELECT url FROM sincronizar)
+                """)
+                self.con.execute("""
+                    UPDATE fronteira SET estado = 'descoberto', dono = NULL, atualizado_em = ?
+                    WHERE estado IN ('concluido', 'falhou') AND url IN (SELECT url FROM sincronizar)
+                """, (agora,))
+                self.con.execute(
+                    "INSERT OR IGNORE INTO fronteira (url, tipo, atualizado_em) SELECT url, ?, ? FROM sincronizar",
+                    (tipo, agora),
+                )
+                disponiveis = self.con.execute(
+                    "SELECT COUNT(*) FROM fronteira WHERE estado = 'descoberto'"
+                ).fetchone()[0]
+                self.con.execute("COMMIT")
+            except Exception:
+                self.con.execute("ROLLBACK")
+                raise
+        return disponiveis
+
+    def reivindicar(self, quantidade):
+        """
+        Marca até `quantidade` URLs como em andamento por este processo e as retorna
+        como (url, tipo). Páginas de listagem vêm primeiro, pois descobrem os livros.
+        """
+        agora = time.time()
+        with self._lock:
+            self.con.execute("BEGIN IMMEDIATE")
+            try:
+                linhas = self.con.execute("""
+                    UPDATE fronteira
+                    SET estado = 'em_andamento', dono = ?, reivindicado_em = ?,
+                        tentativas = tentativas + 1, atualizado_em = ?
+                    WHERE url IN (
+                        SELECT url FROM fronteira
+                        WHERE estado = 'descoberto'
+                           OR (estado = 'em_andamento' AND reivindicado_em < ?)
+                        ORDER BY tipo = 'livro', rowid
+                        LIMIT ?
+                    )
+                    RETURNING url, tipo
+                """, (self.dono, agora, agora, agora - self.prazo_reivindicacao, quantidade)).fetchall()
+                self.con.execute("COMMIT")
+            except Exception:
+                self.con.execute("ROLLBACK")
+                raise
+        return linhas
+
+    def concluir(self, urls):
+        with self._lock:
+            self.con.executemany(
+                "UPDATE fronteira SET estado = 'concluido', erro = NULL, atualizado_em = ? WHERE url = ?",
+                [(time.time(), url) for url in urls],
+            )
+
+    def falhar(self, url, erro):
+        with self._lock:
+            self.con.execute(
+                "UPDATE fronteira SET estado = 'falhou', erro = ?, atualizado_em = ? WHERE url = ?",
+                (repr(erro), time.time(), url),
+            )
+
+    def liberar(self):
+        """Devolve para a fila o que este processo reivindicou e não concluiu"""
+        with self._lock:
+            return self.con.execute(
+                "UPDATE fronteira SET estado = 'descoberto', dono = NULL, atualizado_em = ? "
+                "WHERE estado = 'em_andamento' AND dono = ?",
+                (time.time(), self.dono),
+            ).rowcount
+
+    def repetir_falhas(self):
+        """Devolve as URLs com falha para a fila; retorna quantas"""
+        with self._lock:
+            return self.con.execute(
+                "UPDATE fronteira SET estado = 'descoberto', atualizado_em = ? WHERE estado = 'falhou'",
+                (time.time(),),
+            ).rowcount
+
+    def tem_trabalho_de_outros(self):
+        """Há URLs ainda não reivindicadas ou em andamento em outros processos"""
+        with self._lock:
+            return self.con.execute("""
+                SELECT EXISTS (
+                    SELECT 1 FROM fronteira
+                    WHERE estado = 'descoberto' OR (estado = 'em_andamento' AND dono != ?)
+                )
+            """, (self.dono,)).fetchone()[0] == 1
+
+    def contagem(self):
+        with self._lock:
+            linhas = self.con.execute("SELECT estado, COUNT(*) FROM fronteira GROUP BY estado").fetchall()
+        return {estado: 0 for estado in ESTADOS} | dict(linhas)
+
+    def limpar(self):
+        with self._lock:
+            self.con.execute("DELETE FROM fronteira")
+
+    def fechar(self):
+        self.con.close()
@@ -0,0 +1,90 @@
+#Armazém local das capas: arquivos endereçados pelo sha256 do conteúdo, com miniaturas pré-geradas
+import hashlib
+import io
+import os
+import re
+import tempfile
+
+IMAGES_DIR = os.getenv('IMAGES_DIR', '.images')
+
+# Larguras (px) das miniaturas geradas para cada capa
+LARGURAS_MINIATURA = (64, 150, 300)
+
+SHA256_VALIDO = re.compile(r'^[0-9a-f]{64}$')
+
+
+class ArmazemImagens:
+    """
+    Guarda cada imagem uma única vez, em `diretorio/original/ab/<sha256>`, e as
+    miniaturas JPEG em `diretorio/<largura>/ab/<sha256>.jpg`. Como o nome é o hash
+    do conteúdo, um arquivo nunca muda depois de gravado: capas iguais de livros
+    diferentes viram um arquivo só, e quem serve pode cachear para sempre.
+    """
+
+    def __init__(self, diretorio=IMAGES_DIR, larguras=LARGURAS_MINIATURA):
+        self.diretorio = diretorio
+        self.larguras = tuple(larguras)
+
+    def caminho(self, sha256, largura=None):
+        """Caminho do original (largura None) ou da miniatura; não verifica se existe"""
+        pasta = 'original' if largura is None else str(largura)
+        nome = sha256 if largura is None else f'{sha256}.jpg'
+        return os.path.join(self.diretorio, pasta, sha256[:2], nome)
+
+    def existe(self, sha256):
+        return os.path.exists(self.caminho(sha256))
+
+    def _gravar_arquivo(self, caminho, conteudo):
+        # Grava num temporário e renomeia: quem lê nunca vê um arquivo pela metade
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho), suffix='.tmp')
+        try:
+            with os.fdopen(descritor, 'wb') as f:
+                f.write(conteudo)
+            os.replace(temporario, caminho)
+        except BaseException:
+            os.unlink(temporario)
+            raise
+
+    def _miniaturas(self, conteudo):
+        from PIL import Image
+
+        with Image.open(io.BytesIO(conteudo)) as imagem:
+            imagem = imagem.convert('RGB')
+            for largura in self.larguras:
+                copia = imagem.copy()
+                # thumbnail mantém a proporção e nunca amplia
+                copia.thumbnail((largura, largura * 4), Image.LANCZOS)
+                saida = io.BytesIO()
+                copia.save(saida, 'JPEG', quality=85, optimize=True, progressive=True)
+                yield largura, saida.getvalue()
+
+    def gravar(self, conteudo):
+        """Arquiva uma imagem (bytes) e gera as miniaturas; retorna (sha256, nova)"""
+        sha256 = hashlib.sha256(conteudo).hexdigest()
+        if self.existe(sha256) and all(os.path.exists(self.caminho(sha256, largura)) for largura in self.larguras):
+            return sha256, False
+
+        for largura, miniatura in self._miniaturas(conteudo):
+            self._gravar_arquivo(self.caminho(sha256, largura), miniatura)
+        # O original por último: se ele existe, as miniaturas também
+        self._gravar_arquivo(self.caminho(sha256), conteudo)
+        return sha256, True
+
+    def resumo(self):
+        originais = os.path.join(self.diretorio, 'original')
+        arquivos = [os.path.join(raiz, nome) for raiz, _, nomes in os.walk(originais) for nome in nomes
+                    if not nome.endswith('.tmp')]
+        return {'imagens': len(arquivos), 'bytes': sum(os.path.getsize(arquivo) for arquivo in arquivos),
+                'larguras': list(self.larguras)}
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='Resumo do armazém de imagens do loader')
+    parser.add_argument('diretorio', nargs='?', default=IMAGES_DIR)
+    args = parser.parse_args()
+
+    print(json.dumps(ArmazemImagens(args.diretorio).resumo(), indent=2))
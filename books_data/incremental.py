@@ -0,0 +1,104 @@
+#Cache local (SQLite) para a carga incremental: validadores HTTP e hashes de conteúdo por URL
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+LOADER_CACHE_DIR = os.getenv('LOADER_CACHE_DIR', '.loader_cache')
+
+
+def hash_html(html):
+    return hashlib.sha256(html.encode('utf-8')).hexdigest()
+
+
+def hash_livro(livro):
+    """Hash dos campos extraídos; independe da ordem das chaves"""
+    return hashlib.sha256(json.dumps(livro, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class CacheIncremental:
+    """
+    Guarda, por URL, o ETag/Last-Modified da última resposta e os hashes do HTML e
+    dos campos extraídos. Com isso a carga manda requisições condicionais, não
+    reprocessa HTML idêntico e não regrava livros cujos campos não mudaram.
+
+    O cache só descreve o que foi gravado no banco de destino em que foi
+    preenchido: `vincular` o associa a esse banco e o descarta se o destino mudar.
+    """
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho or os.path.join(LOADER_CACHE_DIR, 'incremental.sqlite')
+        os.makedirs(os.path.dirname(self.caminho) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        # Usado pelo loop asyncio e pela thread do escritor
+        self.con = sqlite3.connect(self.caminho, check_same_thread=False)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS paginas (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                hash_html TEXT,
+                hash_livro TEXT,
+                atualizado_em TEXT NOT NULL
+            )
+        """)
+        self.con.execute("CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor TEXT NOT NULL)")
+        self.con.commit()
+
+    def vincular(self, alvo):
+        """
+        Associa o cache ao destino `alvo` (identificador do banco e da tabela). Se
+        ele foi preenchido contra outro destino, os registros não valem para este
+        e são descartados; retorna True nesse caso.
+        """
+        with self._lock:
+            linha = self.con.execute("SELECT valor FROM meta WHERE chave = 'alvo'").fetchone()
+            descartado = linha is not None and linha[0] != alvo
+            if descartado:
+                self.con.execute("DELETE FROM paginas")
+            self.con.execute(
+                "INSERT INTO meta (chave, valor) VALUES ('alvo', ?) "
+                "ON CONFLICT (chave) DO UPDATE SET valor = excluded.valor",
+                (alvo,),
+            )
+            self.con.commit()
+        return descartado
+
+    def obter(self, url):
+        with self._lock:
+            linha = self.con.execute(
+                "SELECT etag, last_modified, hash_html, hash_livro FROM paginas WHERE url = ?", (url,)
+            ).fetchone()
+        if linha is None:
+            return None
+        return dict(zip(('etag', 'last_modified', 'hash_html', 'hash_livro'), linha))
+
+    def cabecalhos_condicionais(self, registro):
+        cabecalhos = {}
+        if registro and registro['etag']:
+            cabecalhos['If-None-Match'] = registro['etag']
+        if registro and registro['last_modified']:
+            cabecalhos['If-Modified-Since'] = registro['last_modified']
+        return cabecalhos
+
+    def registrar(self, registros):
+        """Grava uma lista de (url, etag, last_modified, hash_html, hash_livro)"""
+        agora = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            self.con.executemany("""
+                INSERT INTO paginas (url, etag, last_modified, hash_html, hash_livro, atualizado_em)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (url) DO UPDATE SET
+                    etag = excluded.etag,
+                    last_modified = excluded.last_modified,
+                    hash_html = excluded.hash_html,
+                    hash_livro = excluded.hash_livro,
+                    atualizado_em = excluded.atualizado_em
+            """, [(*registro, agora) for registro in registros])
+            self.con.commit()
+
+    def fechar(self):
+        self.con.close()
@@ -1,11 +1,16 @@
-#importando bibliotecas
+#importando bibliotecas 
 import requests
-from bs4 import BeautifulSoup
-import re
 import time
+import asyncio
+import argparse
+import csv
+import subprocess
+import sys
+from datetime import datetime, timezone
 from urllib.parse import urljoin
 
 import psycopg2
+from psycopg2.extras import execute_values
 from dotenv import load_dotenv
 import os
 
@@ -13,6 +18,16 @@ load_dotenv()
 
 from handsome_log import get_logger
 
+from books_data.parsers import extrair_listagem, extrair_atributos_livro, definir_backend, backends_disponiveis, backend_atual
+from books_data.crawler import AsyncCrawler
+from books_data.writer import EscritorLivros, gravar_resumos, gravar_categorias, registrar_versao
+from books_data.pipeline import PipelineCarga
+from books_data.incremental import CacheIncremental, LOADER_CACHE_DIR
+from books_data.fronteira import Fronteira
+from books_data.arquivo import ArquivoPaginas
+from books_data.imagens import ArmazemImagens, IMAGES_DIR
+from books_data.metricas import MetricasCarga, gravar_relatorio
+
 logger = get_logger(__name__)
 
 
@@ -23,45 +38,150 @@ PG_USER = os.getenv('POSTGRES_USER')
 PG_PASSWORD = os.getenv('POSTGRES_PASSWORD')
 PG_DB = os.getenv('POSTGRES_DATABASE')
 
-con = psycopg2.connect(
-    host=PG_HOST,
-    port=PG_PORT,
-    user=PG_USER,
-    password=PG_PASSWORD,
-    dbname=PG_DB
-)
-con.autocommit = True
-cur = con.cursor()
-
-cur.execute("""
-CREATE TABLE IF NOT EXISTS livros(
-    upc_livro TEXT PRIMARY KEY,
-    titulo TEXT,
-    imagem TEXT,
-    categoria TEXT,
-    valor_principal_em_euros DOUBLE PRECISION,
-    valor_principal_em_reais DOUBLE PRECISION,
-    inventario INTEGER,
-    review TEXT,
-    sinopse TEXT,    
-    num_reviews INTEGER,
-    link TEXT
+# Incremento de nice do enriquecimento (--enriquecer), que roda em segundo plano
+PRIORIDADE_ENRIQUECIMENTO = int(os.getenv('LOADER_NICE_ENRIQUECIMENTO', '10'))
+
+
+def conectar(autocommit=True):
+    con = psycopg2.connect(
+        host=PG_HOST,
+        port=PG_PORT,
+        user=PG_USER,
+        password=PG_PASSWORD,
+        dbname=PG_DB
     )
-""")
+    con.autocommit = autocommit
+    return con
+
+
+def _colunas_e_indices(cur, tabela):
+    """Colunas e índices já existentes, para só rodar o DDL que falta"""
+    cur.execute("""
+    SELECT column_name FROM information_schema.columns
+    WHERE table_schema = current_schema() AND table_name = %s
+    """, (tabela,))
+    colunas = {nome for (nome,) in cur.fetchall()}
+    cur.execute("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s", (tabela,))
+    return colunas, {nome for (nome,) in cur.fetchall()}
+
+
+def criar_tabela(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS livros(
+        upc_livro TEXT PRIMARY KEY,
+        titulo TEXT,
+        imagem TEXT,
+        categoria TEXT,
+        valor_principal_em_euros DOUBLE PRECISION,
+        inventario INTEGER,
+        review TEXT,
+        sinopse TEXT,    
+        num_reviews INTEGER,
+        link TEXT
+        )
+    """)
+    # ALTER TABLE e CREATE INDEX travam a tabela mesmo com IF [NOT] EXISTS: cada
+    # migração só roda se ainda faltar, para a carga não bloquear as leituras da API
+    colunas, indices = _colunas_e_indices(cur, 'livros')
+    # Modo rápido: livros criados só a partir da listagem ficam com os detalhes pendentes
+    if 'detalhes_pendentes' not in colunas:
+        cur.execute("ALTER TABLE livros ADD COLUMN IF NOT EXISTS detalhes_pendentes BOOLEAN NOT NULL DEFAULT FALSE")
+    if 'livros_link_key' not in indices:
+        cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS livros_link_key ON livros (link)")
+    # Capa baixada para o armazém local (books_data/imagens.py); NULL enquanto não baixada
+    if 'imagem_sha256' not in colunas:
+        cur.execute("ALTER TABLE livros ADD COLUMN IF NOT EXISTS imagem_sha256 TEXT")
+    # Uma linha por lote confirmado, com os UPCs alterados (lida pelo listener da API)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS livros_versoes(
+        versao BIGSERIAL PRIMARY KEY,
+        upcs TEXT[] NOT NULL,
+        origem TEXT NOT NULL,
+        criado_em TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+    # Preços ficam só em euros; as outras moedas saem da cotação vigente na consulta
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS cotacoes(
+        moeda TEXT NOT NULL,
+        vigente_desde DATE NOT NULL,
+        por_euro NUMERIC(12, 6) NOT NULL CHECK (por_euro > 0),
+        PRIMARY KEY (moeda, vigente_desde)
+        )
+    """)
+    # Mesma cotação que antes era fixa no parser, para os valores em reais não mudarem
+    cur.execute("""
+    INSERT INTO cotacoes (moeda, vigente_desde, por_euro)
+    VALUES ('BRL', DATE '1970-01-01', 6.35)
+    ON CONFLICT DO NOTHING
+    """)
+    if 'valor_principal_em_reais' in colunas:
+        cur.execute("ALTER TABLE livros DROP COLUMN IF EXISTS valor_principal_em_reais")
+    # Filtro por faixa de preço (em qualquer moeda) vira um range scan em euros
+    if 'livros_preco_idx' not in indices:
+        cur.execute("CREATE INDEX IF NOT EXISTS livros_preco_idx ON livros (valor_principal_em_euros)")
+    # Categorias com id inteiro: a API lista a partir desta tabela e filtra livros pelo índice
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS categorias(
+        id SERIAL PRIMARY KEY,
+        nome TEXT NOT NULL UNIQUE
+        )
+    """)
+    if 'categoria_id' not in colunas:
+        cur.execute("ALTER TABLE livros ADD COLUMN IF NOT EXISTS categoria_id INTEGER REFERENCES categorias (id)")
+    # Com titulo no índice, a busca por categoria já sai na ordem da resposta
+    if 'livros_categoria_id_idx' not in indices:
+        cur.execute("CREATE INDEX IF NOT EXISTS livros_categoria_id_idx ON livros (categoria_id, titulo)")
+    # Livros gravados antes da tabela existir (ou por versões antigas do loader)
+    gravar_categorias(cur, origem='(SELECT categoria FROM livros WHERE categoria_id IS NULL)')
+    cur.execute("""
+    UPDATE livros l SET categoria_id = c.id
+    FROM categorias c
+    WHERE l.categoria_id IS NULL AND c.nome = l.categoria
+    RETURNING l.upc_livro
+    """)
+    registrar_versao(cur, [upc for (upc,) in cur.fetchall()], 'categorias')
 
 
 ### FUNÇÕES 
-url_principal = 'https://books.toscrape.com/'
-url_de_paginas = 'https://books.toscrape.com/catalogue/page-{}.html'
+url_principal = os.getenv('BOOKS_BASE_URL', 'https://books.toscrape.com/')
+url_de_paginas = urljoin(url_principal, 'catalogue/page-{}.html')
 
 livros_links = []
 
-valor_euro_para_real = 6.35
+sessao = requests.Session()
+
+
+def salvar_livro(cur, livro, tabela='livros', tabela_categorias='categorias'):
+    # Uma transação só (o psycopg2 2.9 abre uma mesmo em autocommit): se o INSERT
+    # falhar, a linha provisória apagada volta
+    with cur.connection:
+        # Linha provisória do modo rápido (só listagem) dá lugar ao livro completo
+        cur.execute(f"DELETE FROM {tabela} WHERE link = %(link)s AND detalhes_pendentes", livro)
+        gravar_categorias(cur, origem="(SELECT %(categoria)s::text AS categoria)", parametros=livro,
+                          tabela_categorias=tabela_categorias)
+        cur.execute(f"""
+            INSERT INTO {tabela} (upc_livro, titulo, imagem, categoria, categoria_id, valor_principal_em_euros, inventario, review, sinopse, num_reviews, link)
+            VALUES (%(upc_livro)s, %(titulo)s, %(imagem)s, %(categoria)s, (SELECT id FROM {tabela_categorias} WHERE nome = %(categoria)s), %(valor_principal_em_euros)s, %(inventario)s, %(review)s, %(sinopse)s, %(num_reviews)s, %(link)s)
+            ON CONFLICT (upc_livro) DO UPDATE SET
+                titulo = EXCLUDED.titulo,
+                imagem = EXCLUDED.imagem,
+                imagem_sha256 = CASE WHEN {tabela}.imagem IS NOT DISTINCT FROM EXCLUDED.imagem THEN {tabela}.imagem_sha256 END,
+                categoria = EXCLUDED.categoria,
+                categoria_id = EXCLUDED.categoria_id,
+                valor_principal_em_euros = EXCLUDED.valor_principal_em_euros,
+                inventario = EXCLUDED.inventario,
+                review = EXCLUDED.review,
+                sinopse = EXCLUDED.sinopse,
+                num_reviews = EXCLUDED.num_reviews,
+                link = EXCLUDED.link
+        """, livro)
+
 
 def coleta_de_links(url):
     page = 1
     while True:
-        resposta = requests.get(url)
+        resposta = sessao.get(url)
 
         if resposta.status_code == 200:
             logger.success(f'Requisição bem-sucedida para {url}')
@@ -69,17 +189,13 @@ def coleta_de_links(url):
             logger.critical(f'Falha na requisição para {url}')
             return None
         
-        soup = BeautifulSoup(resposta.text, 'html.parser')
-
-        #achando o ol com os li dos livros
-        books = soup.find_all('article', class_='product_pod')
-
-        for book in books:
-            link = book.find('a')['href']
-            livros_links.append(link)
+        # O site não informa o charset; o conteúdo é UTF-8
+        resposta.encoding = 'utf-8'
+        listagem = extrair_listagem(resposta.text, url)
+        livros_links.extend(listagem.links)
 
         #verificando se existe paginação
-        if verificar_paginacao(soup):
+        if verificar_paginacao(listagem):
             #se existir, pega o link da proxima pagina
             page += 1
             url = url_de_paginas.format(page)
@@ -91,73 +207,368 @@ def coleta_de_links(url):
             logger.success('Não há mais páginas para processar.')
             break
 
-def coleta_atributos_livro(link):
-    resposta = requests.get(link)
-
-    soup = BeautifulSoup(resposta.text, 'html.parser')
+def coleta_atributos_livro(cur, link, metricas=None):
+    inicio = time.perf_counter()
+    resposta = sessao.get(link)
+    if metricas is not None:
+        metricas.registrar_busca(time.perf_counter() - inicio, resposta.status_code, len(resposta.content))
+    resposta.encoding = 'utf-8'
 
-    # Extraindo atributos do livro
-    titulo = soup.find('h1').text
-    imagem = 'https://books.toscrape.com/' + soup.find('img')['src'].replace('../', '')
-    categoria = soup.find('ul', class_='breadcrumb').find_all('li')[2].text.strip()
+    inicio = time.perf_counter()
+    livro = extrair_atributos_livro(resposta.text, link)
+    if metricas is not None:
+        metricas.registrar_parse(time.perf_counter() - inicio)
 
-    preco_eur = float(re.search(r'\d+\.\d+', soup.find('p', class_='price_color').text).group())
-    preco_brl = round(preco_eur * valor_euro_para_real, 2)
+    inicio = time.perf_counter()
+    salvar_livro(cur, livro)
+    if metricas is not None:
+        # Autocommit: cada livro é o seu próprio "lote" (sem distinguir inserção de atualização)
+        metricas.registrar_escrita(time.perf_counter() - inicio, 0, 1, 0)
+    return livro['upc_livro']
 
-    estoque = int(re.search(r'\d+', soup.find('p', class_='instock availability').text.strip()).group())
-    review = soup.find('p', class_='star-rating')['class'][1]
-    sinopse = soup.find('meta', attrs={'name': 'description'})['content'].strip()
-    sinopse = sinopse.encode('latin1').decode('utf-8')
-    upc = soup.find('th', text='UPC').find_next_sibling('td').text
-    num_reviews = int(soup.find('th', text='Number of reviews').find_next_sibling('td').text)
-
-    cur.execute("""
-        INSERT INTO livros (upc_livro, titulo, imagem, categoria, valor_principal_em_euros, valor_principal_em_reais, inventario, review, sinopse, num_reviews, link)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        ON CONFLICT (upc_livro) DO UPDATE SET
-            titulo = EXCLUDED.titulo,
-            imagem = EXCLUDED.imagem,
-            categoria = EXCLUDED.categoria,
-            valor_principal_em_euros = EXCLUDED.valor_principal_em_euros,
-            valor_principal_em_reais = EXCLUDED.valor_principal_em_reais,
-            inventario = EXCLUDED.inventario,
-            review = EXCLUDED.review,
-            sinopse = EXCLUDED.sinopse,
-            num_reviews = EXCLUDED.num_reviews,
-            link = EXCLUDED.link
-    """, (upc, titulo, imagem, categoria, preco_eur, preco_brl, estoque, review, sinopse, num_reviews, link))
 #Função de paginação
-def verificar_paginacao(soup):
+def verificar_paginacao(listagem):
     #vendo se existe o botão "next"
-    proxima_pagina = soup.find('li', class_='next')
-    if proxima_pagina:
+    if listagem.tem_proxima:
         logger.success('Próxima página encontrada.')
         return True
     else:
         logger.warning('Próxima página não encontrada.')
         return False
 
+
+def carga_sequencial(cur, metricas=None):
+    """Carga original: uma página por vez"""
+    coleta_de_links(url_principal)
+
+    #livros_links = livros_links[:10]  #  !Limitando a 10 links para teste
+
+    # Uma única versão do dataset por carga (e não uma por livro), publicada
+    # mesmo se a carga for interrompida: os livros já gravados estão confirmados
+    gravados = []
+    try:
+        for link in dict.fromkeys(livros_links):
+            logger.info(f'Coletando atributos do livro: {link}')
+            
+            try:
+                gravados.append(coleta_atributos_livro(cur, link, metricas))
+            except Exception as e:
+                if metricas is not None:
+                    metricas.registrar_erro('sequencial', e)
+                logger.error(f"Não foi possível pegar a info do livro: {e}")
+                pass
+    finally:
+        registrar_versao(cur, gravados, 'sequencial')
+
+
+def alvo_incremental(cur, tabela='livros'):
+    """Identifica o banco e a tabela de destino; a OID muda se a tabela for recriada ou restaurada"""
+    cur.execute("SELECT inet_server_addr(), inet_server_port(), current_database(), %s::regclass::oid", (tabela,))
+    return '/'.join(str(valor) for valor in cur.fetchone())
+
+
+def links_gravados(cur, tabela='livros'):
+    """Links dos livros já gravados com a página de detalhe"""
+    cur.execute(f"SELECT link FROM {tabela} WHERE NOT detalhes_pendentes")
+    return {linha[0] for linha in cur.fetchall()}
+
+
+async def carga_assincrona(escritor, opcoes_crawler, processos, tamanho_fila, incremental=None, fronteira=None,
+                           arquivo=None, links=None, metricas=None):
+    """
+    Carga em pipeline: busca concorrente, parse em processos e gravação em lotes.
+    `opcoes_crawler` são os argumentos do AsyncCrawler. Sem `links`, os livros vêm
+    das páginas de listagem (ou da fronteira); com `links` e fronteira, os links
+    são a fila da fronteira (enriquecimento).
+    """
+    gravados = None
+    if incremental is not None:
+        with escritor.con.cursor() as cur:
+            if incremental.vincular(alvo_incremental(cur, escritor.tabela)):
+                logger.warning('O cache incremental era de outro banco ou tabela e foi descartado')
+            gravados = links_gravados(cur, escritor.tabela)
+        escritor.con.commit()
+
+    async with AsyncCrawler(**opcoes_crawler, arquivo=arquivo, metricas=metricas) as crawler:
+        pipeline = PipelineCarga(
+            crawler, escritor, processos=processos, tamanho_fila=tamanho_fila, incremental=incremental,
+            fronteira=fronteira, metricas=metricas, gravados=gravados
+        )
+        if fronteira is not None and links is not None:
+            return await pipeline.executar_pendentes(links)
+        if fronteira is not None:
+            logger.info(f'Fronteira em {fronteira.caminho}: {fronteira.contagem()}')
+            return await pipeline.executar_fronteira(url_principal)
+
+        if links is None:
+            links = await crawler.coletar_links(url_principal)
+            logger.success(f'{len(links)} livros encontrados')
+        return await pipeline.executar(links)
+
+
+async def carga_listagens(con, opcoes_crawler, arquivo=None, metricas=None):
+    """
+    Modo rápido: cria/atualiza os livros só com as ~50 páginas de listagem. UPC,
+    categoria, sinopse, número de reviews e estoque ficam pendentes até o enriquecimento.
+    """
+    async with AsyncCrawler(**opcoes_crawler, arquivo=arquivo, metricas=metricas) as crawler:
+        listagens = await crawler.coletar_listagens(url_principal)
+
+    resumos = list({resumo['link']: resumo for listagem in listagens for resumo in listagem.livros}.values())
+    inseridos, atualizados = gravar_resumos(con, resumos)
+    logger.success(f'{len(resumos)} livros nas listagens: {inseridos} novos, {atualizados} atualizados')
+
+
+def links_pendentes(cur):
+    """Links dos livros que ainda não tiveram a página de detalhe processada"""
+    cur.execute("SELECT link FROM livros WHERE detalhes_pendentes ORDER BY link")
+    return [linha[0] for linha in cur.fetchall()]
+
+
+def reduzir_prioridade():
+    """O enriquecimento cede CPU para a API e outras cargas (os processos de parse herdam o nice)"""
+    if hasattr(os, 'nice'):
+        os.nice(PRIORIDADE_ENRIQUECIMENTO)
+
+
+def iniciar_enriquecimento(args):
+    """
+    Dispara o enriquecimento (--enriquecer) num processo separado, sem esperar por
+    ele: os livros da listagem já estão no banco e os detalhes chegam aos poucos
+    """
+    comando = [
+        sys.executable, '-m', 'books_data.loader_data', '--enriquecer', '--base-url', url_principal,
+        '--concorrencia-enriquecimento', str(args.concorrencia_enriquecimento),
+        '--timeout', str(args.timeout), '--tentativas', str(args.tentativas),
+        '--espera-maxima', str(args.espera_maxima),
+        '--fila', str(args.fila), '--lote', str(args.lote),
+    ]
+    if args.processos is not None:
+        comando += ['--processos', str(args.processos)]
+    if args.parser:
+        comando += ['--parser', args.parser]
+    if args.incremental:
+        comando.append('--incremental')
+    if args.arquivar:
+        comando += ['--arquivar', args.arquivar]
+
+    os.makedirs(LOADER_CACHE_DIR, exist_ok=True)
+    caminho_log = os.path.join(LOADER_CACHE_DIR, 'enriquecimento.log')
+    with open(caminho_log, 'ab') as log:
+        processo = subprocess.Popen(comando, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                                    start_new_session=True)
+    logger.info(f'Enriquecimento em segundo plano (pid {processo.pid}); log em {caminho_log}')
+    return processo
+
+
+async def carga_imagens(con, opcoes_crawler, armazem, metricas=None):
+    """
+    Baixa as capas ainda não armazenadas (cada URL uma vez, em paralelo), grava no
+    armazém endereçado por conteúdo com as miniaturas e liga cada livro ao sha256.
+    """
+    with con.cursor() as cur:
+        cur.execute("SELECT DISTINCT imagem FROM livros WHERE imagem IS NOT NULL AND imagem_sha256 IS NULL")
+        urls = [linha[0] for linha in cur.fetchall()]
+    con.commit()
+    if not urls:
+        logger.info('Todas as capas já estão no armazém')
+        return
+
+    logger.info(f'Baixando {len(urls)} capas para {armazem.diretorio}')
+    novas = 0
+    ligacoes = []
+    async with AsyncCrawler(**opcoes_crawler, metricas=metricas) as crawler:
+        async def baixar(url):
+            resposta = await crawler.buscar_resposta(url)
+            # Miniaturas usam CPU: fora do event loop
+            return url, *await asyncio.to_thread(armazem.gravar, resposta.content)
+
+        for tarefa in asyncio.as_completed([baixar(url) for url in urls]):
+            try:
+                url, sha256, nova = await tarefa
+            except Exception as e:
+                if metricas is not None:
+                    metricas.registrar_erro('imagens', e)
+                logger.error(f'Não foi possível armazenar uma capa: {e!r}')
+                continue
+            novas += nova
+            ligacoes.append((url, sha256))
+
+    try:
+        with con.cursor() as cur:
+            alterados = execute_values(cur, """
+                UPDATE livros SET imagem_sha256 = v.sha256
+                FROM (VALUES %s) AS v (imagem, sha256)
+                WHERE livros.imagem = v.imagem
+                RETURNING livros.upc_livro
+            """, ligacoes, page_size=1000, fetch=True)
+            registrar_versao(cur, [upc for (upc,) in alterados], 'imagens')
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    logger.success(f'{len(ligacoes)} capas armazenadas ({novas} arquivos novos, '
+                   f'{len(ligacoes) - novas} repetidas) em {len(alterados)} livros')
+
+
+def gravar_log_concorrencia(relatorio, caminho):
+    """CSV com o limite de concorrência e as métricas de cada janela do controle adaptativo"""
+    historico = relatorio.get('concorrencia', {}).get('historico', [])
+    if not historico:
+        logger.warning('Sem histórico de concorrência (use --concorrencia-maxima para o modo adaptativo)')
+        return
+    with open(caminho, 'w', newline='') as f:
+        escritor_csv = csv.DictWriter(f, fieldnames=list(historico[0]))
+        escritor_csv.writeheader()
+        escritor_csv.writerows(historico)
+    logger.info(f'Histórico de concorrência ({len(historico)} janelas) gravado em {caminho}')
+
+
+async def carga_replay(escritor, arquivo, processos, tamanho_fila, metricas=None):
+    """Recarrega o catálogo a partir das páginas arquivadas, sem acessar o site"""
+    logger.info(f'Replay de {arquivo.diretorio}: {arquivo.resumo()}')
+    pipeline = PipelineCarga(None, escritor, processos=processos, tamanho_fila=tamanho_fila, metricas=metricas)
+    return await pipeline.executar_arquivo(arquivo)
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Carrega os livros do Books to Scrape no Postgres')
+    parser.add_argument('--base-url', default=url_principal, help='URL base do site (ex.: servidor local com páginas salvas)')
+    parser.add_argument('--sequencial', action='store_true', help='Usa a carga antiga, uma requisição por vez')
+    parser.add_argument('--concorrencia', type=int, default=16,
+                        help='Requisições simultâneas (no modo adaptativo, o valor inicial)')
+    parser.add_argument('--concorrencia-minima', type=int, default=1, help='Piso do modo adaptativo')
+    parser.add_argument('--concorrencia-maxima', type=int, default=None,
+                        help='Teto de requisições simultâneas; ativa o ajuste automático (AIMD)')
+    parser.add_argument('--latencia-alvo', type=float, default=None,
+                        help='p95 máximo (segundos) no modo adaptativo; padrão: 3x o menor p50 observado')
+    parser.add_argument('--log-concorrencia', metavar='CSV', help='Grava o histórico do limite de concorrência')
+    parser.add_argument('--timeout', type=float, default=15.0, help='Timeout de cada requisição (segundos)')
+    parser.add_argument('--tentativas', type=int, default=3, help='Tentativas por URL antes de desistir (>= 1)')
+    parser.add_argument('--espera-maxima', type=float, default=60.0,
+                        help='Espera máxima entre tentativas (segundos), mesmo que o Retry-After peça mais')
+    parser.add_argument('--parser', choices=backends_disponiveis(), help='Backend de parsing do HTML (padrão: o mais rápido instalado)')
+    parser.add_argument('--processos', type=int, default=None, help='Processos de parse do HTML (padrão: número de CPUs; 0 = no próprio loop)')
+    parser.add_argument('--fila', type=int, default=256, help='Tamanho máximo das filas entre as etapas do pipeline')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Requisições condicionais e hashes de conteúdo para pular livros sem mudança')
+    parser.add_argument('--fronteira', action='store_true',
+                        help='Usa a fronteira persistente: retoma cargas interrompidas e permite vários processos; '
+                             'se a varredura anterior já terminou, começa uma nova')
+    parser.add_argument('--recomecar', action='store_true',
+                        help='Com --fronteira, descarta o progresso de uma varredura interrompida e começa do zero')
+    parser.add_argument('--repetir-falhas', action='store_true',
+                        help='Com --fronteira, tenta de novo só as URLs que falharam, sem começar nova varredura')
+    parser.add_argument('--arquivar', metavar='DIR', help='Arquiva o HTML baixado (zstd) neste diretório')
+    parser.add_argument('--replay', metavar='DIR', help='Recarrega a partir de um arquivo de páginas, sem rede')
+    parser.add_argument('--rapido', action='store_true',
+                        help='Carrega só as páginas de listagem; os detalhes de livros novos ficam pendentes')
+    parser.add_argument('--enriquecer', action='store_true',
+                        help='Consome os livros pendentes pela fronteira própria do enriquecimento, com prioridade '
+                             'de CPU reduzida (vários processos podem rodar juntos); com --rapido, '
+                             'dispara esse consumidor em segundo plano e termina sem esperar')
+    parser.add_argument('--concorrencia-enriquecimento', type=int, default=4,
+                        help='Requisições simultâneas do enriquecimento (baixa prioridade)')
+    parser.add_argument('--lote', type=int, default=500, help='Livros gravados por transação (COPY + upsert)')
+    parser.add_argument('--relatorio', metavar='JSON',
+                        help='Arquivo do relatório da carga (padrão: .loader_cache/relatorios/carga-<data>.json)')
+    parser.add_argument('--metricas-porta', type=int, metavar='PORTA',
+                        help='Expõe as métricas ao vivo no formato do Prometheus em :PORTA/metrics')
+    parser.add_argument('--imagens', nargs='?', const=IMAGES_DIR, metavar='DIR',
+                        help=f'Depois da carga, baixa as capas para o armazém local (padrão: {IMAGES_DIR})')
+    args = parser.parse_args()
+    if args.tentativas < 1:
+        parser.error('--tentativas deve ser pelo menos 1')
+
+    url_principal = args.base_url
+    if args.parser:
+        definir_backend(args.parser)
+    logger.info(f'Parser HTML: {backend_atual()}')
+    url_de_paginas = urljoin(url_principal, 'catalogue/page-{}.html')
+
     logger.startup('Inicando carregando de dados dos livros')
-    dados = coleta_de_links(url_principal)
+    inicio = time.perf_counter()
+    inicio_data = datetime.now(timezone.utc)
+    metricas = MetricasCarga()
+    if args.metricas_porta:
+        metricas.servir(args.metricas_porta)
+    relatorio = {}
 
-    #livros_links = livros_links[:10]  #  !Limitando a 10 links para teste
+    con = conectar()
+    cur = con.cursor()
+    criar_tabela(cur)
 
-    for link in livros_links:
-        # Corrigindo o link: se não tiver 'catalogue', adiciona
-        if 'catalogue/' not in link:
-            link = 'catalogue/' + link.lstrip('./')
+    try:
+        if args.sequencial:
+            carga_sequencial(cur, metricas)
+        else:
+            con_lote = conectar(autocommit=False)
+            incremental = CacheIncremental() if args.incremental else None
+            fronteira = Fronteira() if args.fronteira else None
+            enriquecimento = args.enriquecer and not args.rapido
+            if enriquecimento:
+                reduzir_prioridade()
+                # Fila própria: não se mistura com a varredura completa de --fronteira
+                fronteira = Fronteira(os.path.join(LOADER_CACHE_DIR, 'enriquecimento.sqlite'))
+            arquivo = ArquivoPaginas(args.replay or args.arquivar) if args.replay or args.arquivar else None
+            if fronteira is not None and args.recomecar:
+                fronteira.limpar()
+            if fronteira is not None and args.repetir_falhas:
+                logger.info(f'{fronteira.repetir_falhas()} URLs com falha voltaram para a fila')
+            try:
+                escritor = EscritorLivros(con_lote, tamanho_lote=args.lote, metricas=metricas)
+                opcoes_crawler = {'concorrencia': args.concorrencia, 'timeout': args.timeout, 'tentativas': args.tentativas,
+                                  'espera_maxima': args.espera_maxima}
+                if args.concorrencia_maxima:
+                    opcoes_crawler.update(concorrencia_minima=args.concorrencia_minima,
+                                          concorrencia_maxima=args.concorrencia_maxima,
+                                          latencia_alvo=args.latencia_alvo)
 
-        # Corrige qualquer ../ e monta URL completa corretamente
-        link_completo = urljoin(url_principal, link)
+                if args.replay:
+                    relatorio = asyncio.run(carga_replay(escritor, arquivo, args.processos, args.fila, metricas))
+                elif args.rapido:
+                    asyncio.run(carga_listagens(con_lote, opcoes_crawler, arquivo, metricas))
+                elif enriquecimento:
+                    pendentes = links_pendentes(cur)
+                    logger.info(f'{len(pendentes)} livros com detalhes pendentes no banco')
+                    # Baixa prioridade: concorrência fixa e pequena, além do nice
+                    opcoes_enriquecimento = {'concorrencia': args.concorrencia_enriquecimento,
+                                             'timeout': args.timeout, 'tentativas': args.tentativas,
+                                             'espera_maxima': args.espera_maxima}
+                    relatorio = asyncio.run(carga_assincrona(
+                        escritor, opcoes_enriquecimento, args.processos, args.fila, incremental, fronteira,
+                        arquivo=arquivo, links=pendentes, metricas=metricas
+                    ))
+                else:
+                    relatorio = asyncio.run(carga_assincrona(
+                        escritor, opcoes_crawler, args.processos, args.fila, incremental, fronteira, arquivo,
+                        metricas=metricas
+                    ))
 
-        logger.info(f'Coletando atributos do livro: {link_completo}')
-        
-        try:
-            coleta_atributos_livro(link_completo)
-        except Exception as e:
-            logger.error(f"Não foi possível pegar a info do livro: {e}")
-            pass
-
-    cur.close()
-    con.close()
+                if args.log_concorrencia:
+                    gravar_log_concorrencia(relatorio, args.log_concorrencia)
+                if args.imagens:
+                    asyncio.run(carga_imagens(con_lote, opcoes_crawler, ArmazemImagens(args.imagens), metricas))
+            finally:
+                con_lote.close()
+                for recurso in (incremental, fronteira, arquivo):
+                    if recurso is not None:
+                        recurso.fechar()
+    finally:
+        cur.close()
+        con.close()
+        metricas.parar()
+
+    duracao = time.perf_counter() - inicio
+    gravar_relatorio({
+        'inicio': inicio_data.isoformat(),
+        'duracao_segundos': round(duracao, 2),
+        'parser': backend_atual(),
+        'opcoes': vars(args),
+        'pipeline': relatorio,
+        'metricas': metricas.relatorio(),
+    }, args.relatorio)
+    logger.success(f'Carga concluída em {duracao:.1f}s')
+    if args.rapido and args.enriquecer:
+        # Depois de fechar o arquivo de páginas, que o outro processo vai reabrir
+        iniciar_enriquecimento(args)
@@ -0,0 +1,271 @@
+#Métricas da carga: histogramas e contadores por etapa, relatório JSON e formato texto do Prometheus
+import bisect
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from handsome_log import get_logger
+
+from books_data.incremental import LOADER_CACHE_DIR
+
+logger = get_logger(__name__)
+
+
+# Limites (segundos) dos buckets de cada histograma
+BUCKETS_BUSCA = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_PARSE = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+BUCKETS_ESCRITA = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+RELATORIOS_DIR = os.path.join(LOADER_CACHE_DIR, 'relatorios')
+
+
+class Histograma:
+    """Histograma de buckets fixos, no mesmo modelo do Prometheus (contagem por limite superior)"""
+
+    def __init__(self, limites):
+        self.limites = tuple(limites)
+        self.contagens = [0] * (len(self.limites) + 1)
+        self.total = 0
+        self.soma = 0.0
+        self.maximo = 0.0
+
+    def observar(self, valor):
+        self.contagens[bisect.bisect_left(self.limites, valor)] += 1
+        self.total += 1
+        self.soma += valor
+        self.maximo = max(self.maximo, valor)
+
+    def percentil(self, fracao):
+        """Estimativa por interpolação linear dentro do bucket (como histogram_quantile)"""
+        if not self.total:
+            return None
+        alvo = fracao * self.total
+        acumulado = 0
+        for i, contagem in enumerate(self.contagens):
+            if acumulado + contagem >= alvo and contagem:
+                inferior = self.limites[i - 1] if i > 0 else 0.0
+                superior = self.limites[i] if i < len(self.limites) else self.maximo
+                estimativa = inferior + (superior - inferior) * (alvo - acumulado) / contagem
+                # O bucket pode ir além do maior valor visto
+                return min(estimativa, self.maximo)
+            acumulado += contagem
+        return self.maximo
+
+    def resumo(self):
+        def arredondar(valor):
+            return round(valor, 5) if valor is not None else None
+
+        return {
+            'total': self.total,
+            'media': arredondar(self.soma / self.total) if self.total else None,
+            'p50': arredondar(self.percentil(0.5)),
+            'p90': arredondar(self.percentil(0.9)),
+            'p99': arredondar(self.percentil(0.99)),
+            'maximo': arredondar(self.maximo),
+            'soma': arredondar(self.soma),
+            'buckets': {str(limite): contagem for limite, contagem in zip(self.limites + ('+Inf',), self.contagens)},
+        }
+
+    def prometheus(self, nome, ajuda):
+        linhas = [f'# HELP {nome} {ajuda}', f'# TYPE {nome} histogram']
+        acumulado = 0
+        for limite, contagem in zip(self.limites + ('+Inf',), self.contagens):
+            acumulado += contagem
+            linhas.append(f'{nome}_bucket{{le="{limite}"}} {acumulado}')
+        linhas.append(f'{nome}_sum {self.soma}')
+        linhas.append(f'{nome}_count {self.total}')
+        return linhas
+
+
+class MetricasCarga:
+    """
+    Instrumentação de uma carga, alimentada pelo crawler (cada tentativa HTTP),
+    pelo pipeline (parse e falhas) e pelo escritor (cada lote gravado). Termina
+    num relatório JSON e pode ser lida ao vivo no formato do Prometheus.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.inicio = time.time()
+        self.latencia_busca = Histograma(BUCKETS_BUSCA)
+        self.tempo_parse = Histograma(BUCKETS_PARSE)
+        self.tempo_escrita = Histograma(BUCKETS_ESCRITA)
+        self.bytes_baixados = 0
+        self.respostas = {}
+        self.linhas = {'inseridas': 0, 'atualizadas': 0, 'inalteradas': 0}
+        self.erros = {}
+        self._servidor = None
+
+    def registrar_busca(self, duracao, status=None, tamanho=0):
+        """Uma tentativa HTTP; status None = erro de rede"""
+        with self._lock:
+            self.latencia_busca.observar(duracao)
+            self.bytes_baixados += tamanho
+            chave = str(status) if status is not None else 'erro_rede'
+            self.respostas[chave] = self.respostas.get(chave, 0) + 1
+
+    def registrar_parse(self, duracao):
+        with self._lock:
+            self.tempo_parse.observar(duracao)
+
+    def registrar_escrita(self, duracao, inseridas, atualizadas, inalteradas):
+        """Um lote gravado (uma transação)"""
+        with self._lock:
+            self.tempo_escrita.observar(duracao)
+            self.linhas['inseridas'] += inseridas
+            self.linhas['atualizadas'] += atualizadas
+            self.linhas['inalteradas'] += inalteradas
+
+    def registrar_erro(self, etapa, erro):
+        chave = (etapa, type(erro).__name__)
+        with self._lock:
+            self.erros[chave] = self.erros.get(chave, 0) + 1
+
+    def relatorio(self):
+        with self._lock:
+            duracao = time.time() - self.inicio
+            gravadas = self.linhas['inseridas'] + self.linhas['atualizadas']
+            erros = {}
+            for (etapa, tipo), contagem in sorted(self.erros.items()):
+                erros.setdefault(etapa, {})[tipo] = contagem
+            return {
+                'duracao_segundos': round(duracao, 2),
+                'busca': {
+                    'latencia_segundos': self.latencia_busca.resumo(),
+                    'respostas': dict(sorted(self.respostas.items())),
+                    'bytes_baixados': self.bytes_baixados,
+                    'megabytes_por_segundo': round(self.bytes_baixados / duracao / 1e6, 3) if duracao else None,
+                },
+                'parse': {'tempo_segundos': self.tempo_parse.resumo()},
+                'escrita': {
+                    'tempo_lote_segundos': self.tempo_escrita.resumo(),
+                    'linhas': dict(self.linhas),
+                    'linhas_por_segundo': round(gravadas / duracao, 1) if duracao else None,
+                },
+                'erros': erros,
+            }
+
+    def prometheus(self):
+        """Todas as métricas no formato texto de exposição do Prometheus"""
+        with self._lock:
+            linhas = []
+            linhas += self.latencia_busca.prometheus(
+                'loader_fetch_duration_seconds', 'Latência de cada tentativa HTTP')
+            linhas += ['# HELP loader_fetch_responses_total Respostas HTTP por status',
+                       '# TYPE loader_fetch_responses_total counter']
+            linhas += [f'loader_fetch_responses_total{{status="{status}"}} {contagem}'
+                       for status, contagem in sorted(self.respostas.items())]
+            linhas += ['# HELP loader_fetch_bytes_total Bytes baixados',
+                       '# TYPE loader_fetch_bytes_total counter',
+                       f'loader_fetch_bytes_total {self.bytes_baixados}']
+            linhas += self.tempo_parse.prometheus('loader_parse_duration_seconds', 'Tempo de parse por página')
+            linhas += self.tempo_escrita.prometheus('loader_write_batch_duration_seconds', 'Tempo de gravação por lote')
+            linhas += ['# HELP loader_rows_total Linhas gravadas por resultado',
+                       '# TYPE loader_rows_total counter']
+            linhas += [f'loader_rows_total{{result="{resultado}"}} {contagem}'
+                       for resultado, contagem in self.linhas.items()]
+            linhas += ['# HELP loader_errors_total Falhas por etapa e tipo de exceção',
+                       '# TYPE loader_errors_total counter']
+            linhas += [f'loader_errors_total{{stage="{etapa}",type="{tipo}"}} {contagem}'
+                       for (etapa, tipo), contagem in sorted(self.erros.items())]
+            return '\n'.join(linhas) + '\n'
+
+    def servir(self, porta, host='0.0.0.0'):
+        """Expõe /metrics numa thread enquanto a carga roda"""
+        metricas = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                corpo = metricas.prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, *args):
+                pass
+
+        class Servidor(ThreadingHTTPServer):
+            daemon_threads = True
+
+        self._servidor = Servidor((host, porta), Handler)
+        threading.Thread(target=self._servidor.serve_forever, name='metricas', daemon=True).start()
+        logger.info(f'Métricas do loader em http://{host}:{porta}/metrics')
+
+    def parar(self):
+        if self._servidor is not None:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
+
+
+def gravar_relatorio(relatorio, caminho=None):
+    """Grava o relatório da carga em JSON; sem caminho, em RELATORIOS_DIR com a data no nome"""
+    if caminho is None:
+        os.makedirs(RELATORIOS_DIR, exist_ok=True)
+        caminho = os.path.join(RELATORIOS_DIR, f"carga-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False, default=str)
+    logger.info(f'Relatório da carga gravado em {caminho}')
+    return caminho
+
+
+# (rótulo, caminho no relatório) das linhas da comparação
+_COMPARACAO = [
+    ('duração (s)', ('duracao_segundos',)),
+    ('busca p50 (s)', ('metricas', 'busca', 'latencia_segundos', 'p50')),
+    ('busca p99 (s)', ('metricas', 'busca', 'latencia_segundos', 'p99')),
+    ('requisições', ('metricas', 'busca', 'latencia_segundos', 'total')),
+    ('MB/s', ('metricas', 'busca', 'megabytes_por_segundo')),
+    ('parse p50 (s)', ('metricas', 'parse', 'tempo_segundos', 'p50')),
+    ('lote p50 (s)', ('metricas', 'escrita', 'tempo_lote_segundos', 'p50')),
+    ('linhas/s', ('metricas', 'escrita', 'linhas_por_segundo')),
+    ('gargalo', ('pipeline', 'gargalo')),
+]
+
+
+def _valor(relatorio, caminho):
+    for chave in caminho:
+        if not isinstance(relatorio, dict):
+            return None
+        relatorio = relatorio.get(chave)
+    return relatorio
+
+
+def comparar(relatorios):
+    """Tabela lado a lado dos números principais de vários relatórios"""
+    nomes = [os.path.basename(caminho) for caminho, _ in relatorios]
+    largura = max(len(nome) for nome in nomes + ['x' * 12]) + 2
+    linhas = [f"{'':<16}" + ''.join(f'{nome:>{largura}}' for nome in nomes)]
+    for rotulo, caminho in _COMPARACAO + [('erros', None)]:
+        valores = []
+        for _, relatorio in relatorios:
+            if caminho is None:
+                erros = _valor(relatorio, ('metricas', 'erros')) or {}
+                valor = sum(sum(tipos.values()) for tipos in erros.values())
+            else:
+                valor = _valor(relatorio, caminho)
+            valores.append('-' if valor is None else str(valor))
+        linhas.append(f'{rotulo:<16}' + ''.join(f'{valor:>{largura}}' for valor in valores))
+    return '\n'.join(linhas)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compara relatórios de carga do loader')
+    parser.add_argument('relatorios', nargs='+', help='Arquivos JSON gravados pelo loader')
+    args = parser.parse_args()
+
+    carregados = []
+    for caminho in args.relatorios:
+        with open(caminho, encoding='utf-8') as f:
+            carregados.append((caminho, json.load(f)))
+    print(comparar(carregados))
@@ -0,0 +1,364 @@
+#Funções de extração do HTML das páginas do Books to Scrape
+import os
+import re
+from typing import List, NamedTuple, Optional
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+# Backends opcionais: mais rápidos que o html.parser puro-Python do BeautifulSoup
+try:
+    from lxml import html as lxml_html
+    from lxml import etree
+except ImportError:
+    lxml_html = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+
+RE_PRECO = re.compile(r'\d+\.\d+')
+RE_INTEIRO = re.compile(r'\d+')
+RE_TOTAL_PAGINAS = re.compile(r'of\s+(\d+)')
+
+
+class Listagem(NamedTuple):
+    """Resultado de uma página de listagem"""
+    links: List[str]
+    total_paginas: Optional[int]
+    tem_proxima: bool
+    # Resumo de cada livro (o que a listagem mostra; ver _montar_resumo)
+    livros: List[dict]
+
+
+def _total_paginas(texto):
+    """Lê o 'Page 1 of 50' da paginação; None se não houver paginação"""
+    if texto is None:
+        return None
+    encontrado = RE_TOTAL_PAGINAS.search(texto)
+    return int(encontrado.group(1)) if encontrado else None
+
+
+def _montar_livro(link, titulo, imagem, categoria, texto_preco, texto_estoque, classes_review, sinopse, tabela):
+    """Converte os textos extraídos (iguais em todos os backends) no dict da tabela livros"""
+    preco_eur = float(RE_PRECO.search(texto_preco).group())
+    return {
+        'upc_livro': tabela['UPC'],
+        'titulo': titulo,
+        'imagem': urljoin(link, imagem),
+        'categoria': categoria.strip(),
+        'valor_principal_em_euros': preco_eur,
+        'inventario': int(RE_INTEIRO.search(texto_estoque.strip()).group()),
+        'review': classes_review.split()[1],
+        'sinopse': sinopse.strip(),
+        'num_reviews': int(tabela['Number of reviews']),
+        'link': link,
+    }
+
+
+def _montar_resumo(url_pagina, href, titulo, imagem, texto_preco, classes_review, texto_disponibilidade):
+    """Campos de um livro que aparecem na listagem; os demais só existem na página de detalhe"""
+    preco_eur = float(RE_PRECO.search(texto_preco).group())
+    return {
+        'link': urljoin(url_pagina, href),
+        'titulo': titulo,
+        'imagem': urljoin(url_pagina, imagem),
+        'valor_principal_em_euros': preco_eur,
+        'review': classes_review.split()[1],
+        'disponivel': 'In stock' in texto_disponibilidade,
+    }
+
+
+class ParserBS4:
+    """Backend de referência: BeautifulSoup com o html.parser (comportamento original)"""
+    nome = 'bs4'
+
+    def listagem(self, html, url_pagina):
+        soup = BeautifulSoup(html, 'html.parser')
+
+        #achando o ol com os li dos livros
+        books = soup.find_all('article', class_='product_pod')
+        links = [urljoin(url_pagina, book.find('a')['href']) for book in books]
+        livros = [
+            _montar_resumo(
+                url_pagina,
+                href=book.find('a')['href'],
+                titulo=book.find('h3').find('a')['title'],
+                imagem=book.find('img')['src'],
+                texto_preco=book.find('p', class_='price_color').text,
+                classes_review=' '.join(book.find('p', class_='star-rating')['class']),
+                texto_disponibilidade=book.find('p', class_='availability').text,
+            )
+            for book in books
+        ]
+        atual = soup.find('li', class_='current')
+        return Listagem(
+            links,
+            _total_paginas(atual.text if atual is not None else None),
+            soup.find('li', class_='next') is not None,
+            livros,
+        )
+
+    def livro(self, html, link):
+        soup = BeautifulSoup(html, 'html.parser')
+        tabela = {
+            campo: soup.find('th', string=campo).find_next_sibling('td').text
+            for campo in ('UPC', 'Number of reviews')
+        }
+        return _montar_livro(
+            link,
+            titulo=soup.find('h1').text,
+            imagem=soup.find('img')['src'],
+            categoria=soup.find('ul', class_='breadcrumb').find_all('li')[2].text,
+            texto_preco=soup.find('p', class_='price_color').text,
+            texto_estoque=soup.find('p', class_='instock availability').text,
+            classes_review=' '.join(soup.find('p', class_='star-rating')['class']),
+            sinopse=soup.find('meta', attrs={'name': 'description'})['content'],
+            tabela=tabela,
+        )
+
+
+class ParserLxml:
+    """lxml com expressões XPath pré-compiladas, buscando dentro de article.product_page"""
+    nome = 'lxml'
+
+    def __init__(self):
+        classe = lambda nome: f"contains(concat(' ', normalize-space(@class), ' '), ' {nome} ')"
+        self.xp_pods = etree.XPath(f"//article[{classe('product_pod')}]")
+        self.xp_link_pod = etree.XPath('.//a/@href')
+        self.xp_titulo_pod = etree.XPath('.//h3//a/@title')
+        self.xp_disponibilidade = etree.XPath(f".//p[{classe('availability')}]")
+        self.xp_atual = etree.XPath(f"//li[{classe('current')}]")
+        self.xp_proxima = etree.XPath(f"//li[{classe('next')}]")
+
+        self.xp_pagina = etree.XPath(f"//article[{classe('product_page')}]")
+        self.xp_main = etree.XPath(f".//div[{classe('product_main')}]")
+        self.xp_titulo = etree.XPath('.//h1')
+        self.xp_imagem = etree.XPath('.//img/@src')
+        self.xp_preco = etree.XPath(f".//p[{classe('price_color')}]")
+        self.xp_estoque = etree.XPath(f".//p[{classe('instock')} and {classe('availability')}]")
+        self.xp_review = etree.XPath(f".//p[{classe('star-rating')}]/@class")
+        self.xp_linhas = etree.XPath('.//tr[th and td]')
+        self.xp_breadcrumb = etree.XPath(f"//ul[{classe('breadcrumb')}]/li")
+        self.xp_sinopse = etree.XPath("//meta[@name='description']/@content")
+
+    def listagem(self, html, url_pagina):
+        doc = lxml_html.fromstring(html)
+        pods = self.xp_pods(doc)
+        links = [urljoin(url_pagina, self.xp_link_pod(pod)[0]) for pod in pods]
+        livros = [
+            _montar_resumo(
+                url_pagina,
+                href=self.xp_link_pod(pod)[0],
+                titulo=self.xp_titulo_pod(pod)[0],
+                imagem=self.xp_imagem(pod)[0],
+                texto_preco=self.xp_preco(pod)[0].text_content(),
+                classes_review=self.xp_review(pod)[0],
+                texto_disponibilidade=self.xp_disponibilidade(pod)[0].text_content(),
+            )
+            for pod in pods
+        ]
+        atual = self.xp_atual(doc)
+        return Listagem(
+            links,
+            _total_paginas(atual[0].text_content() if atual else None),
+            bool(self.xp_proxima(doc)),
+            livros,
+        )
+
+    def livro(self, html, link):
+        doc = lxml_html.fromstring(html)
+        pagina = self.xp_pagina(doc)[0]
+        main = self.xp_main(pagina)[0]
+        tabela = {linha.find('th').text_content(): linha.find('td').text_content() for linha in self.xp_linhas(pagina)}
+        return _montar_livro(
+            link,
+            titulo=self.xp_titulo(main)[0].text_content(),
+            imagem=self.xp_imagem(pagina)[0],
+            categoria=self.xp_breadcrumb(doc)[2].text_content(),
+            texto_preco=self.xp_preco(main)[0].text_content(),
+            texto_estoque=self.xp_estoque(main)[0].text_content(),
+            classes_review=self.xp_review(main)[0],
+            sinopse=self.xp_sinopse(doc)[0],
+            tabela=tabela,
+        )
+
+
+class ParserSelectolax:
+    """selectolax (lexbor) com seletores CSS, buscando dentro de article.product_page"""
+    nome = 'selectolax'
+
+    def listagem(self, html, url_pagina):
+        arvore = LexborHTMLParser(html)
+        pods = arvore.css('article.product_pod')
+        links = [urljoin(url_pagina, pod.css_first('a').attributes['href']) for pod in pods]
+        livros = [
+            _montar_resumo(
+                url_pagina,
+                href=pod.css_first('a').attributes['href'],
+                titulo=pod.css_first('h3 a').attributes['title'],
+                imagem=pod.css_first('img').attributes['src'],
+                texto_preco=pod.css_first('p.price_color').text(),
+                classes_review=pod.css_first('p.star-rating').attributes['class'],
+                texto_disponibilidade=pod.css_first('p.availability').text(),
+            )
+            for pod in pods
+        ]
+        atual = arvore.css_first('li.current')
+        return Listagem(
+            links,
+            _total_paginas(atual.text() if atual is not None else None),
+            arvore.css_first('li.next') is not None,
+            livros,
+        )
+
+    def livro(self, html, link):
+        arvore = LexborHTMLParser(html)
+        pagina = arvore.css_first('article.product_page')
+        main = pagina.css_first('div.product_main')
+        tabela = {linha.css_first('th').text(): linha.css_first('td').text() for linha in pagina.css('tr')}
+        return _montar_livro(
+            link,
+            titulo=main.css_first('h1').text(),
+            imagem=pagina.css_first('img').attributes['src'],
+            categoria=arvore.css('ul.breadcrumb > li')[2].text(),
+            texto_preco=main.css_first('p.price_color').text(),
+            texto_estoque=main.css_first('p.instock.availability').text(),
+            classes_review=main.css_first('p.star-rating').attributes['class'],
+            sinopse=arvore.css_first('meta[name="description"]').attributes['content'],
+            tabela=tabela,
+        )
+
+
+BACKENDS = {
+    'bs4': (ParserBS4, True),
+    'lxml': (ParserLxml, lxml_html is not None),
+    'selectolax': (ParserSelectolax, LexborHTMLParser is not None),
+}
+
+
+def backends_disponiveis():
+    return [nome for nome, (_, disponivel) in BACKENDS.items() if disponivel]
+
+
+def criar_parser(nome):
+    classe, disponivel = BACKENDS[nome]
+    if not disponivel:
+        raise ImportError(f'Backend de parsing "{nome}" não está instalado')
+    return classe()
+
+
+def _backend_padrao():
+    """BOOKS_PARSER escolhe o backend; sem ele, o mais rápido instalado"""
+    nome = os.getenv('BOOKS_PARSER')
+    if nome:
+        return criar_parser(nome)
+    for nome in ('selectolax', 'lxml', 'bs4'):
+        if BACKENDS[nome][1]:
+            return criar_parser(nome)
+
+
+_parser = _backend_padrao()
+
+
+def definir_backend(nome):
+    """Troca o backend usado por extrair_listagem/extrair_atributos_livro"""
+    global _parser
+    _parser = criar_parser(nome)
+    return _parser
+
+
+def backend_atual():
+    return _parser.nome
+
+
+def eh_pagina_de_livro(html):
+    """Diferencia a página de detalhe de um livro de uma página de listagem"""
+    return 'product_page' in html
+
+
+def extrair_listagem(html, url_pagina):
+    """Links (absolutos) dos livros, total de páginas e se existe próxima página"""
+    return _parser.listagem(html, url_pagina)
+
+
+def extrair_atributos_livro(html, link):
+    """Extrai os atributos de um livro a partir do HTML da página de detalhe"""
+    return _parser.livro(html, link)
+
+
+def _paginas_salvas(diretorio, url_base):
+    """
+    (url, html) das páginas salvas: de um arquivo do loader (books_data.arquivo)
+    ou de arquivos .html, com a URL reconstruída a partir do caminho
+    """
+    if os.path.exists(os.path.join(diretorio, 'indice.sqlite')):
+        from books_data.arquivo import ArquivoPaginas
+        arquivo = ArquivoPaginas(diretorio)
+        try:
+            for cabecalho, conteudo in arquivo.registros():
+                yield cabecalho['url'], conteudo.decode('utf-8')
+        finally:
+            arquivo.fechar()
+        return
+
+    for raiz, _, arquivos in sorted(os.walk(diretorio)):
+        for arquivo in sorted(arquivos):
+            if arquivo.endswith('.html'):
+                caminho = os.path.join(raiz, arquivo)
+                with open(caminho, encoding='utf-8') as f:
+                    yield urljoin(url_base, os.path.relpath(caminho, diretorio).replace(os.sep, '/')), f.read()
+
+
+def _extrair(parser, url, html):
+    if eh_pagina_de_livro(html):
+        return parser.livro(html, url)
+    return parser.listagem(html, url)._asdict()
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import time
+
+    parser = argparse.ArgumentParser(description='Compara e mede os backends de parsing em páginas salvas do site')
+    parser.add_argument('diretorio', help='Arquivo de páginas do loader ou diretório com .html salvos (mesma estrutura do site)')
+    parser.add_argument('--base-url', default='https://books.toscrape.com/')
+    parser.add_argument('--golden', help='JSON com a extração esperada; é criado com o backend bs4 se não existir')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    paginas = list(_paginas_salvas(args.diretorio, args.base_url))
+    megabytes = sum(len(html.encode('utf-8')) for _, html in paginas) / 1e6
+
+    if args.golden and os.path.exists(args.golden):
+        with open(args.golden, encoding='utf-8') as f:
+            esperado = json.load(f)
+    else:
+        referencia = ParserBS4()
+        esperado = {url: _extrair(referencia, url, html) for url, html in paginas}
+        if args.golden:
+            with open(args.golden, 'w', encoding='utf-8') as f:
+                json.dump(esperado, f, ensure_ascii=False, indent=1)
+            print(f'Golden gravado em {args.golden} ({len(esperado)} páginas)')
+
+    divergencias = 0
+    print(f'{len(paginas)} páginas ({megabytes:.1f} MB)')
+    for nome in backends_disponiveis():
+        backend = criar_parser(nome)
+        diferentes = [url for url, html in paginas if _extrair(backend, url, html) != esperado.get(url)]
+        divergencias += len(diferentes)
+
+        inicio = time.perf_counter()
+        for _ in range(args.repeticoes):
+            for url, html in paginas:
+                _extrair(backend, url, html)
+        duracao = (time.perf_counter() - inicio) / args.repeticoes
+
+        print(f'{nome:<12} {len(paginas) / duracao:>10,.0f} páginas/s {megabytes / duracao:>8.1f} MB/s  divergências: {len(diferentes)}')
+        for url in diferentes[:5]:
+            print(f'    {url}')
+
+    raise SystemExit(1 if divergencias else 0)
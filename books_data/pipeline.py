@@ -0,0 +1,414 @@
+#Carga em pipeline: busca (asyncio) -> parse (processos) -> gravação (um escritor em lote)
+import asyncio
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from handsome_log import get_logger
+
+from books_data.crawler import urls_de_listagem
+from books_data.incremental import hash_html, hash_livro
+from books_data.parsers import (
+    backend_atual, definir_backend, eh_pagina_de_livro, extrair_atributos_livro, extrair_listagem,
+)
+
+logger = get_logger(__name__)
+
+
+_FIM = object()
+
+
+def _iniciar_processo(backend):
+    definir_backend(backend)
+
+
+def _parsear(html, link):
+    """Roda no processo de parse; retorna o livro e o tempo gasto"""
+    inicio = time.perf_counter()
+    livro = extrair_atributos_livro(html, link)
+    return livro, time.perf_counter() - inicio
+
+
+class Etapa:
+    """Contadores de uma etapa do pipeline"""
+
+    def __init__(self, nome, trabalhadores):
+        self.nome = nome
+        self.trabalhadores = trabalhadores
+        self.processados = 0
+        self.erros = 0
+        self.ocupado = 0.0
+
+    def resumo(self, duracao):
+        return {
+            'processados': self.processados,
+            'erros': self.erros,
+            'por_segundo': round(self.processados / duracao, 1) if duracao else 0.0,
+            # Fração do tempo em que os trabalhadores da etapa estiveram ocupados;
+            # a etapa mais próxima de 1 é o gargalo
+            'utilizacao': round(self.ocupado / (self.trabalhadores * duracao), 3) if duracao else 0.0,
+        }
+
+
+class Fila(asyncio.Queue):
+    """asyncio.Queue limitada que registra a maior profundidade atingida"""
+
+    def __init__(self, nome, maxsize):
+        super().__init__(maxsize)
+        self.nome = nome
+        self.profundidade_maxima = 0
+
+    async def put(self, item):
+        await super().put(item)
+        self.profundidade_maxima = max(self.profundidade_maxima, self.qsize())
+
+
+class PipelineCarga:
+    """
+    Três etapas ligadas por filas limitadas: `concorrencia` tarefas de busca,
+    `processos` processos de parse e um único escritor em lote. Uma fila cheia
+    faz a etapa anterior esperar (backpressure), então a memória fica limitada
+    e a carga anda no ritmo da etapa mais lenta.
+
+    Com um CacheIncremental, as buscas são condicionais (ETag/Last-Modified) e
+    páginas com HTML ou campos iguais aos da última carga não seguem adiante.
+    `gravados` são os links que já estão completos no banco: só esses podem ser
+    pulados, então um banco truncado ou restaurado volta a receber os livros.
+
+    Com uma Fronteira, os links vêm dela (inclusive as páginas de listagem, que
+    alimentam a própria fronteira) e cada URL só é marcada como concluída depois
+    que o lote do livro foi commitado.
+    """
+
+    def __init__(self, crawler, escritor, processos=None, tamanho_fila=256, intervalo_relatorio=5.0,
+                 incremental=None, fronteira=None, espera_maxima_commit=2.0, metricas=None, gravados=None):
+        self.crawler = crawler
+        self.escritor = escritor
+        self.metricas = metricas
+        self.incremental = incremental
+        # None: confia no cache sem conferir o banco
+        self.gravados = gravados
+        self.fronteira = fronteira
+        self.ignorados = {'nao_modificado': 0, 'html_identico': 0, 'livro_identico': 0}
+        self.listagens = 0
+        # (link, registro do cache) dos livros no buffer do escritor, confirmados após o commit
+        self._pendentes_commit = []
+        self._links = deque()
+        self._url_inicial = None
+        self._listagens_em_andamento = 0
+        self.processos = os.cpu_count() if processos is None else processos
+        self.intervalo_relatorio = intervalo_relatorio
+        self.espera_maxima_commit = espera_maxima_commit
+
+        self.paginas = Fila('páginas', tamanho_fila)
+        self.livros = Fila('livros', tamanho_fila)
+        self.busca = Etapa('busca', crawler.concorrencia_maxima if crawler is not None else 1)
+        self.parse = Etapa('parse', max(self.processos, 1))
+        self.escrita = Etapa('escrita', 1)
+        self.erros_por_link = {}
+
+    def _concluir(self, itens):
+        """Marca (link, registro) como concluídos no cache incremental e na fronteira"""
+        if self.incremental is not None:
+            registros = [registro for _, registro in itens if registro is not None]
+            if registros:
+                self.incremental.registrar(registros)
+        if self.fronteira is not None:
+            self.fronteira.concluir([link for link, _ in itens])
+
+    def _anterior(self, link):
+        """Registro do cache incremental do link, se ele puder ser usado para pular o livro"""
+        if self.incremental is None:
+            return None
+        if self.gravados is not None and link not in self.gravados:
+            # O livro não está no banco (truncado, restaurado ou outro destino): busca e grava de novo
+            return None
+        return self.incremental.obter(link)
+
+    def _falhar(self, etapa, link, erro, mensagem):
+        etapa.erros += 1
+        if self.metricas is not None:
+            self.metricas.registrar_erro(etapa.nome, erro)
+        self.erros_por_link[link] = erro
+        if self.fronteira is not None:
+            self.fronteira.falhar(link, erro)
+        logger.error(f"{mensagem} {link}: {erro}")
+
+    async def _proximo_link(self):
+        """Próximo (link, tipo) a buscar; None quando não há mais trabalho"""
+        if self.fronteira is None:
+            return (self._links.popleft(), 'livro') if self._links else None
+
+        while not self._links:
+            self._links.extend(self.fronteira.reivindicar(self.busca.trabalhadores * 4))
+            if self._links:
+                break
+            # Nada disponível agora, mas uma listagem em andamento (aqui ou em outro
+            # processo) ainda pode descobrir links
+            if not self._listagens_em_andamento and not self.fronteira.tem_trabalho_de_outros():
+                return None
+            await asyncio.sleep(1.0)
+        return self._links.popleft()
+
+    async def _buscar_listagem(self, url):
+        """Página de listagem (modo fronteira): registra os livros e, na primeira, as demais páginas"""
+        self._listagens_em_andamento += 1
+        try:
+            listagem = extrair_listagem(await self.crawler.buscar(url), url)
+        except Exception as e:
+            self._falhar(self.busca, url, e, 'Não foi possível processar a listagem')
+            return
+        finally:
+            self._listagens_em_andamento -= 1
+        self.listagens += 1
+        novos = self.fronteira.adicionar(listagem.links, 'livro')
+        if url == self._url_inicial and listagem.total_paginas:
+            self.fronteira.adicionar(urls_de_listagem(url, listagem.total_paginas), 'listagem')
+        self.fronteira.concluir([url])
+        logger.success(f'{url}: {novos} livros novos na fronteira')
+
+    async def _buscar(self):
+        while (proximo := await self._proximo_link()) is not None:
+            link, tipo = proximo
+            if tipo == 'listagem':
+                await self._buscar_listagem(link)
+                continue
+
+            anterior = self._anterior(link)
+            cabecalhos = self.incremental.cabecalhos_condicionais(anterior) if self.incremental else None
+            inicio = time.perf_counter()
+            try:
+                resposta = await self.crawler.buscar_resposta(link, cabecalhos)
+            except Exception as e:
+                self._falhar(self.busca, link, e, 'Não foi possível buscar o livro')
+                continue
+            finally:
+                self.busca.ocupado += time.perf_counter() - inicio
+
+            if resposta.status_code == 304:
+                self.ignorados['nao_modificado'] += 1
+                self._concluir([(link, None)])
+                continue
+            self.busca.processados += 1
+
+            # O site não informa o charset; o conteúdo é UTF-8
+            html = resposta.content.decode('utf-8')
+            validadores = (resposta.headers.get('ETag'), resposta.headers.get('Last-Modified'), hash_html(html))
+            if anterior is not None and anterior['hash_html'] == validadores[2]:
+                self.ignorados['html_identico'] += 1
+                self._concluir([(link, (link, *validadores, anterior['hash_livro']))])
+                continue
+            await self.paginas.put((link, html, validadores))
+
+    async def _parsear(self, pool):
+        loop = asyncio.get_running_loop()
+        while (item := await self.paginas.get()) is not _FIM:
+            link, html, validadores = item
+            try:
+                if pool is None:
+                    livro, duracao = _parsear(html, link)
+                else:
+                    livro, duracao = await loop.run_in_executor(pool, _parsear, html, link)
+            except Exception as e:
+                self._falhar(self.parse, link, e, 'Não foi possível pegar a info do livro')
+                continue
+            self.parse.ocupado += duracao
+            self.parse.processados += 1
+            if self.metricas is not None:
+                self.metricas.registrar_parse(duracao)
+
+            registro = None
+            if self.incremental is not None:
+                registro = (link, *validadores, hash_livro(livro))
+                anterior = self._anterior(link)
+                if anterior is not None and anterior['hash_livro'] == registro[4]:
+                    self.ignorados['livro_identico'] += 1
+                    self._concluir([(link, registro)])
+                    continue
+            await self.livros.put((link, livro, registro))
+
+    async def _gravar(self):
+        fim = False
+        while not fim:
+            try:
+                primeiro = await asyncio.wait_for(self.livros.get(), self.espera_maxima_commit)
+            except asyncio.TimeoutError:
+                # Fila parada: commita o buffer para que nada fique reivindicado sem ser
+                # gravado (outros processos podem estar esperando essas URLs)
+                inicio = time.perf_counter()
+                await asyncio.to_thread(self._flush_escritor)
+                self.escrita.ocupado += time.perf_counter() - inicio
+                continue
+
+            # Junta o que já estiver na fila para uma única ida à thread do banco
+            lote = [primeiro]
+            while not self.livros.empty():
+                lote.append(self.livros.get_nowait())
+            if lote[-1] is _FIM:
+                lote.pop()
+                fim = True
+
+            inicio = time.perf_counter()
+            await asyncio.to_thread(self._adicionar, lote)
+            self.escrita.ocupado += time.perf_counter() - inicio
+            self.escrita.processados += len(lote)
+
+        inicio = time.perf_counter()
+        await asyncio.to_thread(self._fechar_escritor)
+        self.escrita.ocupado += time.perf_counter() - inicio
+
+    def _adicionar(self, lote):
+        for link, livro, registro in lote:
+            self._pendentes_commit.append((link, registro))
+            # adicionar() devolve as linhas alteradas quando o lote foi commitado
+            if self.escritor.adicionar(livro) is not None:
+                self._confirmar_commit()
+
+    def _flush_escritor(self):
+        self.escritor.flush()
+        self._confirmar_commit()
+
+    def _fechar_escritor(self):
+        self.escritor.fechar()
+        self._confirmar_commit()
+
+    def _confirmar_commit(self):
+        if self._pendentes_commit:
+            self._concluir(self._pendentes_commit)
+        self._pendentes_commit = []
+
+    async def _relatar(self, inicio):
+        anteriores = (0, 0, 0)
+        while True:
+            await asyncio.sleep(self.intervalo_relatorio)
+            atuais = (self.busca.processados, self.parse.processados, self.escrita.processados)
+            taxas = [(a - b) / self.intervalo_relatorio for a, b in zip(atuais, anteriores)]
+            anteriores = atuais
+            logger.info(
+                f'[{time.perf_counter() - inicio:.0f}s] '
+                f'busca {taxas[0]:.0f}/s | fila páginas {self.paginas.qsize()}/{self.paginas.maxsize} | '
+                f'parse {taxas[1]:.0f}/s | fila livros {self.livros.qsize()}/{self.livros.maxsize} | '
+                f'escrita {taxas[2]:.0f}/s ({atuais[2]} no escritor)'
+            )
+
+    async def _ler_arquivo(self, arquivo):
+        """Replay: as páginas de livro arquivadas entram no pipeline no lugar das buscas"""
+        registros = arquivo.registros()
+        while True:
+            inicio = time.perf_counter()
+            registro = next(registros, None)
+            self.busca.ocupado += time.perf_counter() - inicio
+            if registro is None:
+                return
+            cabecalho, conteudo = registro
+            html = conteudo.decode('utf-8')
+            if not eh_pagina_de_livro(html):
+                continue
+            self.busca.processados += 1
+            await self.paginas.put((cabecalho['url'], html, (None, None, None)))
+
+    async def executar(self, links):
+        """Roda o pipeline sobre uma lista de links de livros e retorna o relatório por etapa"""
+        self._links.extend(links)
+        return await self._executar([self._buscar() for _ in range(self.busca.trabalhadores)])
+
+    async def executar_fronteira(self, url_inicial):
+        """
+        Roda o pipeline sobre a fronteira, começando (ou retomando) pela página
+        inicial do site, e retorna o relatório por etapa. Uma fronteira cuja
+        varredura já terminou é zerada e o site é percorrido de novo
+        """
+        self._url_inicial = url_inicial
+        if self.fronteira.iniciar(url_inicial):
+            logger.info('A varredura anterior da fronteira já tinha terminado; começando uma nova')
+        return await self._executar([self._buscar() for _ in range(self.busca.trabalhadores)])
+
+    async def executar_pendentes(self, links):
+        """
+        Enriquecimento: os links pendentes viram a fila da fronteira e cada processo
+        reivindica lotes dela, então vários consumidores dividem o trabalho e o que
+        um processo interrompido deixou é retomado pelos outros ou pela próxima execução
+        """
+        disponiveis = self.fronteira.sincronizar(links, 'livro')
+        logger.info(f'{disponiveis} livros pendentes disponíveis na fronteira')
+        return await self._executar([self._buscar() for _ in range(self.busca.trabalhadores)])
+
+    async def executar_arquivo(self, arquivo):
+        """Recarrega os livros de um ArquivoPaginas, sem rede, e retorna o relatório por etapa"""
+        self.busca.nome = 'arquivo'
+        return await self._executar([self._ler_arquivo(arquivo)])
+
+    async def _executar(self, produtores):
+        inicio = time.perf_counter()
+        pool = None
+        if self.processos > 0:
+            pool = ProcessPoolExecutor(
+                max_workers=self.processos, mp_context=get_context('spawn'),
+                initializer=_iniciar_processo, initargs=(backend_atual(),),
+            )
+
+        # Duas tarefas por processo mantêm os processos ocupados enquanto uma espera a fila
+        coordenadores = self.processos * 2 if pool is not None else 1
+        relator = asyncio.create_task(self._relatar(inicio))
+        buscadores = [asyncio.create_task(produtor) for produtor in produtores]
+        parsers = [asyncio.create_task(self._parsear(pool)) for _ in range(coordenadores)]
+        escritor = asyncio.create_task(self._gravar())
+        tarefas = buscadores + parsers + [escritor]
+
+        async def encerrar_em_ordem():
+            await asyncio.gather(*buscadores)
+            for _ in parsers:
+                await self.paginas.put(_FIM)
+            await asyncio.gather(*parsers)
+            await self.livros.put(_FIM)
+
+        try:
+            # Se o escritor falhar (ex.: banco fora do ar) o gather propaga na hora,
+            # em vez de deixar as outras etapas presas em filas cheias
+            await asyncio.gather(encerrar_em_ordem(), escritor)
+        finally:
+            relator.cancel()
+            for tarefa in tarefas:
+                tarefa.cancel()
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+            if self.fronteira is not None:
+                liberados = self.fronteira.liberar()
+                if liberados:
+                    logger.warning(f'{liberados} URLs não concluídas devolvidas à fronteira')
+
+        duracao = time.perf_counter() - inicio
+        relatorio = {
+            'duracao_segundos': round(duracao, 2),
+            'etapas': {etapa.nome: etapa.resumo(duracao) for etapa in (self.busca, self.parse, self.escrita)},
+            'profundidade_maxima': {fila.nome: fila.profundidade_maxima for fila in (self.paginas, self.livros)},
+        }
+        if self.incremental is not None:
+            relatorio['ignorados'] = dict(self.ignorados)
+        if self.crawler is not None and self.crawler.controle.adaptativo:
+            relatorio['concorrencia'] = {**self.crawler.controle.resumo(), 'historico': self.crawler.controle.historico}
+        if self.fronteira is not None:
+            relatorio['listagens'] = self.listagens
+            relatorio['fronteira'] = self.fronteira.contagem()
+        gargalo = max(relatorio['etapas'], key=lambda nome: relatorio['etapas'][nome]['utilizacao'])
+        relatorio['gargalo'] = gargalo
+
+        for nome, resumo in relatorio['etapas'].items():
+            logger.info(f"{nome:<8} {resumo['processados']:>6} ok {resumo['erros']:>4} erros "
+                        f"{resumo['por_segundo']:>8.1f}/s utilização {resumo['utilizacao']:.0%}")
+        if self.incremental is not None:
+            logger.info(f"Incremental: {self.ignorados['nao_modificado']} não modificados (304), "
+                        f"{self.ignorados['html_identico']} com HTML idêntico, "
+                        f"{self.ignorados['livro_identico']} com campos idênticos; "
+                        f"{self.busca.processados} baixados, {self.parse.processados} extraídos, "
+                        f"{self.escrita.processados} enviados para gravação")
+        if 'concorrencia' in relatorio:
+            resumo = self.crawler.controle.resumo()
+            logger.info(f"Concorrência: final {resumo['final']}, entre {resumo['minimo']} e {resumo['maximo']} "
+                        f"em {resumo['janelas']} janelas")
+        if self.fronteira is not None:
+            logger.info(f"Fronteira: {relatorio['fronteira']}")
+        logger.success(f'Pipeline concluído em {duracao:.1f}s; etapa mais ocupada: {gargalo}')
+        return relatorio
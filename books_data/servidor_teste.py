@@ -0,0 +1,175 @@
+#Servidor local que imita o Books to Scrape, com latência e falhas injetadas (para testar o loader)
+import hashlib
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ESTRELAS = ['One', 'Two', 'Three', 'Four', 'Five']
+CATEGORIAS = ['Poetry', 'Travel', 'Mystery', 'Historical Fiction', 'Science', 'Romance']
+POR_PAGINA = 20
+
+
+def _catalogo(paginas, semente=1):
+    aleatorio = random.Random(semente)
+    livros = []
+    for i in range(paginas * POR_PAGINA):
+        livros.append({
+            'slug': f'livro-{i}_{i + 1}',
+            'titulo': f'Livro de teste número {i}',
+            'preco': round(10 + aleatorio.random() * 50, 2),
+            'estrela': aleatorio.choice(ESTRELAS),
+            'categoria': aleatorio.choice(CATEGORIAS),
+            'estoque': aleatorio.randint(1, 22),
+            'upc': f'{i:016x}',
+        })
+    return livros
+
+
+def _pagina_listagem(livros, pagina, total):
+    prefixo = 'catalogue/' if pagina == 1 else ''
+    pods = ''.join(f'''
+<li><article class="product_pod">
+<div class="image_container"><a href="{prefixo}{livro['slug']}/index.html"><img src="../media/cache/{livro['slug']}.jpg" alt="{livro['titulo']}" class="thumbnail"></a></div>
+<p class="star-rating {livro['estrela']}"><i class="icon-star"></i></p>
+<h3><a href="{prefixo}{livro['slug']}/index.html" title="{livro['titulo']}">{livro['titulo'][:20]}...</a></h3>
+<div class="product_price"><p class="price_color">£{livro['preco']:.2f}</p>
+<p class="instock availability"><i class="icon-ok"></i>
+    In stock
+</p></div></article></li>''' for livro in livros)
+    proxima = f'<li class="next"><a href="{prefixo}page-{pagina + 1}.html">next</a></li>' if pagina < total else ''
+    return f'''<!DOCTYPE html><html lang="en-us"><head><meta charset="utf-8"><title>All products</title></head><body>
+<div class="page_inner"><ul class="breadcrumb"><li><a href="index.html">Home</a></li><li class="active">All products</li></ul>
+<section><ol class="row">{pods}</ol>
+<div><ul class="pager"><li class="current">
+    Page {pagina} of {total}
+</li>{proxima}</ul></div></section></div></body></html>'''
+
+
+def _pagina_livro(livro):
+    return f'''<!DOCTYPE html><html lang="en-us"><head><title>{livro['titulo']} | Books to Scrape - Sandbox</title>
+<meta name="description" content="
+    Sinopse do {livro['titulo']}. ...more
+">
+</head><body><div class="container-fluid page"><div class="page_inner">
+<ul class="breadcrumb"><li><a href="../../index.html">Home</a></li><li><a href="../category/books_1/index.html">Books</a></li>
+<li><a href="../category/books/x_2/index.html">{livro['categoria']}</a></li><li class="active">{livro['titulo']}</li></ul>
+<div class="content"><div id="content_inner"><article class="product_page"><div class="row">
+<div class="col-sm-6"><div id="product_gallery"><img src="../../media/cache/{livro['slug']}.jpg" alt="{livro['titulo']}" /></div></div>
+<div class="col-sm-6 product_main"><h1>{livro['titulo']}</h1>
+<p class="price_color">£{livro['preco']:.2f}</p>
+<p class="instock availability"><i class="icon-ok"></i>
+        In stock ({livro['estoque']} available)
+</p>
+<p class="star-rating {livro['estrela']}"><i class="icon-star"></i></p></div></div>
+<div id="product_description" class="sub-header"><h2>Product Description</h2></div>
+<p>Sinopse do {livro['titulo']}.</p>
+<table class="table table-striped">
+<tr><th>UPC</th><td>{livro['upc']}</td></tr>
+<tr><th>Product Type</th><td>Books</td></tr>
+<tr><th>Availability</th><td>In stock ({livro['estoque']} available)</td></tr>
+<tr><th>Number of reviews</th><td>0</td></tr>
+</table></article></div></div></div></div></body></html>'''
+
+
+class ServidorThreads(ThreadingHTTPServer):
+    """Threads das conexões não seguram o processo no fim (sem mudar a classe da stdlib)"""
+    daemon_threads = True
+
+
+class SiteSimulado:
+    """
+    Gera as páginas em memória e simula um servidor que sofre com carga: acima de
+    `capacidade` requisições simultâneas a latência cresce proporcionalmente, acima
+    de `limite_429` a resposta é 429 (Retry-After: 1) e `taxa_falhas` das
+    requisições recebem 503.
+    """
+
+    def __init__(self, paginas=50, latencia=0.05, capacidade=16, limite_429=None, taxa_falhas=0.0):
+        self.latencia = latencia
+        self.capacidade = capacidade
+        self.limite_429 = limite_429
+        self.taxa_falhas = taxa_falhas
+        self.em_voo = 0
+        self._lock = threading.Lock()
+        self.contagem = {}
+
+        livros = _catalogo(paginas)
+        self.paginas = {}
+        for pagina in range(1, paginas + 1):
+            trecho = livros[(pagina - 1) * POR_PAGINA:pagina * POR_PAGINA]
+            caminho = '/' if pagina == 1 else f'/catalogue/page-{pagina}.html'
+            self.paginas[caminho] = _pagina_listagem(trecho, pagina, paginas).encode('utf-8')
+        self.paginas['/index.html'] = self.paginas['/']
+        for livro in livros:
+            self.paginas[f"/catalogue/{livro['slug']}/index.html"] = _pagina_livro(livro).encode('utf-8')
+
+    def responder(self, caminho, if_none_match):
+        """(status, cabeçalhos, corpo) após simular a latência do servidor"""
+        with self._lock:
+            self.em_voo += 1
+            em_voo = self.em_voo
+        try:
+            time.sleep(self.latencia * max(1.0, em_voo / self.capacidade))
+            if self.limite_429 is not None and em_voo > self.limite_429:
+                return 429, {'Retry-After': '1'}, b''
+            if random.random() < self.taxa_falhas:
+                return 503, {}, b''
+
+            corpo = self.paginas.get(caminho)
+            if corpo is None:
+                return 404, {}, b''
+            etag = '"' + hashlib.md5(corpo).hexdigest() + '"'
+            if if_none_match == etag:
+                return 304, {'ETag': etag}, b''
+            return 200, {'ETag': etag, 'Content-Type': 'text/html'}, corpo
+        finally:
+            with self._lock:
+                self.em_voo -= 1
+
+    def servidor(self, host='127.0.0.1', porta=8765):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                caminho = re.sub(r'/+', '/', self.path.split('?')[0])
+                status, cabecalhos, corpo = site.responder(caminho, self.headers.get('If-None-Match'))
+                with site._lock:
+                    site.contagem[status] = site.contagem.get(status, 0) + 1
+                self.send_response(status)
+                for nome, valor in cabecalhos.items():
+                    self.send_header(nome, valor)
+                self.send_header('Content-Length', str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, *args):
+                pass
+
+        return ServidorThreads((host, porta), Handler)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Books to Scrape simulado, com latência e falhas injetadas')
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--paginas', type=int, default=50, help='Páginas de listagem (20 livros cada)')
+    parser.add_argument('--latencia', type=float, default=0.05, help='Latência base por requisição (segundos)')
+    parser.add_argument('--capacidade', type=int, default=16, help='Requisições simultâneas antes da latência subir')
+    parser.add_argument('--limite-429', type=int, default=None, help='Acima disso, responde 429')
+    parser.add_argument('--taxa-falhas', type=float, default=0.0, help='Fração de respostas 503')
+    args = parser.parse_args()
+
+    site = SiteSimulado(args.paginas, args.latencia, args.capacidade, args.limite_429, args.taxa_falhas)
+    servidor = site.servidor(porta=args.porta)
+    print(f'Servindo {len(site.paginas)} páginas em http://127.0.0.1:{args.porta}/')
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f'Respostas por status: {site.contagem}')
@@ -0,0 +1,326 @@
+#Gravação dos livros em lote: COPY para uma tabela temporária + um único upsert
+import hashlib
+import io
+import json
+import time
+
+from handsome_log import get_logger
+from psycopg2.extras import execute_values
+
+logger = get_logger(__name__)
+
+
+COLUNAS = [
+    'upc_livro', 'titulo', 'imagem', 'categoria', 'valor_principal_em_euros',
+    'inventario', 'review', 'sinopse', 'num_reviews', 'link'
+]
+
+# Canal do LISTEN/NOTIFY avisado a cada lote confirmado (ver registrar_versao)
+CANAL_VERSOES = 'livros_alterados'
+
+# Capa já baixada (books_data/imagens.py) só continua valendo se a URL não mudou
+_IMAGEM_SHA256 = "CASE WHEN {tabela}.imagem IS NOT DISTINCT FROM EXCLUDED.imagem THEN {tabela}.imagem_sha256 END"
+
+_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def _valor_copy(valor):
+    """Formata um valor para o formato texto do COPY (\\N = NULL)"""
+    if valor is None:
+        return '\\N'
+    return str(valor).translate(_ESCAPES)
+
+
+def registrar_versao(cur, upcs, origem):
+    """
+    Registra uma nova versão do dataset com os UPCs alterados e avisa quem está
+    em LISTEN no canal CANAL_VERSOES. Roda na transação de quem gravou: versão e
+    aviso só existem (e o NOTIFY só é entregue) depois do commit.
+    Retorna o número da versão, ou None se nada mudou.
+
+    O número vem de uma sequência, sorteada no INSERT e não no commit: com vários
+    loaders, o lote que pegou v11 poderia confirmar antes do v10, e o listener
+    (que lê `versao > última vista`) pularia o v10. O advisory lock, tomado antes
+    do nextval e mantido até o fim da transação, faz as versões serem confirmadas
+    na ordem dos números.
+    """
+    upcs = sorted(set(upcs))
+    if not upcs:
+        return None
+    # Lock e INSERT no mesmo comando: também vale em autocommit (um comando = uma transação)
+    cur.execute("""
+        WITH trava AS (SELECT pg_advisory_xact_lock(hashtext('livros_versoes')))
+        INSERT INTO livros_versoes (upcs, origem)
+        SELECT %s, %s FROM trava
+        RETURNING versao
+    """, (upcs, origem))
+    versao = cur.fetchone()[0]
+    # O payload do NOTIFY é limitado (8000 bytes): os UPCs ficam na tabela
+    cur.execute("SELECT pg_notify(%s, %s)", (CANAL_VERSOES, json.dumps({'versao': versao, 'total': len(upcs)})))
+    return versao
+
+
+def gravar_categorias(cur, origem='livros_staging', parametros=None, tabela_categorias='categorias'):
+    """
+    Cadastra em `tabela_categorias` os nomes de `origem` (tabela ou subconsulta com a
+    coluna categoria) que ainda não existem. Em ordem alfabética, para que
+    processos gravando ao mesmo tempo não travem um esperando o outro.
+    """
+    cur.execute(f"""
+        INSERT INTO {tabela_categorias} (nome)
+        SELECT DISTINCT o.categoria
+        FROM {origem} o
+        WHERE o.categoria <> ''
+          AND NOT EXISTS (SELECT 1 FROM {tabela_categorias} c WHERE c.nome = o.categoria)
+        ORDER BY o.categoria
+        ON CONFLICT (nome) DO NOTHING
+    """, parametros)
+
+
+class EscritorLivros:
+    """
+    Acumula livros e grava em lotes: cada lote vai via COPY para uma tabela
+    temporária e entra em `tabela` com um único INSERT ... ON CONFLICT DO UPDATE,
+    que só atualiza as linhas cujos valores mudaram. Cada lote é uma transação,
+    e com `versoes` um lote que alterou algo gera uma versão do dataset.
+    """
+
+    def __init__(self, con, tamanho_lote=500, tabela='livros', versoes=True, metricas=None,
+                 tabela_categorias='categorias'):
+        if con.autocommit:
+            raise ValueError('EscritorLivros precisa de uma conexão sem autocommit')
+        self.con = con
+        self.tamanho_lote = tamanho_lote
+        self.tabela = tabela
+        self.tabela_categorias = tabela_categorias
+        self.versoes = versoes
+        self.versao = None
+        # MetricasCarga opcional: duração e linhas de cada lote
+        self.metricas = metricas
+        self.buffer = []
+        self.inseridos = 0
+        self.atualizados = 0
+        self.inalterados = 0
+
+        with self.con.cursor() as cur:
+            cur.execute(f"""
+                CREATE TEMP TABLE IF NOT EXISTS livros_staging
+                (LIKE {self.tabela} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS
+            """)
+        self.con.commit()
+
+    def adicionar(self, livro):
+        self.buffer.append(livro)
+        if len(self.buffer) >= self.tamanho_lote:
+            return self.flush()
+        return None
+
+    def flush(self):
+        """Grava o lote atual; retorna a lista de (upc, inserido) das linhas alteradas"""
+        if not self.buffer:
+            return []
+
+        inicio = time.perf_counter()
+        dados = io.StringIO()
+        for livro in self.buffer:
+            dados.write('\t'.join(_valor_copy(livro.get(coluna)) for coluna in COLUNAS))
+            dados.write('\n')
+        dados.seek(0)
+
+        lista_colunas = ', '.join(COLUNAS)
+        atualizacoes = ',\n'.join(f'{c} = EXCLUDED.{c}' for c in COLUNAS[1:])
+        atuais = ', '.join(f'{self.tabela}.{c}' for c in COLUNAS[1:])
+        novos = ', '.join(f'EXCLUDED.{c}' for c in COLUNAS[1:])
+
+        try:
+            with self.con.cursor() as cur:
+                cur.copy_expert(f"COPY livros_staging ({lista_colunas}) FROM STDIN", dados)
+                # Linhas provisórias do modo rápido (só listagem) dão lugar ao livro completo,
+                # que herda a capa já baixada quando a URL é a mesma
+                cur.execute(f"""
+                    WITH provisorios AS (
+                        DELETE FROM {self.tabela} t
+                        USING livros_staging s
+                        WHERE t.link = s.link AND t.detalhes_pendentes
+                        RETURNING t.upc_livro, t.link, t.imagem, t.imagem_sha256
+                    ), capas AS (
+                        UPDATE livros_staging s SET imagem_sha256 = p.imagem_sha256
+                        FROM provisorios p
+                        WHERE s.link = p.link AND s.imagem IS NOT DISTINCT FROM p.imagem
+                    )
+                    SELECT upc_livro FROM provisorios
+                """)
+                provisorios = [upc for (upc,) in cur.fetchall()]
+                gravar_categorias(cur, tabela_categorias=self.tabela_categorias)
+                cur.execute(f"""
+                    UPDATE livros_staging s SET categoria_id = c.id
+                    FROM {self.tabela_categorias} c
+                    WHERE c.nome = s.categoria
+                """)
+                cur.execute(f"""
+                    INSERT INTO {self.tabela} ({lista_colunas}, categoria_id, imagem_sha256)
+                    SELECT DISTINCT ON (upc_livro) {lista_colunas}, categoria_id, imagem_sha256
+                    FROM livros_staging
+                    ORDER BY upc_livro
+                    ON CONFLICT (upc_livro) DO UPDATE SET
+                        {atualizacoes},
+                        categoria_id = EXCLUDED.categoria_id,
+                        imagem_sha256 = {_IMAGEM_SHA256.format(tabela=self.tabela)}
+                    WHERE ({atuais}, {self.tabela}.categoria_id) IS DISTINCT FROM ({novos}, EXCLUDED.categoria_id)
+                    RETURNING upc_livro, (xmax = 0) AS inserido
+                """)
+                alterados = cur.fetchall()
+                if self.versoes:
+                    versao = registrar_versao(cur, provisorios + [upc for upc, _ in alterados], 'carga')
+                    self.versao = versao or self.versao
+            self.con.commit()
+        except Exception:
+            self.con.rollback()
+            raise
+
+        inseridos = sum(1 for _, inserido in alterados if inserido)
+        inalterados = len({livro['upc_livro'] for livro in self.buffer}) - len(alterados)
+        self.inseridos += inseridos
+        self.atualizados += len(alterados) - inseridos
+        self.inalterados += inalterados
+        if self.metricas is not None:
+            self.metricas.registrar_escrita(time.perf_counter() - inicio, inseridos, len(alterados) - inseridos, inalterados)
+        logger.info(f'Lote gravado: {len(self.buffer)} livros ({inseridos} novos, {len(alterados) - inseridos} atualizados)')
+
+        self.buffer = []
+        return alterados
+
+    def fechar(self):
+        self.flush()
+        versao = f'; versão do dataset: {self.versao}' if self.versao else ''
+        logger.success(f'Gravação concluída: {self.inseridos} novos, {self.atualizados} atualizados, '
+                       f'{self.inalterados} inalterados{versao}')
+
+
+def upc_provisorio(link):
+    """UPC de um livro conhecido só pela listagem; trocado pelo real no enriquecimento"""
+    return 'pendente-' + hashlib.md5(link.encode('utf-8')).hexdigest()[:16]
+
+
+def gravar_resumos(con, resumos, tabela='livros', versoes=True):
+    """
+    Modo rápido: cria/atualiza livros a partir dos resumos das listagens (chave: link),
+    numa única transação. Livros novos entram com UPC provisório e detalhes_pendentes;
+    nos já completos só preço, título, avaliação e disponibilidade são atualizados.
+    Com `versoes`, registra uma versão do dataset com os livros alterados. Retorna (inseridos, atualizados).
+    """
+    linhas = [(
+        upc_provisorio(resumo['link']),
+        resumo['titulo'],
+        resumo['imagem'],
+        resumo['valor_principal_em_euros'],
+        # A listagem só diz se há estoque: sem estoque é 0, com estoque a quantidade fica pendente
+        None if resumo['disponivel'] else 0,
+        resumo['review'],
+        resumo['link'],
+    ) for resumo in resumos]
+
+    try:
+        with con.cursor() as cur:
+            alterados = execute_values(cur, f"""
+                INSERT INTO {tabela} (
+                    upc_livro, titulo, imagem, valor_principal_em_euros,
+                    inventario, review, link, detalhes_pendentes
+                )
+                SELECT upc_livro, titulo, imagem, euros::double precision,
+                       inventario::integer, review, link, TRUE
+                FROM (VALUES %s) AS v (upc_livro, titulo, imagem, euros, inventario, review, link)
+                ON CONFLICT (link) DO UPDATE SET
+                    titulo = EXCLUDED.titulo,
+                    imagem = CASE WHEN {tabela}.detalhes_pendentes THEN EXCLUDED.imagem ELSE {tabela}.imagem END,
+                    imagem_sha256 = CASE WHEN {tabela}.detalhes_pendentes
+                        THEN {_IMAGEM_SHA256.format(tabela=tabela)} ELSE {tabela}.imagem_sha256 END,
+                    valor_principal_em_euros = EXCLUDED.valor_principal_em_euros,
+                    inventario = COALESCE(EXCLUDED.inventario, NULLIF({tabela}.inventario, 0)),
+                    review = EXCLUDED.review
+                WHERE ({tabela}.titulo, {tabela}.valor_principal_em_euros, {tabela}.review, {tabela}.inventario = 0)
+                    IS DISTINCT FROM (EXCLUDED.titulo, EXCLUDED.valor_principal_em_euros, EXCLUDED.review,
+                                      EXCLUDED.inventario = 0)
+                RETURNING upc_livro, (xmax = 0) AS inserido
+            """, linhas, page_size=1000, fetch=True)
+            if versoes:
+                registrar_versao(cur, [upc for upc, _ in alterados], 'listagem')
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+
+    inseridos = sum(1 for _, inserido in alterados if inserido)
+    return inseridos, len(alterados) - inseridos
+
+
+def _livros_sinteticos(quantidade, rodada=0):
+    return [{
+        'upc_livro': f'bench{i:011d}',
+        'titulo': f'Livro de benchmark {i}',
+        'imagem': f'https://books.toscrape.com/media/cache/{i}.jpg',
+        'categoria': f'Categoria {i % 50}',
+        'valor_principal_em_euros': round(10 + (i * 7 + rodada) % 50 + 0.99, 2),
+        'inventario': i % 22,
+        'review': ['One', 'Two', 'Three', 'Four', 'Five'][i % 5],
+        'sinopse': f'Sinopse\tcom caracteres\nespeciais \\ do livro {i}',
+        'num_reviews': 0,
+        'link': f'https://books.toscrape.com/catalogue/livro_{i}/index.html',
+    } for i in range(quantidade)]
+
+
+def benchmark(quantidade, tamanho_lote):
+    """Compara linhas/s do upsert linha a linha (autocommit) com o escritor em lote"""
+    from books_data.loader_data import conectar, salvar_livro
+
+    # Tabelas descartáveis: o benchmark não toca em livros nem em categorias
+    tabela = 'livros_benchmark'
+    tabela_categorias = 'categorias_benchmark'
+    cenarios = [('inserção', 0), ('atualização', 1), ('sem mudanças', 1)]
+    con_auto = conectar()
+    con_lote = conectar(autocommit=False)
+
+    def linha_a_linha(livros):
+        with con_auto.cursor() as cur:
+            for livro in livros:
+                salvar_livro(cur, livro, tabela=tabela, tabela_categorias=tabela_categorias)
+
+    def em_lote(livros):
+        escritor = EscritorLivros(con_lote, tamanho_lote=tamanho_lote, tabela=tabela, versoes=False,
+                                  tabela_categorias=tabela_categorias)
+        for livro in livros:
+            escritor.adicionar(livro)
+        escritor.flush()
+
+    try:
+        with con_auto.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {tabela}, {tabela_categorias}")
+            cur.execute(f"CREATE TABLE {tabela} (LIKE livros INCLUDING ALL)")
+            # Com sequência própria (LIKE copiaria o default da sequência de categorias)
+            cur.execute(f"CREATE TABLE {tabela_categorias} (id SERIAL PRIMARY KEY, nome TEXT NOT NULL UNIQUE)")
+
+        for caminho, gravar in [('linha a linha', linha_a_linha), (f'COPY em lotes de {tamanho_lote}', em_lote)]:
+            with con_auto.cursor() as cur:
+                cur.execute(f"TRUNCATE {tabela}, {tabela_categorias}")
+            for descricao, rodada in cenarios:
+                livros = _livros_sinteticos(quantidade, rodada)
+                inicio = time.perf_counter()
+                gravar(livros)
+                linhas_s = quantidade / (time.perf_counter() - inicio)
+                print(f'{caminho:<24} {descricao:<14} {linhas_s:>10,.0f} linhas/s')
+    finally:
+        with con_auto.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {tabela}, {tabela_categorias}")
+        con_lote.close()
+        con_auto.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark da gravação de livros no Postgres')
+    parser.add_argument('--linhas', type=int, default=5000)
+    parser.add_argument('--lote', type=int, default=500)
+    args = parser.parse_args()
+
+    benchmark(args.linhas, args.lote)
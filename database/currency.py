@@ -0,0 +1,122 @@
+from database.connection import get_connection
+from decimal import Decimal, ROUND_CEILING, ROUND_FLOOR
+from typing import Dict, Optional, Tuple
+import threading
+import time
+
+
+# Por quanto tempo as cotações lidas são reaproveitadas sem consultar o banco
+RATES_TTL_SECONDS = 60
+
+# Os preços são guardados em euros; as demais moedas vêm da tabela cotacoes
+BASE_CURRENCY = 'EUR'
+
+# Nomes aceitos nos parâmetros da API além dos códigos ISO (EUR, BRL, USD...)
+CURRENCY_ALIASES = {'euros': 'EUR', 'reais': 'BRL'}
+
+# Coluna com o preço original (euros) na tabela livros
+PRICE_COLUMN = 'valor_principal_em_euros'
+
+
+class CurrencyRates:
+    """
+    Cotações vigentes (quantas unidades de cada moeda valem 1 euro), lidas da
+    tabela cotacoes: para cada moeda vale a linha mais recente com
+    vigente_desde <= hoje, então uma cotação pode ser cadastrada com antecedência.
+
+    Os preços em outras moedas são calculados na consulta (ver price_sql), e não
+    guardados por linha: mudar uma cotação não reescreve a tabela livros.
+    """
+
+    def __init__(self, ttl_seconds: float = RATES_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._rates: Optional[Dict[str, float]] = None
+        self._checked_at = 0.0
+
+    def _load(self) -> Dict[str, float]:
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT DISTINCT ON (moeda) moeda, por_euro
+                FROM cotacoes
+                WHERE vigente_desde <= CURRENT_DATE
+                ORDER BY moeda, vigente_desde DESC
+            """)
+            rates = {code: float(rate) for code, rate in cursor.fetchall()}
+        finally:
+            conn.close()
+        rates[BASE_CURRENCY] = 1.0
+        return rates
+
+    def rates(self) -> Dict[str, float]:
+        """Cotação vigente de cada moeda configurada (EUR sempre 1.0)"""
+        with self._lock:
+            if self._rates is None or time.monotonic() - self._checked_at > self.ttl_seconds:
+                self._rates = self._load()
+                self._checked_at = time.monotonic()
+            return self._rates
+
+    def invalidate(self):
+        with self._lock:
+            self._rates = None
+
+    def resolve(self, currency: str) -> Tuple[str, float]:
+        """(código, cotação) de uma moeda ou apelido; ValueError se não configurada"""
+        code = CURRENCY_ALIASES.get(currency.lower(), currency.upper())
+        rates = self.rates()
+        if code not in rates:
+            available = ', '.join(sorted(set(rates) | set(CURRENCY_ALIASES)))
+            raise ValueError(f"Currency '{currency}' is not configured. Available: {available}")
+        return code, rates[code]
+
+    def rate(self, currency: str) -> Optional[float]:
+        """Cotação vigente da moeda, ou None se não houver nenhuma configurada"""
+        try:
+            return self.resolve(currency)[1]
+        except ValueError:
+            return None
+
+    def price_sql(self, currency: str, column: str = PRICE_COLUMN, required: bool = True) -> str:
+        """
+        Expressão SQL do preço na moeda pedida, arredondado a 2 casas. Com
+        required=False, moeda sem cotação vigente vira NULL em vez de ValueError
+        (colunas derivadas que não podem derrubar a consulta inteira).
+        """
+        if required:
+            _, rate = self.resolve(currency)
+        else:
+            rate = self.rate(currency)
+            if rate is None:
+                return "NULL::double precision"
+        if rate == 1.0:
+            return column
+        # A cotação vem do banco (float), não do usuário: pode ir literal no SQL
+        return f"ROUND(({column} * {rate!r})::numeric, 2)::double precision"
+
+    def euro_bounds(self, currency: str, min_price: Optional[float] = None,
+                    max_price: Optional[float] = None) -> Tuple[Optional[float], Optional[float], bool]:
+        """
+        Limites em euros equivalentes a min <= preço exibido <= max, para filtrar
+        pela coluna em euros (e o índice). Como o preço exibido é arredondado a
+        centavos (price_sql), cada limite ganha meio centavo de folga; o superior
+        passa a ser exclusivo. Retorna (mínimo, máximo, máximo_inclusivo).
+        """
+        _, rate = self.resolve(currency)
+        if rate == 1.0:
+            return min_price, max_price, True
+        # Meio centavo exato arredonda para cima (ROUND): os dois limites descem um
+        # fio, senão o erro da divisão em float decide o empate
+        tie = 1 - 1e-12
+        lower = upper = None
+        if min_price is not None:
+            cents = Decimal(str(min_price)).quantize(Decimal('0.01'), rounding=ROUND_CEILING)
+            lower = float(cents - Decimal('0.005')) / rate * tie
+        if max_price is not None:
+            cents = Decimal(str(max_price)).quantize(Decimal('0.01'), rounding=ROUND_FLOOR)
+            upper = float(cents + Decimal('0.005')) / rate * tie
+        return lower, upper, False
+
+
+currency_rates = CurrencyRates()
@@ -0,0 +1,130 @@
+from database.connection import get_connection
+from typing import Callable, List, Optional
+import select
+import threading
+
+import psycopg2
+
+
+# Canal em que o loader (books_data/writer.py) avisa cada lote confirmado
+CHANNEL = 'livros_alterados'
+
+# Intervalo entre tentativas de reconexão ao banco
+RECONNECT_SECONDS = 5.0
+
+# callback(version, upcs): upcs None significa "qualquer livro pode ter mudado"
+ChangeCallback = Callable[[int, Optional[List[str]]], None]
+
+
+class DatasetChangeListener:
+    """
+    Thread que escuta (LISTEN) as versões do dataset publicadas pelo loader e
+    repassa a cada inscrito o número da versão e os UPCs alterados.
+
+    Os UPCs são lidos da tabela livros_versoes, e não do payload: a cada aviso
+    (ou reconexão) são buscadas todas as versões posteriores à última vista,
+    então nenhum lote se perde mesmo que um NOTIFY não chegue. Enquanto a
+    conexão está caída (e na primeira conexão) os inscritos recebem upcs=None;
+    `connected` indica se os avisos estão chegando.
+    """
+
+    def __init__(self, channel: str = CHANNEL, reconnect_seconds: float = RECONNECT_SECONDS):
+        self.channel = channel
+        self.reconnect_seconds = reconnect_seconds
+        self.connected = False
+        self.last_version: Optional[int] = None
+        self.notifications = 0
+        self._callbacks: List[ChangeCallback] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, callback: ChangeCallback):
+        self._callbacks.append(callback)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='dataset-listener', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def status(self) -> dict:
+        return {
+            'connected': self.connected,
+            'last_version': self.last_version,
+            'notifications': self.notifications,
+        }
+
+    def _dispatch(self, version: int, upcs: Optional[List[str]]):
+        for callback in self._callbacks:
+            try:
+                callback(version, upcs)
+            except Exception as e:
+                print(f"Erro ao processar a versão {version} do dataset: {e}")
+
+    def _catch_up(self, cursor):
+        """
+        Repassa as versões posteriores à última vista, em ordem. Basta guardar a
+        maior: o loader confirma as versões na ordem dos números (advisory lock em
+        registrar_versao), então nenhuma menor aparece depois.
+        """
+        if self.last_version is None:
+            cursor.execute("SELECT COALESCE(MAX(versao), 0) FROM livros_versoes")
+            self.last_version = cursor.fetchone()[0]
+            # Sem histórico do que o processo já tinha em cache: descarta tudo uma vez
+            self._dispatch(self.last_version, None)
+            return
+
+        cursor.execute(
+            "SELECT versao, upcs FROM livros_versoes WHERE versao > %s ORDER BY versao",
+            (self.last_version,)
+        )
+        for version, upcs in cursor.fetchall():
+            self.last_version = version
+            self._dispatch(version, list(upcs))
+
+    def _listen(self):
+        conn = get_connection()
+        try:
+            conn.autocommit = True
+            cursor = conn.cursor()
+            cursor.execute(f"LISTEN {self.channel}")
+            # Depois do LISTEN: o que foi confirmado antes aparece no catch-up, o resto chega como aviso
+            self._catch_up(cursor)
+            self.connected = True
+
+            while not self._stop.is_set():
+                if select.select([conn], [], [], 1.0) == ([], [], []):
+                    continue
+                conn.poll()
+                if conn.notifies:
+                    # Vários avisos seguidos viram uma única leitura da tabela
+                    self.notifications += len(conn.notifies)
+                    conn.notifies.clear()
+                    self._catch_up(cursor)
+        finally:
+            self.connected = False
+            conn.close()
+
+    def _run(self):
+        failing = False
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except (psycopg2.Error, OSError) as e:
+                if not failing:
+                    print(f"Listener do dataset sem conexão ({e}); tentando a cada {self.reconnect_seconds:.0f}s")
+                    # Avisos podem se perder enquanto desconectado: quem tem cache descarta tudo
+                    self._dispatch(self.last_version or 0, None)
+                failing = True
+                self._stop.wait(self.reconnect_seconds)
+            else:
+                failing = False
+
+
+dataset_listener = DatasetChangeListener()
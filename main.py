@@ -6,11 +6,14 @@ from fastapi.security import OAuth2PasswordBearer
 #Modulos
 #Banco de dados
 from database.connection import get_connection
+from database.notifications import dataset_listener
 
 #API
 from api.crud import get_generic_livros, get_livro_by_id, search_livros, get_all_categories, get_top_rated_books, get_books_by_price_range
 from api.stats import get_overview_stats, get_category_stats
 from api.health import check_health
+from api.cache import book_cache
+from api.images import router as images_router
 
 #Auth
 from auth.endpoints import router as auth_router, get_current_active_user
@@ -18,6 +21,8 @@ from models.auth import User
 
 #ML
 from ml.endpoints import router as ml_router
+from ml.model import model_registry
+from ml.dataset_version import dataset_version
 
 #Modelos Pydantic
 from models.livros import Livro_Generico, Response_Livro_Generico, Response_Categories, HealthCheck, Response_Price_Range
@@ -25,13 +30,31 @@ from models.stats_responses import OverviewStats, CategoryStatsResponse
 
 #typing
 from typing import Annotated, Optional
+from contextlib import asynccontextmanager
+
+
+#Carrega recursos compartilhados uma vez por worker
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        model_registry.load()
+    except Exception as e:
+        print(f"Não foi possível carregar o modelo de ML: {e}")
+    
+    #Avisos do loader (LISTEN/NOTIFY) invalidam os caches que dependem dos livros
+    dataset_listener.subscribe(dataset_version.on_change)
+    dataset_listener.subscribe(book_cache.on_change)
+    dataset_listener.start()
+    yield
+    dataset_listener.stop()
 
 #criando o app
-app = FastAPI(title="API Books to Scrape", redirect_slashes=False)
+app = FastAPI(title="API Books to Scrape", redirect_slashes=False, lifespan=lifespan)
 
 #Incluindo routers
 app.include_router(auth_router)
 app.include_router(ml_router)
+app.include_router(images_router)
 
 #Função health normal da API
 @app.get("/health")
@@ -63,11 +86,12 @@ def listar_books(
 def search_books(
     title: Optional[str] = Query(None, description="Search by book title"),
     category: Optional[str] = Query(None, description="Search by book category"),
+    category_id: Optional[int] = Query(None, description="Exact category id (see /api/v1/categories)"),
     limit: int = Query(25, le=50, description="Number of results to return"),
     offset: int = Query(0, ge=0, description="Number of results to skip"),
     current_user: User = Depends(get_current_active_user)
 ):
-    return search_livros(title=title, category=category, limit=limit, offset=offset)
+    return search_livros(title=title, category=category, category_id=category_id, limit=limit, offset=offset)
 
 #ENDPOINT -- Retorna os livros mais bem avaliados
 @app.get("/api/v1/books/top-rated", response_model=Response_Livro_Generico)
@@ -83,12 +107,15 @@ def top_rated_books(
 def books_by_price_range(
     min: Optional[float] = Query(None, description="Minimum price"),
     max: Optional[float] = Query(None, description="Maximum price"),
-    currency: str = Query("euros", description="Currency: 'euros' or 'reais'"),
+    currency: str = Query("euros", description="Currency: 'euros', 'reais' or any ISO code in the cotacoes table"),
     limit: int = Query(25, le=50, description="Number of results to return"),
     offset: int = Query(0, ge=0, description="Number of results to skip"),
     current_user: User = Depends(get_current_active_user)
 ):
-    return get_books_by_price_range(min_price=min, max_price=max, currency=currency, limit=limit, offset=offset)
+    try:
+        return get_books_by_price_range(min_price=min, max_price=max, currency=currency, limit=limit, offset=offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 #ENDPOINT -- Retorna um livro específico pelo ID
 @app.get("/api/v1/books/{id}", response_model=Livro_Generico)
@@ -110,10 +137,22 @@ def health_check():
 
 #ENDPOINT -- Retorna estatísticas gerais da API
 @app.get("/api/v1/stats/overview", response_model=OverviewStats)
-def stats_overview(current_user: User = Depends(get_current_active_user)):
-    return get_overview_stats()
+def stats_overview(
+    currency: Optional[str] = Query(None, description="Also report prices in this currency (e.g. 'USD')"),
+    current_user: User = Depends(get_current_active_user)
+):
+    try:
+        return get_overview_stats(currency=currency)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 #ENDPOINT -- Retorna estatísticas por categoria
 @app.get("/api/v1/stats/categories", response_model=CategoryStatsResponse)
-def stats_categories(current_user: User = Depends(get_current_active_user)):
-    return get_category_stats()
\ No newline at end of file
+def stats_categories(
+    currency: Optional[str] = Query(None, description="Also report prices in this currency (e.g. 'USD')"),
+    current_user: User = Depends(get_current_active_user)
+):
+    try:
+        return get_category_stats(currency=currency)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
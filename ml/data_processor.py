@@ -1,16 +1,46 @@
 from database.connection import get_connection
+from database.currency import currency_rates
+from ml.vocabulary import vocabulary_store
+from ml.sampling import SplitSpec, NO_SPLIT, build_eligible_query, build_source_query
+from ml.parallel import map_row_ranges, use_parallel
+from ml.state import ml_state
 from models.ml_responses import BookFeature, MLFeatures, TrainingRecord, TrainingDataset
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Tuple, Optional, Iterator
 import psycopg2.extras
+import numpy as np
 import statistics
 from datetime import datetime
+import json
 import re
 
+FEATURE_COLUMNS = [
+    'titulo_length', 'categoria_encoded', 'preco_euros_normalized',
+    'preco_reais_normalized', 'review_score', 'titulo_word_count',
+    'has_discount', 'price_category'
+]
+
+FEATURE_DESCRIPTIONS = {
+    'titulo_length': 'Número de caracteres no título',
+    'titulo_word_count': 'Número de palavras no título',
+    'categoria_encoded': 'Categoria codificada numericamente',
+    'preco_euros_normalized': 'Preço em euros normalizado (z-score)',
+    'preco_reais_normalized': 'Preço em reais normalizado (z-score)',
+    'review_score': 'Score da avaliação (1-5)',
+    'has_discount': 'Se o livro tem desconto (preço < 80% da média)',
+    'price_category': 'Categoria de preço (budget/mid/premium)',
+    'target_popular': 'Variável alvo - se o livro é popular (review >= 4 e preço <= mediana)'
+}
+
+
+def _compute_partition(raw: Dict[str, Any], reference: Dict[str, Any], category_mapping: Dict[str, int],
+                       with_target: bool) -> Dict[str, np.ndarray]:
+    """Tarefa do process pool: monta as colunas de uma faixa de linhas"""
+    return MLDataProcessor()._compute_columns(raw, reference, category_mapping, with_target)
+
 class MLDataProcessor:
     """Classe para processamento de dados para Machine Learning"""
     
     def __init__(self):
-        self.category_mapping = {}
         self.review_mapping = {
             'One': 1, 'Two': 2, 'Three': 3, 'Four': 4, 'Five': 5
         }
@@ -20,44 +50,254 @@ class MLDataProcessor:
             'premium': (50, float('inf'))
         }
     
-    def _get_raw_data(self) -> List[Dict[str, Any]]:
+    def _get_raw_data(self, limit: Optional[int] = None, split: SplitSpec = NO_SPLIT) -> List[Dict[str, Any]]:
         """Busca dados brutos do banco de dados"""
-        sql = """
+        sql, params = build_source_query(split)
+        conn = get_connection()
+        try:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            cursor.execute(sql, params + [limit])
+            return [dict(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+    
+    def _fetch_columns(self, sql: str, params: List) -> Dict[str, tuple]:
+        """Executa a consulta e transpõe o resultado em colunas (sem dicts por linha)"""
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+        
+        names = ['upc_livro', 'titulo', 'categoria', 'preco_euros', 'preco_reais', 'review', 'link']
+        if not rows:
+            return {name: () for name in names}
+        return dict(zip(names, zip(*rows)))
+    
+    def _get_raw_columns(self, limit: Optional[int] = 1000, split: SplitSpec = NO_SPLIT) -> Dict[str, tuple]:
+        """Busca dados brutos já transpostos em colunas"""
+        sql, params = build_source_query(split)
+        return self._fetch_columns(sql, params + [limit])
+    
+    def _get_reference_stats(self, cursor, split: SplitSpec = NO_SPLIT) -> Dict[str, Any]:
+        """
+        Mapeamentos, estatísticas de normalização e mediana do target, com uma única
+        consulta agregada sobre todos os elegíveis (antes da partição e do limit).
+        Treino e teste usam a mesma escala e o mesmo limiar, que é também a mediana
+        usada pela divisão estratificada no SQL.
+        """
+        sql, params = build_eligible_query(split)
+        cursor.execute(f"""
+            WITH eligible AS ({sql})
+            SELECT
+                AVG(valor_principal_em_euros),
+                STDDEV_SAMP(valor_principal_em_euros),
+                AVG(COALESCE(valor_principal_em_reais, 0)),
+                STDDEV_SAMP(COALESCE(valor_principal_em_reais, 0)),
+                PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY valor_principal_em_euros),
+                ARRAY(SELECT DISTINCT categoria FROM eligible WHERE categoria != '')
+            FROM eligible
+        """, params)
+        euros_mean, euros_std, reais_mean, reais_std, median_price, categories = cursor.fetchone()
+        
+        return {
+            'vocabulary': vocabulary_store.ensure('categoria', categories),
+            'price_stats': {
+                'euros': (float(euros_mean or 0.0), float(euros_std) if euros_std else 1.0),
+                'reais': (float(reais_mean or 0.0), float(reais_std) if reais_std else 1.0)
+            },
+            'median_price': float(median_price or 0.0)
+        }
+    
+    def _load_reference_stats(self, split: SplitSpec = NO_SPLIT) -> Dict[str, Any]:
+        conn = get_connection()
+        try:
+            return self._get_reference_stats(conn.cursor(), split)
+        finally:
+            conn.close()
+    
+    def _get_source_stats(self, cursor, limit: Optional[int], split: SplitSpec = NO_SPLIT) -> Dict[str, Any]:
+        """Estatísticas de referência mais o total de registros da partição pedida"""
+        stats = self._get_reference_stats(cursor, split)
+        sql, params = build_source_query(split)
+        cursor.execute(f"SELECT COUNT(*) FROM ({sql}) base", params + [limit])
+        stats['total_records'] = cursor.fetchone()[0]
+        return stats
+    
+    def _price_category_codes(self, prices: np.ndarray) -> np.ndarray:
+        """Retorna o código (0=budget, 1=mid, 2=premium) de cada preço"""
+        upper_bounds = [upper for _, upper in self.price_categories.values()][:-1]
+        return np.searchsorted(upper_bounds, prices, side='left')
+    
+    def price_category_of(self, price: float) -> str:
+        """Categoria de preço de um único valor (mesmas faixas das versões vetorizada e SQL)"""
+        for label, (_, upper) in self.price_categories.items():
+            if price <= upper:
+                return label
+        return label
+    
+    def price_category_sql(self, column: str) -> str:
+        """Expressão SQL CASE equivalente às faixas de self.price_categories"""
+        whens = [f"WHEN {column} <= {upper} THEN '{label}'"
+                 for label, (_, upper) in self.price_categories.items() if upper != float('inf')]
+        last_label = list(self.price_categories)[-1]
+        return f"CASE WHEN {column} IS NULL THEN NULL {' '.join(whens)} ELSE '{last_label}' END"
+    
+    def price_category_labels(self, prices: np.ndarray) -> np.ndarray:
+        """Retorna a categoria de preço (budget/mid/premium) de cada preço"""
+        labels = np.array(list(self.price_categories.keys()))
+        return labels[self._price_category_codes(prices)] if len(prices) else np.array([], dtype=str)
+    
+    def _compute_columns(self, raw: Dict[str, tuple], reference: Dict[str, Any], category_mapping: Dict[str, int],
+                         with_target: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Calcula as features de forma vetorizada, coluna a coluna, normalizadas com as
+        estatísticas de referência (_get_reference_stats)
+        """
+        n = len(raw['upc_livro'])
+        titulos = raw['titulo']
+        
+        euros = np.fromiter((float(v or 0) for v in raw['preco_euros']), dtype=np.float64, count=n)
+        reais = np.fromiter((float(v or 0) for v in raw['preco_reais']), dtype=np.float64, count=n)
+        
+        euros_mean, euros_std = reference['price_stats']['euros']
+        reais_mean, reais_std = reference['price_stats']['reais']
+        
+        columns = {
+            'upc_livro': np.array(raw['upc_livro'], dtype=str),
+            'categoria': np.array(raw['categoria'], dtype=str),
+            'titulo_length': np.fromiter((len(t) for t in titulos), dtype=np.int32, count=n),
+            'titulo_word_count': np.fromiter((len(t.split()) for t in titulos), dtype=np.int32, count=n),
+            'categoria_encoded': np.fromiter((category_mapping.get(c, 0) for c in raw['categoria']),
+                                             dtype=np.int32, count=n),
+            'preco_euros_normalized': np.round((euros - euros_mean) / euros_std, 4) if euros_std > 0 else np.zeros(n),
+            'preco_reais_normalized': np.round((reais - reais_mean) / reais_std, 4) if reais_std > 0 else np.zeros(n),
+            'review_score': np.fromiter((self.review_mapping.get(r, 0) for r in raw['review']), dtype=np.int8, count=n),
+            'has_discount': euros < euros_mean * 0.8,
+            'price_category': self.price_category_labels(euros),
+        }
+        
+        if with_target:
+            columns['titulo'] = np.array(titulos, dtype=str)
+            columns['preco_euros'] = euros
+            columns['preco_reais'] = reais
+            columns['review'] = np.array([r or '' for r in raw['review']], dtype=str)
+            columns['target_popular'] = (columns['review_score'] >= 4) & (euros <= reference['median_price'])
+        
+        return columns
+    
+    def _columns_metadata(self, vocabulary, reference: Dict[str, Any], with_target: bool) -> Dict[str, Any]:
+        euros_mean, euros_std = reference['price_stats']['euros']
+        reais_mean, reais_std = reference['price_stats']['reais']
+        schema_metadata = {
+            'categorical_mappings': vocabulary.as_dict(),
+            'vocabulary_version': vocabulary.version,
+            'normalization_stats': {
+                'preco_euros': {'mean': euros_mean, 'std': euros_std},
+                'preco_reais': {'mean': reais_mean, 'std': reais_std}
+            },
+            'generated_at': datetime.now().isoformat(),
+            'data_source': 'livros_table'
+        }
+        if with_target:
+            schema_metadata['target_variable'] = 'target_popular'
+        return schema_metadata
+    
+    def _output_dtypes(self, raw: Dict[str, tuple], with_target: bool) -> Dict[str, np.dtype]:
+        """Tipos das colunas de _compute_columns (as de texto com a largura que np.array daria)"""
+        def text(values):
+            return np.dtype(f'<U{max(1, max(map(len, values), default=0))}')
+        
+        dtypes = {
+            'upc_livro': text(raw['upc_livro']),
+            'categoria': text(raw['categoria']),
+            'titulo_length': np.int32,
+            'titulo_word_count': np.int32,
+            'categoria_encoded': np.int32,
+            'preco_euros_normalized': np.float64,
+            'preco_reais_normalized': np.float64,
+            'review_score': np.int8,
+            'has_discount': np.bool_,
+            'price_category': np.array(list(self.price_categories)).dtype,
+        }
+        if with_target:
+            dtypes.update({
+                'titulo': text(raw['titulo']),
+                'preco_euros': np.float64,
+                'preco_reais': np.float64,
+                'review': text([r or '' for r in raw['review']]),
+                'target_popular': np.bool_,
+            })
+        return {column: np.dtype(dtype) for column, dtype in dtypes.items()}
+    
+    def compute_columns(self, raw: Dict[str, tuple], reference: Dict[str, Any], category_mapping: Dict[str, int],
+                        with_target: bool = False, workers: int = 1) -> Dict[str, np.ndarray]:
+        """
+        _compute_columns no próprio processo ou, com mais de um worker, em faixas de
+        linhas no process pool a partir de cópias das colunas em memória compartilhada
+        """
+        if not use_parallel(len(raw['upc_livro']), workers):
+            return self._compute_columns(raw, reference, category_mapping, with_target)
+        
+        strings = {column: raw[column] for column in ('upc_livro', 'titulo', 'categoria', 'review')}
+        numbers = {column: np.nan_to_num(np.array(raw[column], dtype=np.float64))
+                   for column in ('preco_euros', 'preco_reais')}
+        shared = {'price_stats': reference['price_stats'], 'median_price': reference['median_price']}
+        return map_row_ranges(_compute_partition, (shared, dict(category_mapping), with_target),
+                              strings, numbers, self._output_dtypes(raw, with_target), workers)
+    
+    def _build_columns(self, raw: Dict[str, tuple], reference: Dict[str, Any], with_target: bool = False,
+                       workers: int = 1) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """Colunas e metadados das linhas buscadas (trabalho por linha em `workers` processos)"""
+        vocabulary = vocabulary_store.ensure('categoria', raw['categoria'])
+        columns = self.compute_columns(raw, reference, vocabulary.mappings['categoria'], with_target, workers)
+        return columns, self._columns_metadata(vocabulary, reference, with_target)
+    
+    def _build_split_columns(self, limit: Optional[int], split: SplitSpec, with_target: bool,
+                             workers: int) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """Busca uma única vez as linhas da partição pedida e monta as colunas"""
+        return self._build_columns(self._get_raw_columns(limit, split), self._load_reference_stats(split),
+                                   with_target, workers)
+    
+    def get_feature_columns(self, limit: int = 1000, workers: int = 1,
+                            split: SplitSpec = NO_SPLIT) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """Gera as features em formato colunar (arrays NumPy) junto com os metadados"""
+        with ml_state.track('feature_columns'):
+            columns, metadata = self._build_split_columns(limit, split, with_target=False, workers=workers)
+        if split != NO_SPLIT:
+            metadata['train_test_split_info'] = split.describe()
+        return columns, metadata
+    
+    def get_training_columns(self, limit: int = 1000, split: SplitSpec = NO_SPLIT,
+                             workers: int = 1) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """Gera o dataset de treinamento em formato colunar (arrays NumPy) junto com os metadados"""
+        with ml_state.track('training_columns'):
+            columns, metadata = self._build_split_columns(limit, split, with_target=True, workers=workers)
+        metadata['train_test_split_info'] = split.describe()
+        return columns, metadata
+    
+    def get_columns_for_upcs(self, upcs: List[str]) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """Gera as colunas (com target) apenas dos livros informados"""
+        sql = f"""
             SELECT
                 upc_livro,
                 titulo,
                 categoria,
                 valor_principal_em_euros,
-                valor_principal_em_reais,
+                {currency_rates.price_sql('reais', required=False)} AS valor_principal_em_reais,
                 review,
                 link
             FROM livros
-            WHERE titulo IS NOT NULL 
+            WHERE upc_livro = ANY(%s)
+            AND titulo IS NOT NULL 
             AND categoria IS NOT NULL 
             AND valor_principal_em_euros IS NOT NULL
-            ORDER BY titulo
         """
-        
-        conn = get_connection()
-        try:
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            cursor.execute(sql)
-            return [dict(row) for row in cursor.fetchall()]
-        finally:
-            conn.close()
-    
-    def _create_category_mapping(self, data: List[Dict[str, Any]]) -> Dict[str, int]:
-        """Cria mapeamento de categorias para valores numéricos"""
-        categories = set(row['categoria'] for row in data if row['categoria'])
-        return {cat: idx for idx, cat in enumerate(sorted(categories))}
-    
-    def _normalize_prices(self, prices: List[float]) -> Tuple[float, float]:
-        """Calcula estatísticas para normalização de preços"""
-        if not prices:
-            return 0.0, 1.0
-        mean_price = statistics.mean(prices)
-        stdev_price = statistics.stdev(prices) if len(prices) > 1 else 1.0
-        return mean_price, stdev_price
+        # Mesma referência do treino sem partição, e não só a dos livros pedidos
+        return self._build_columns(self._fetch_columns(sql, [list(upcs)]), self._load_reference_stats(),
+                                   with_target=True)
     
     def _extract_features(self, row: Dict[str, Any], 
                          category_mapping: Dict[str, int],
@@ -89,12 +329,7 @@ class MLDataProcessor:
         has_discount = preco_euros < euros_mean * 0.8  # Desconto se preço < 80% da média
         
         # Categoria de preço
-        if preco_euros <= 20:
-            price_category = 'budget'
-        elif preco_euros <= 50:
-            price_category = 'mid'
-        else:
-            price_category = 'premium'
+        price_category = self.price_category_of(preco_euros)
         
         return BookFeature(
             upc_livro=row['upc_livro'],
@@ -109,44 +344,59 @@ class MLDataProcessor:
             price_category=price_category
         )
     
+    def _build_training_record(self, row: Dict[str, Any],
+                               category_mapping: Dict[str, int],
+                               price_stats: Dict[str, Tuple[float, float]],
+                               median_price: float) -> TrainingRecord:
+        """Monta um registro de treinamento (features + target) a partir de uma linha"""
+        feature = self._extract_features(row, category_mapping, price_stats)
+        preco_euros = float(row['valor_principal_em_euros'] or 0)
+        
+        # Target variable - livro é popular se tem boa avaliação E preço acessível
+        target_popular = feature.review_score >= 4 and preco_euros <= median_price
+        
+        return TrainingRecord(
+            upc_livro=row['upc_livro'],
+            titulo=row['titulo'] or '',
+            categoria=row['categoria'],
+            preco_euros=preco_euros,
+            preco_reais=float(row['valor_principal_em_reais'] or 0),
+            review=row['review'],
+            titulo_length=feature.titulo_length,
+            titulo_word_count=feature.titulo_word_count,
+            categoria_encoded=feature.categoria_encoded,
+            preco_euros_normalized=feature.preco_euros_normalized,
+            preco_reais_normalized=feature.preco_reais_normalized,
+            review_score=feature.review_score,
+            has_discount=feature.has_discount,
+            price_category=feature.price_category,
+            target_popular=target_popular
+        )
+    
     def get_features(self, limit: int = 1000) -> MLFeatures:
         """Gera dataset de features para ML"""
         
         # Busca dados brutos
-        raw_data = self._get_raw_data()
-        
-        if limit:
-            raw_data = raw_data[:limit]
+        raw_data = self._get_raw_data(limit)
         
-        # Cria mapeamentos
-        self.category_mapping = self._create_category_mapping(raw_data)
+        # Vocabulário compartilhado (acrescenta categorias novas, se houver)
+        vocabulary = vocabulary_store.ensure('categoria', (row['categoria'] for row in raw_data))
+        category_mapping = vocabulary.mappings['categoria']
         
-        # Calcula estatísticas de preços
-        euros_prices = [float(row['valor_principal_em_euros'] or 0) for row in raw_data]
-        reais_prices = [float(row['valor_principal_em_reais'] or 0) for row in raw_data]
-        
-        price_stats = {
-            'euros': self._normalize_prices(euros_prices),
-            'reais': self._normalize_prices(reais_prices)
-        }
+        # Estatísticas de preços sobre todos os elegíveis
+        price_stats = self._load_reference_stats()['price_stats']
         
         # Extrai features
         features = []
         for row in raw_data:
             try:
-                feature = self._extract_features(row, self.category_mapping, price_stats)
+                feature = self._extract_features(row, category_mapping, price_stats)
                 features.append(feature)
             except Exception as e:
                 print(f"Erro ao processar linha {row.get('upc_livro', 'N/A')}: {e}")
                 continue
         
         # Metadados
-        feature_columns = [
-            'titulo_length', 'categoria_encoded', 'preco_euros_normalized',
-            'preco_reais_normalized', 'review_score', 'titulo_word_count',
-            'has_discount', 'price_category'
-        ]
-        
         normalization_stats = {
             'preco_euros': {
                 'mean': price_stats['euros'][0],
@@ -160,17 +410,14 @@ class MLDataProcessor:
         
         return MLFeatures(
             total_records=len(features),
-            feature_columns=feature_columns,
-            categorical_mappings={
-                'categoria': self.category_mapping,
-                'review': self.review_mapping,
-                'price_category': {'budget': 0, 'mid': 1, 'premium': 2}
-            },
+            feature_columns=FEATURE_COLUMNS,
+            categorical_mappings=vocabulary.as_dict(),
             normalization_stats=normalization_stats,
             features=features,
             metadata={
                 'generated_at': datetime.now().isoformat(),
                 'data_source': 'livros_table',
+                'vocabulary_version': vocabulary.version,
                 'preprocessing_applied': [
                     'category_encoding',
                     'price_normalization',
@@ -180,67 +427,30 @@ class MLDataProcessor:
             }
         )
     
-    def get_training_data(self, limit: int = 1000) -> TrainingDataset:
+    def get_training_data(self, limit: int = 1000, split: SplitSpec = NO_SPLIT) -> TrainingDataset:
         """Gera dataset para treinamento com target variable"""
         
-        # Busca dados brutos
-        raw_data = self._get_raw_data()
+        # Busca dados brutos (já restritos à partição pedida, se houver)
+        raw_data = self._get_raw_data(limit, split)
         
-        if limit:
-            raw_data = raw_data[:limit]
+        # Vocabulário compartilhado (acrescenta categorias novas, se houver)
+        vocabulary = vocabulary_store.ensure('categoria', (row['categoria'] for row in raw_data))
+        category_mapping = vocabulary.mappings['categoria']
         
-        # Cria mapeamentos
-        self.category_mapping = self._create_category_mapping(raw_data)
-        
-        # Calcula estatísticas
-        euros_prices = [float(row['valor_principal_em_euros'] or 0) for row in raw_data]
-        reais_prices = [float(row['valor_principal_em_reais'] or 0) for row in raw_data]
-        
-        price_stats = {
-            'euros': self._normalize_prices(euros_prices),
-            'reais': self._normalize_prices(reais_prices)
-        }
+        # Estatísticas sobre todos os elegíveis, não só a partição: treino e teste
+        # ficam na mesma escala e com o mesmo limiar de "popular"
+        reference = self._load_reference_stats(split)
+        price_stats = reference['price_stats']
         
         # Critério para "popular" - livros com review >= 4 e preço <= mediana
-        median_price = statistics.median(euros_prices) if euros_prices else 0
+        median_price = reference['median_price']
         
         # Gera registros de treinamento
         training_records = []
         for row in raw_data:
             try:
-                # Features básicas
-                titulo = row['titulo'] or ''
-                preco_euros = float(row['valor_principal_em_euros'] or 0)
-                preco_reais = float(row['valor_principal_em_reais'] or 0)
-                review_score = self.review_mapping.get(row['review'], 0)
-                
-                # Target variable - livro é popular se tem boa avaliação E preço acessível
-                target_popular = review_score >= 4 and preco_euros <= median_price
-                
-                # Features processadas
-                euros_mean, euros_std = price_stats['euros']
-                reais_mean, reais_std = price_stats['reais']
-                
-                record = TrainingRecord(
-                    upc_livro=row['upc_livro'],
-                    titulo=titulo,
-                    categoria=row['categoria'],
-                    preco_euros=preco_euros,
-                    preco_reais=preco_reais,
-                    review=row['review'],
-                    titulo_length=len(titulo),
-                    titulo_word_count=len(titulo.split()),
-                    categoria_encoded=self.category_mapping.get(row['categoria'], 0),
-                    preco_euros_normalized=round((preco_euros - euros_mean) / euros_std if euros_std > 0 else 0, 4),
-                    preco_reais_normalized=round((preco_reais - reais_mean) / reais_std if reais_std > 0 else 0, 4),
-                    review_score=review_score,
-                    has_discount=preco_euros < euros_mean * 0.8,
-                    price_category='budget' if preco_euros <= 20 else ('mid' if preco_euros <= 50 else 'premium'),
-                    target_popular=target_popular
-                )
-                
+                record = self._build_training_record(row, category_mapping, price_stats, median_price)
                 training_records.append(record)
-                
             except Exception as e:
                 print(f"Erro ao processar linha {row.get('upc_livro', 'N/A')}: {e}")
                 continue
@@ -271,21 +481,75 @@ class MLDataProcessor:
             train_test_split_info={
                 'recommended_train_size': 0.8,
                 'recommended_test_size': 0.2,
-                'stratify_by': 'target_popular'
-            },
-            feature_descriptions={
-                'titulo_length': 'Número de caracteres no título',
-                'titulo_word_count': 'Número de palavras no título',
-                'categoria_encoded': 'Categoria codificada numericamente',
-                'preco_euros_normalized': 'Preço em euros normalizado (z-score)',
-                'preco_reais_normalized': 'Preço em reais normalizado (z-score)',
-                'review_score': 'Score da avaliação (1-5)',
-                'has_discount': 'Se o livro tem desconto (preço < 80% da média)',
-                'price_category': 'Categoria de preço (budget/mid/premium)',
-                'target_popular': 'Variável alvo - se o livro é popular (review >= 4 e preço <= mediana)'
+                'stratify_by': 'target_popular',
+                **split.describe()
             },
+            feature_descriptions=FEATURE_DESCRIPTIONS,
             target_variable='target_popular',
             data=training_records,
             statistics=statistics_data,
             created_at=datetime.now()
-        )
\ No newline at end of file
+        )
+    
+    def stream_dataset(self, limit: Optional[int] = None, chunk_size: int = 500,
+                       with_target: bool = False, split: SplitSpec = NO_SPLIT) -> Iterator[str]:
+        """
+        Gera o dataset em NDJSON: um registro de cabeçalho seguido das linhas em blocos.
+        
+        Os mapeamentos e estatísticas vêm de uma consulta agregada inicial e as linhas
+        são lidas de um cursor server-side, então a memória usada não depende do limit.
+        """
+        conn = get_connection()
+        try:
+            stats = self._get_source_stats(conn.cursor(), limit, split)
+            vocabulary = stats['vocabulary']
+            category_mapping = vocabulary.mappings['categoria']
+            price_stats = stats['price_stats']
+            
+            header = {
+                'record_type': 'header',
+                'total_records': stats['total_records'],
+                'feature_columns': FEATURE_COLUMNS,
+                'categorical_mappings': vocabulary.as_dict(),
+                'vocabulary_version': vocabulary.version,
+                'normalization_stats': {
+                    'preco_euros': {'mean': price_stats['euros'][0], 'std': price_stats['euros'][1]},
+                    'preco_reais': {'mean': price_stats['reais'][0], 'std': price_stats['reais'][1]}
+                },
+                'generated_at': datetime.now().isoformat()
+            }
+            if with_target:
+                header['target_variable'] = 'target_popular'
+                header['feature_descriptions'] = FEATURE_DESCRIPTIONS
+                header['train_test_split_info'] = split.describe()
+            yield json.dumps(header, ensure_ascii=False) + '\n'
+            
+            # Cursor nomeado = cursor server-side, busca chunk_size linhas por vez
+            cursor = conn.cursor(name='ml_dataset_stream', cursor_factory=psycopg2.extras.RealDictCursor)
+            cursor.itersize = chunk_size
+            sql, params = build_source_query(split)
+            cursor.execute(sql, params + [limit])
+            
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                
+                lines = []
+                for row in rows:
+                    try:
+                        if with_target:
+                            record = self._build_training_record(row, category_mapping, price_stats, stats['median_price'])
+                        else:
+                            record = self._extract_features(row, category_mapping, price_stats)
+                        lines.append(record.model_dump_json())
+                    except Exception as e:
+                        print(f"Erro ao processar linha {row.get('upc_livro', 'N/A')}: {e}")
+                        continue
+                
+                if lines:
+                    yield '\n'.join(lines) + '\n'
+            
+            cursor.close()
+        finally:
+            conn.close()
@@ -0,0 +1,87 @@
+from database.connection import get_connection
+from database.notifications import dataset_listener
+from typing import List, Optional
+import threading
+import time
+
+import psycopg2.errors
+
+
+# Por quanto tempo a versão calculada é reaproveitada sem consultar o banco
+VERSION_TTL_SECONDS = 30
+
+
+class DatasetVersion:
+    """
+    Identifica o conteúdo atual da tabela livros, para chavear caches de ML.
+    
+    A versão é a última registrada pelo loader em livros_versoes ("v<n>"); sem
+    versões registradas, é um fingerprint (md5) de todas as linhas. Com o
+    listener conectado ela é atualizada pelos avisos do loader; sem ele, é
+    reconsultada no máximo uma vez a cada VERSION_TTL_SECONDS por processo.
+    """
+    
+    def __init__(self, ttl_seconds: float = VERSION_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._checked_at = 0.0
+    
+    def _fingerprint(self, cursor) -> str:
+        sql = """
+            SELECT
+                COUNT(*),
+                md5(string_agg(md5(concat_ws('|',
+                    upc_livro, titulo, categoria, valor_principal_em_euros,
+                    review, sinopse, link
+                )), '' ORDER BY upc_livro))
+            FROM livros
+        """
+        cursor.execute(sql)
+        total, fingerprint = cursor.fetchone()
+        return f"{total}-{(fingerprint or 'empty')[:12]}"
+    
+    def _compute(self) -> str:
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT MAX(versao) FROM livros_versoes")
+                latest = cursor.fetchone()[0]
+            except psycopg2.errors.UndefinedTable:
+                conn.rollback()
+                latest = None
+            return f"v{latest}" if latest is not None else self._fingerprint(cursor)
+        finally:
+            conn.close()
+    
+    def current(self) -> str:
+        """Retorna a versão atual do dataset"""
+        with self._lock:
+            if self._version is not None and dataset_listener.connected:
+                return self._version
+            if self._version is None or time.monotonic() - self._checked_at > self.ttl_seconds:
+                self._version = self._compute()
+                self._checked_at = time.monotonic()
+            return self._version
+    
+    def loaded(self) -> Optional[str]:
+        """Última versão calculada, sem acessar o banco"""
+        return self._version
+    
+    def invalidate(self):
+        """Força o recálculo na próxima chamada"""
+        with self._lock:
+            self._version = None
+    
+    def on_change(self, version: int, upcs: Optional[List[str]]):
+        """Inscrito no listener: adota a versão publicada pelo loader"""
+        if upcs is None:
+            self.invalidate()
+            return
+        with self._lock:
+            self._version = f"v{version}"
+            self._checked_at = time.monotonic()
+
+
+dataset_version = DatasetVersion()
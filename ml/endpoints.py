@@ -1,11 +1,24 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
-from models.ml_responses import MLFeatures, TrainingDataset, MLStats
+from fastapi import APIRouter, Depends, Query, HTTPException, Response
+from fastapi.responses import StreamingResponse, FileResponse
+from models.ml_responses import MLFeatures, TrainingDataset, MLStats, Vocabulary, TextFeatures, SimilarBooksResponse, PredictRequest, PredictResponse, DatasetJobRequest, DatasetJobStatus
 from models.auth import User
 from auth.endpoints import get_current_active_user
 from ml.data_processor import MLDataProcessor
-from database.connection import get_connection
-import psycopg2.extras
-from typing import Optional
+from ml.export import serialize_columns
+from ml.vocabulary import vocabulary_store
+from ml.sampling import SplitSpec
+from ml.text_features import text_feature_store, TEXT_FIELDS
+from ml.similarity import similarity_index
+from ml.model import model_registry, model_matrix
+from ml.state import ml_state
+from ml.dataset_version import dataset_version
+from database.notifications import dataset_listener
+from ml.stats import ml_stats_cache
+from ml.jobs import dataset_jobs
+import os
+import numpy as np
+import io
+from typing import Any, Dict, Optional
 
 # Router para endpoints de Machine Learning
 router = APIRouter(prefix="/api/v1/ml", tags=["Machine Learning"])
@@ -13,9 +26,33 @@ router = APIRouter(prefix="/api/v1/ml", tags=["Machine Learning"])
 # Instância do processador de dados
 ml_processor = MLDataProcessor()
 
+# Formatos aceitos pelos endpoints de dataset
+FORMAT_PATTERN = "^(json|arrow|parquet|npz)$"
+FORMAT_DESCRIPTION = "Formato da resposta: json, arrow (Arrow IPC stream), parquet ou npz"
+
+def get_split_spec(
+    split: Optional[str] = Query(None, pattern="^(train|test)$", description="Partição a retornar: train ou test (todos se omitido)"),
+    seed: int = Query(0, description="Seed da atribuição determinística treino/teste"),
+    fraction: float = Query(0.8, gt=0, lt=1, description="Fração dos livros destinada ao treino"),
+    stratify: bool = Query(False, description="Estratifica a divisão por target_popular"),
+    sample: Optional[float] = Query(None, gt=0, le=100, description="Amostra percentual da tabela (TABLESAMPLE) antes da divisão")
+) -> SplitSpec:
+    """Dependency com os parâmetros de divisão treino/teste resolvidos no SQL"""
+    return SplitSpec(split=split, seed=seed, fraction=fraction, stratify=stratify, sample=sample)
+
+def _binary_response(columns, metadata, fmt: str, filename: str) -> Response:
+    """Monta a resposta binária para os formatos colunares"""
+    content, media_type, extension = serialize_columns(columns, metadata, fmt)
+    return Response(
+        content=content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{extension}"'}
+    )
+
 @router.get("/features", response_model=MLFeatures)
 async def get_ml_features(
     limit: Optional[int] = Query(1000, ge=10, le=5000, description="Limite de registros para processar"),
+    format: str = Query("json", pattern=FORMAT_PATTERN, description=FORMAT_DESCRIPTION),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -31,9 +68,22 @@ async def get_ml_features(
     - Análise exploratória de dados
     - Preparação de features para modelos
     - Validação de processamento de dados
+    
+    Com `format=arrow|parquet|npz` os dados são gerados direto em colunas e
+    os mapeamentos/estatísticas de normalização vão nos metadados do arquivo.
     """
     try:
-        features_data = ml_processor.get_features(limit=limit)
+        if format != "json":
+            columns, metadata = ml_processor.get_feature_columns(limit=limit)
+            if not len(columns['upc_livro']):
+                raise HTTPException(
+                    status_code=404, 
+                    detail="Nenhum dado válido encontrado para processamento"
+                )
+            return _binary_response(columns, metadata, format, "ml_features")
+        
+        with ml_state.track('features'):
+            features_data = ml_processor.get_features(limit=limit)
         
         if not features_data.features:
             raise HTTPException(
@@ -43,6 +93,8 @@ async def get_ml_features(
             
         return features_data
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -52,6 +104,8 @@ async def get_ml_features(
 @router.get("/training-data", response_model=TrainingDataset)
 async def get_training_data(
     limit: Optional[int] = Query(1000, ge=10, le=5000, description="Limite de registros para o dataset"),
+    format: str = Query("json", pattern=FORMAT_PATTERN, description=FORMAT_DESCRIPTION),
+    split: SplitSpec = Depends(get_split_spec),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -68,9 +122,26 @@ async def get_training_data(
     - Treinamento de modelos de classificação
     - Análise de popularidade de livros
     - Estudos de correlação preço/qualidade
+    
+    Com `format=arrow|parquet|npz` os dados são gerados direto em colunas e
+    os mapeamentos/estatísticas de normalização vão nos metadados do arquivo.
+    
+    Com `split=train|test` apenas a partição pedida é retornada. A atribuição é
+    feita no banco por hash de `upc_livro` + `seed`, então chamadas com os mesmos
+    parâmetros sempre produzem as mesmas partições (disjuntas entre si).
     """
     try:
-        training_data = ml_processor.get_training_data(limit=limit)
+        if format != "json":
+            columns, metadata = ml_processor.get_training_columns(limit=limit, split=split)
+            if not len(columns['upc_livro']):
+                raise HTTPException(
+                    status_code=404,
+                    detail="Nenhum dado válido encontrado para treinamento"
+                )
+            return _binary_response(columns, metadata, format, "ml_training_data")
+        
+        with ml_state.track('training_data'):
+            training_data = ml_processor.get_training_data(limit=limit, split=split)
         
         if not training_data.data:
             raise HTTPException(
@@ -80,12 +151,234 @@ async def get_training_data(
             
         return training_data
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Erro ao gerar dataset de treinamento: {str(e)}"
         )
 
+@router.get("/features/stream")
+def stream_ml_features(
+    limit: Optional[int] = Query(None, ge=10, description="Limite de registros (sem limite se omitido)"),
+    chunk_size: int = Query(500, ge=50, le=10000, description="Linhas lidas do banco por bloco"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Versão em streaming (NDJSON) do endpoint de features.
+    
+    A primeira linha é um cabeçalho (`record_type: header`) com mapeamentos
+    categóricos e estatísticas de normalização; as seguintes são as features
+    de cada livro, enviadas em blocos à medida que são lidas do banco.
+    """
+    return StreamingResponse(
+        ml_processor.stream_dataset(limit=limit, chunk_size=chunk_size, with_target=False),
+        media_type="application/x-ndjson"
+    )
+
+@router.get("/training-data/stream")
+def stream_training_data(
+    limit: Optional[int] = Query(None, ge=10, description="Limite de registros (sem limite se omitido)"),
+    chunk_size: int = Query(500, ge=50, le=10000, description="Linhas lidas do banco por bloco"),
+    split: SplitSpec = Depends(get_split_spec),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Versão em streaming (NDJSON) do dataset de treinamento.
+    
+    A primeira linha é um cabeçalho (`record_type: header`) com mapeamentos,
+    estatísticas de normalização e descrição das features; as seguintes são
+    os registros de treinamento, com memória constante por requisição.
+    """
+    return StreamingResponse(
+        ml_processor.stream_dataset(limit=limit, chunk_size=chunk_size, with_target=True, split=split),
+        media_type="application/x-ndjson"
+    )
+
+@router.get("/vocabulary", response_model=Vocabulary)
+async def get_ml_vocabulary(
+    version: Optional[int] = Query(None, ge=1, description="Versão do vocabulário (mais recente se omitido)"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Retorna o vocabulário usado para codificar categoria, review e price_category.
+    
+    O vocabulário é append-only: os códigos de uma versão continuam válidos
+    em todas as versões seguintes, então modelos treinados com uma versão
+    antiga podem continuar usando os mesmos códigos.
+    """
+    try:
+        snapshot = vocabulary_store.get_version(version)
+        return Vocabulary(version=snapshot.version, mappings=snapshot.as_dict(), sizes=snapshot.sizes())
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erro ao obter vocabulário: {str(e)}"
+        )
+
+@router.get("/text-features", response_model=TextFeatures)
+async def get_text_features(
+    field: str = Query("titulo", pattern="^(titulo|sinopse)$", description="Campo de texto: titulo ou sinopse"),
+    limit: int = Query(500, ge=1, le=5000, description="Número de livros (linhas da matriz) a retornar"),
+    offset: int = Query(0, ge=0, description="Linha inicial da matriz"),
+    format: str = Query("json", pattern="^(json|npz)$", description="json (página em CSR) ou npz (matriz completa)"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Retorna vetores esparsos de n-grams (feature hashing) de titulo ou sinopse.
+    
+    Os vetores são calculados em lote uma vez por versão do dataset e ficam em
+    cache em disco. A resposta usa a codificação CSR: as linhas `i` ocupam
+    `indices[indptr[i]:indptr[i+1]]` / `data[indptr[i]:indptr[i+1]]`, na mesma
+    ordem de `upc_livro`.
+    """
+    try:
+        feature_set = text_feature_store.get()
+        matrix = feature_set.matrices[field]
+        config = TEXT_FIELDS[field]
+        
+        if format == "npz":
+            buffer = io.BytesIO()
+            np.savez_compressed(
+                buffer,
+                upc_livro=feature_set.upcs,
+                indptr=matrix.indptr,
+                indices=matrix.indices,
+                data=matrix.data,
+                shape=np.array(matrix.shape)
+            )
+            return Response(
+                content=buffer.getvalue(),
+                media_type="application/octet-stream",
+                headers={"Content-Disposition": f'attachment; filename="text_features_{field}_{feature_set.version}.npz"'}
+            )
+        
+        page = matrix.slice_rows(offset, offset + limit)
+        return TextFeatures(
+            dataset_version=feature_set.version,
+            field=field,
+            analyzer=config['analyzer'],
+            ngram_range=list(config['ngram_range']),
+            n_features=config['n_features'],
+            total_records=matrix.shape[0],
+            offset=offset,
+            upc_livro=feature_set.upcs[offset:offset + limit].tolist(),
+            indptr=page.indptr.tolist(),
+            indices=page.indices.tolist(),
+            data=np.round(page.data, 5).tolist()
+        )
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erro ao gerar features de texto: {str(e)}"
+        )
+
+@router.get("/similar/{upc}", response_model=SimilarBooksResponse)
+async def get_similar_books(
+    upc: str,
+    k: int = Query(10, ge=1, le=100, description="Número de livros similares a retornar"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Retorna os k livros mais parecidos com o livro informado.
+    
+    A similaridade é o cosseno entre vetores montados com as features do
+    MLDataProcessor (preço, avaliação, categoria e n-grams do título). O índice
+    é pré-calculado e reconstruído quando a versão do dataset muda.
+    """
+    try:
+        index = similarity_index.get()
+        row = index.row_by_upc.get(upc)
+        if row is None:
+            raise HTTPException(status_code=404, detail="Book not found")
+        
+        results = [
+            {
+                'upc_livro': str(index.upcs[i]),
+                'titulo': str(index.titulos[i]),
+                'categoria': str(index.categorias[i]),
+                'score': round(score, 4)
+            }
+            for i, score in index.search(row, k=k)
+        ]
+        return SimilarBooksResponse(upc_livro=upc, dataset_version=index.version, k=k, results=results)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erro ao buscar livros similares: {str(e)}"
+        )
+
+@router.post("/predict", response_model=PredictResponse)
+async def predict_popularity(
+    request: PredictRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Calcula a probabilidade de `target_popular` para um lote de livros.
+    
+    Aceita UPCs do catálogo (as features são montadas pelo MLDataProcessor) e/ou
+    linhas de features brutas. Todo o lote é pontuado numa única chamada
+    vetorizada do modelo ativo, que é trocado sem reiniciar quando um novo
+    artefato é publicado por `python -m ml.train_model`.
+    """
+    if not request.upcs and not request.rows:
+        raise HTTPException(status_code=400, detail="Informe 'upcs' e/ou 'rows'")
+    if len(request.upcs) + len(request.rows) > 10000:
+        raise HTTPException(status_code=400, detail="Lote máximo de 10000 itens")
+    
+    try:
+        model = model_registry.get()
+        if model is None:
+            raise HTTPException(status_code=503, detail="Nenhum modelo treinado disponível")
+        
+        matrices = []
+        upcs = []
+        not_found = []
+        
+        if request.upcs:
+            columns, _ = ml_processor.get_columns_for_upcs(request.upcs)
+            found = set(columns['upc_livro'].tolist())
+            not_found = [upc for upc in request.upcs if upc not in found]
+            matrices.append(model_matrix(columns))
+            upcs.extend(columns['upc_livro'].tolist())
+        
+        if request.rows:
+            prices = np.array([row.preco_euros for row in request.rows], dtype=np.float64)
+            matrices.append(model_matrix({
+                'titulo_length': np.array([row.titulo_length for row in request.rows]),
+                'titulo_word_count': np.array([row.titulo_word_count for row in request.rows]),
+                'preco_euros': prices,
+                'review_score': np.array([row.review_score for row in request.rows]),
+                'price_category': ml_processor.price_category_labels(prices),
+            }))
+            upcs.extend([None] * len(request.rows))
+        
+        probabilities = model.predict_proba(np.vstack(matrices))
+        
+        return PredictResponse(
+            model_version=model.version,
+            model_type=model.metadata['model_type'],
+            predictions=[
+                {'upc_livro': upc, 'probability': round(float(p), 4), 'popular': bool(p >= 0.5)}
+                for upc, p in zip(upcs, probabilities)
+            ],
+            not_found=not_found
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erro ao calcular predições: {str(e)}"
+        )
+
 @router.get("/stats", response_model=MLStats)
 async def get_ml_stats(
     current_user: User = Depends(get_current_active_user)
@@ -97,97 +390,129 @@ async def get_ml_stats(
     - Distribuições de preços, categorias e reviews
     - Valores ausentes por coluna
     - Contagens gerais do dataset
+    - Faixas de preço e valores ausentes por categoria
     
     Útil para:
     - Análise exploratória inicial
     - Identificação de desbalanceamentos
     - Planejamento de estratégias de preprocessing
+    
+    Tudo é calculado numa única leitura da tabela, com as mesmas faixas de preço
+    do MLDataProcessor, e reaproveitado enquanto a versão do dataset não mudar.
     """
     try:
-        sql = """
-            SELECT
-                COUNT(*) as total_books,
-                COUNT(DISTINCT categoria) as total_categories,
-                COUNT(CASE WHEN valor_principal_em_euros <= 20 THEN 1 END) as budget_books,
-                COUNT(CASE WHEN valor_principal_em_euros > 20 AND valor_principal_em_euros <= 50 THEN 1 END) as mid_books,
-                COUNT(CASE WHEN valor_principal_em_euros > 50 THEN 1 END) as premium_books,
-                COUNT(CASE WHEN review = 'One' THEN 1 END) as review_1,
-                COUNT(CASE WHEN review = 'Two' THEN 1 END) as review_2,
-                COUNT(CASE WHEN review = 'Three' THEN 1 END) as review_3,
-                COUNT(CASE WHEN review = 'Four' THEN 1 END) as review_4,
-                COUNT(CASE WHEN review = 'Five' THEN 1 END) as review_5,
-                COUNT(CASE WHEN titulo IS NULL OR titulo = '' THEN 1 END) as missing_titles,
-                COUNT(CASE WHEN categoria IS NULL OR categoria = '' THEN 1 END) as missing_categories,
-                COUNT(CASE WHEN valor_principal_em_euros IS NULL THEN 1 END) as missing_prices,
-                COUNT(CASE WHEN review IS NULL OR review = '' THEN 1 END) as missing_reviews
-            FROM livros
-        """
-        
-        conn = get_connection()
-        try:
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            cursor.execute(sql)
-            result = cursor.fetchone()
-            
-            if not result:
-                raise HTTPException(status_code=404, detail="Não foi possível obter estatísticas")
-            
-            # Busca distribuição de categorias
-            cursor.execute("""
-                SELECT categoria, COUNT(*) as count 
-                FROM livros 
-                WHERE categoria IS NOT NULL AND categoria != ''
-                GROUP BY categoria 
-                ORDER BY count DESC 
-                LIMIT 10
-            """)
-            top_categories = dict(cursor.fetchall())
-            
-            return MLStats(
-                total_books=result['total_books'],
-                total_categories=result['total_categories'],
-                price_distribution={
-                    'budget': result['budget_books'],
-                    'mid': result['mid_books'],
-                    'premium': result['premium_books']
-                },
-                review_distribution={
-                    '1': result['review_1'],
-                    '2': result['review_2'],
-                    '3': result['review_3'],
-                    '4': result['review_4'],
-                    '5': result['review_5']
-                },
-                category_distribution=top_categories,
-                missing_values={
-                    'titles': result['missing_titles'],
-                    'categories': result['missing_categories'],
-                    'prices': result['missing_prices'],
-                    'reviews': result['missing_reviews']
-                }
-            )
-            
-        finally:
-            conn.close()
-            
+        return ml_stats_cache.get()
+        
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Erro ao obter estatísticas: {str(e)}"
         )
 
+@router.post("/jobs", response_model=DatasetJobStatus, status_code=202)
+async def create_dataset_job(
+    request: DatasetJobRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Enfileira a geração de um dataset (features ou training-data) em background.
+    
+    Pedidos com os mesmos parâmetros para a mesma versão do dataset reaproveitam
+    o job em andamento ou o artefato já gerado. Acompanhe por
+    `GET /jobs/{job_id}` e baixe por `GET /jobs/{job_id}/artifact`.
+    """
+    try:
+        return dataset_jobs.submit(request)
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erro ao criar job: {str(e)}"
+        )
+
+@router.get("/jobs/{job_id}", response_model=DatasetJobStatus)
+async def get_dataset_job(job_id: str, current_user: User = Depends(get_current_active_user)):
+    """Retorna o estado de um job de geração de dataset"""
+    job = dataset_jobs.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+class ArtifactResponse(FileResponse):
+    """FileResponse que devolve a referência do artefato ao fim do envio, mesmo se o cliente desconectar"""
+    
+    def __init__(self, path: str, **kwargs):
+        super().__init__(path, **kwargs)
+        self.artifact_path = path
+    
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            dataset_jobs.release_artifact(self.artifact_path)
+
+@router.get("/jobs/{job_id}/artifact")
+async def download_dataset_job(job_id: str, current_user: User = Depends(get_current_active_user)):
+    """Baixa o artefato de um job concluído"""
+    job = dataset_jobs.status(job_id)
+    if job is not None and job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Job ainda não concluído (status: {job.status})")
+    
+    # Protege o arquivo da remoção por espaço enquanto ele é enviado
+    path = dataset_jobs.acquire_artifact(job_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    
+    return ArtifactResponse(path, media_type="application/octet-stream", filename=os.path.basename(path))
+
+def _health_status(ready: Dict[str, bool], listener: Dict[str, Any]) -> str:
+    """healthy com tudo pronto; degraded se faltar algo (ou o LISTEN cair); not_ready sem nada carregado"""
+    if not any(ready.values()):
+        return "not_ready"
+    if not all(ready.values()) or not listener.get("connected"):
+        return "degraded"
+    return "healthy"
+
 @router.get("/health")
 async def ml_health_check(current_user: User = Depends(get_current_active_user)):
-    """Health check específico para módulo de ML"""
+    """
+    Health check específico para módulo de ML.
+    
+    Reporta a prontidão a partir do estado em memória do processo (versões
+    carregadas, modelo, vocabulário e duração das últimas construções), sem
+    consultar a tabela livros.
+    """
     try:
-        # Testa processamento básico
-        test_features = ml_processor.get_features(limit=10)
+        vocabulary = vocabulary_store.loaded()
+        model = model_registry.loaded()
+        text_features = text_feature_store.loaded()
+        index = similarity_index.loaded()
+        builds = ml_state.snapshot()
+        
+        last_refresh = max((build['finished_at'] for build in builds.values()), default=None)
+        ready = {
+            "vocabulary": vocabulary is not None,
+            "model": model is not None,
+            "text_features": text_features is not None,
+            "similarity_index": index is not None
+        }
+        listener = dataset_listener.status()
         
         return {
-            "status": "healthy",
+            "status": _health_status(ready, listener),
             "module": "machine_learning",
-            "test_records_processed": len(test_features.features),
-            "available_endpoints": ["/features", "/training-data", "/stats"],
+            "ready": ready,
+            "dataset_version": dataset_version.loaded(),
+            "dataset_listener": listener,
+            "feature_store_version": text_features.version if text_features else None,
+            "similarity_index_version": index.version if index else None,
+            "model_version": model.version if model else None,
+            "vocabulary_version": vocabulary.version if vocabulary else None,
+            "vocabulary_size": vocabulary.sizes() if vocabulary else None,
+            "last_refresh": last_refresh,
+            "last_builds": builds,
+            "available_endpoints": ["/features", "/features/stream", "/training-data", "/training-data/stream",
+                                    "/vocabulary", "/text-features", "/similar/{upc}", "/predict", "/jobs", "/stats"],
             "data_processor": "operational"
         }
         
@@ -196,4 +521,4 @@ async def ml_health_check(current_user: User = Depends(get_current_active_user))
             "status": "unhealthy",
             "module": "machine_learning", 
             "error": str(e)
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,67 @@
+import io
+import json
+from typing import Dict, Any, Tuple
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow só é necessário para os formatos arrow/parquet
+    pa = None
+
+
+EXPORT_FORMATS = {
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrow'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'npz': ('application/octet-stream', 'npz'),
+}
+
+
+def _arrow_table(columns: Dict[str, np.ndarray], metadata: Dict[str, Any]) -> "pa.Table":
+    """Monta uma tabela Arrow a partir das colunas, com os metadados no schema"""
+    if pa is None:
+        raise RuntimeError("pyarrow não está instalado; formatos 'arrow' e 'parquet' indisponíveis")
+    
+    arrays = {}
+    for name, values in columns.items():
+        array = pa.array(values)
+        # Colunas categóricas de baixa cardinalidade viram dictionary arrays
+        if name in ('categoria', 'price_category', 'review'):
+            array = array.dictionary_encode()
+        arrays[name] = array
+    
+    schema_metadata = {key: json.dumps(value, ensure_ascii=False) for key, value in metadata.items()}
+    return pa.table(arrays).replace_schema_metadata(schema_metadata)
+
+
+def _to_arrow_ipc(columns: Dict[str, np.ndarray], metadata: Dict[str, Any]) -> bytes:
+    table = _arrow_table(columns, metadata)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _to_parquet(columns: Dict[str, np.ndarray], metadata: Dict[str, Any]) -> bytes:
+    table = _arrow_table(columns, metadata)
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink, compression='zstd')
+    return sink.getvalue().to_pybytes()
+
+
+def _to_npz(columns: Dict[str, np.ndarray], metadata: Dict[str, Any]) -> bytes:
+    buffer = io.BytesIO()
+    # Metadados vão como string JSON para o arquivo poder ser lido sem allow_pickle
+    np.savez_compressed(buffer, __metadata__=np.array(json.dumps(metadata, ensure_ascii=False)), **columns)
+    return buffer.getvalue()
+
+
+def serialize_columns(columns: Dict[str, np.ndarray], metadata: Dict[str, Any], fmt: str) -> Tuple[bytes, str, str]:
+    """Serializa colunas no formato pedido. Retorna (conteúdo, media type, extensão)"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato não suportado: {fmt}")
+    
+    writers = {'arrow': _to_arrow_ipc, 'parquet': _to_parquet, 'npz': _to_npz}
+    media_type, extension = EXPORT_FORMATS[fmt]
+    return writers[fmt](columns, metadata), media_type, extension
@@ -0,0 +1,218 @@
+from ml.data_processor import MLDataProcessor
+from ml.dataset_version import dataset_version
+from ml.export import serialize_columns, EXPORT_FORMATS
+from ml.sampling import SplitSpec
+from ml.state import ml_state
+from ml.text_features import ML_CACHE_DIR
+from models.ml_responses import DatasetJobRequest, DatasetJobStatus
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional
+import hashlib
+import threading
+import glob
+import json
+import time
+import os
+import re
+
+
+# Processos de build em paralelo e limite de espaço em disco dos artefatos
+ML_JOB_WORKERS = int(os.getenv('ML_JOB_WORKERS', '2'))
+ML_ARTIFACT_CACHE_BYTES = int(os.getenv('ML_ARTIFACT_CACHE_BYTES', str(2 * 1024 ** 3)))
+
+ARTIFACT_DIR = os.path.join(ML_CACHE_DIR, 'datasets')
+
+# Artefatos lidos há menos tempo que isso não são removidos: podem estar sendo
+# baixados por outro worker da API, que não compartilha as referências em memória
+ML_ARTIFACT_GRACE_SECONDS = int(os.getenv('ML_ARTIFACT_GRACE_SECONDS', '600'))
+
+# Jobs finalizados mantidos em memória (os artefatos continuam no disco)
+MAX_TRACKED_JOBS = 1000
+
+# Formato do id gerado por _job_id; qualquer outra coisa nunca chega ao disco
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+class DatasetJobManager:
+    """
+    Fila de jobs de geração de dataset executados num pool em background.
+    
+    O id do job é o hash dos parâmetros + versão do dataset, então pedidos iguais
+    enquanto um job está em andamento reaproveitam o mesmo job, e pedidos iguais
+    depois que ele terminou são servidos direto do artefato em disco.
+    """
+    
+    def __init__(self, artifact_dir: str = ARTIFACT_DIR, workers: int = ML_JOB_WORKERS,
+                 max_cache_bytes: int = ML_ARTIFACT_CACHE_BYTES):
+        self.artifact_dir = artifact_dir
+        self.max_cache_bytes = max_cache_bytes
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ml-dataset-job')
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, DatasetJobStatus] = {}
+        # Artefatos sendo enviados por este processo (caminho -> downloads em andamento)
+        self._serving: Dict[str, int] = {}
+        self._processor = MLDataProcessor()
+    
+    def _job_id(self, params: DatasetJobRequest, version: str) -> str:
+        payload = json.dumps({'params': params.model_dump(), 'dataset_version': version}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+    
+    def _extension(self, params: DatasetJobRequest) -> str:
+        return 'ndjson' if params.format == 'ndjson' else EXPORT_FORMATS[params.format][1]
+    
+    def _artifact_path(self, job_id: str, params: DatasetJobRequest) -> str:
+        return os.path.join(self.artifact_dir, f"{job_id}.{self._extension(params)}")
+    
+    def _find_artifact(self, job_id: str) -> Optional[str]:
+        # job_id já validado: sem curingas do glob
+        matches = [path for path in glob.glob(os.path.join(self.artifact_dir, f"{job_id}.*")) if '.tmp' not in path]
+        return matches[0] if matches else None
+    
+    def submit(self, params: DatasetJobRequest) -> DatasetJobStatus:
+        """Enfileira um build (ou devolve o job igual já existente / artefato em cache)"""
+        version = dataset_version.current()
+        job_id = self._job_id(params, version)
+        
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.status in ('queued', 'running', 'done'):
+                if job.status != 'done' or os.path.exists(self._artifact_path(job_id, params)):
+                    return job
+            
+            path = self._artifact_path(job_id, params)
+            job = DatasetJobStatus(job_id=job_id, status='queued', dataset_version=version,
+                                   params=params, created_at=datetime.now())
+            
+            if os.path.exists(path):
+                os.utime(path)
+                job.status = 'done'
+                job.cached = True
+                job.finished_at = job.created_at
+                job.artifact_size_bytes = os.path.getsize(path)
+            else:
+                self._executor.submit(self._run, job_id)
+            
+            self._jobs[job_id] = job
+            self._forget_old_jobs()
+            return job
+    
+    def _forget_old_jobs(self):
+        finished = [job for job in self._jobs.values() if job.status in ('done', 'failed')]
+        excess = len(self._jobs) - MAX_TRACKED_JOBS
+        for job in sorted(finished, key=lambda j: j.created_at)[:max(excess, 0)]:
+            del self._jobs[job.job_id]
+    
+    def _build(self, params: DatasetJobRequest, path: str):
+        split = SplitSpec(params.split, params.seed, params.fraction, params.stratify, params.sample)
+        with_target = params.dataset == 'training-data'
+        
+        tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+        try:
+            with open(tmp_path, 'wb') as f:
+                if params.format == 'ndjson':
+                    for chunk in self._processor.stream_dataset(limit=params.limit, with_target=with_target, split=split):
+                        f.write(chunk.encode('utf-8'))
+                else:
+                    # A partição faz parte do id do job: os dois tipos de dataset a respeitam
+                    if with_target:
+                        columns, metadata = self._processor.get_training_columns(limit=params.limit, split=split)
+                    else:
+                        columns, metadata = self._processor.get_feature_columns(limit=params.limit, split=split)
+                    content, _, _ = serialize_columns(columns, metadata, params.format)
+                    f.write(content)
+            os.replace(tmp_path, path)
+        except BaseException:
+            # _evict ignora os .tmp: um build que falhou não pode deixar o arquivo para trás
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    
+    def _run(self, job_id: str):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.status = 'running'
+            job.started_at = datetime.now()
+        
+        path = self._artifact_path(job_id, job.params)
+        try:
+            os.makedirs(self.artifact_dir, exist_ok=True)
+            with ml_state.track('dataset_job', job.dataset_version):
+                self._build(job.params, path)
+            
+            with self._lock:
+                job.status = 'done'
+                job.artifact_size_bytes = os.path.getsize(path)
+                job.finished_at = datetime.now()
+            self._evict(keep=path)
+        except Exception as e:
+            with self._lock:
+                job.status = 'failed'
+                job.error = str(e)
+                job.finished_at = datetime.now()
+    
+    def _evict(self, keep: Optional[str] = None):
+        """
+        Remove os artefatos usados há mais tempo até o cache caber no limite. Os
+        que estão sendo baixados e os lidos nos últimos ML_ARTIFACT_GRACE_SECONDS
+        ficam, mesmo que o cache passe do limite por um tempo.
+        """
+        recent = time.time() - ML_ARTIFACT_GRACE_SECONDS
+        with self._lock:
+            entries = []
+            for path in glob.glob(os.path.join(self.artifact_dir, '*')):
+                if '.tmp' in path:
+                    continue
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+            
+            total = sum(size for _, size, _ in entries)
+            for mtime, size, path in sorted(entries):
+                if total <= self.max_cache_bytes:
+                    break
+                if path == keep or self._serving.get(path) or mtime > recent:
+                    continue
+                os.remove(path)
+                total -= size
+                
+                job = self._jobs.get(os.path.basename(path).split('.')[0])
+                if job is not None and job.status == 'done':
+                    del self._jobs[job.job_id]
+    
+    def status(self, job_id: str) -> Optional[DatasetJobStatus]:
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def artifact(self, job_id: str) -> Optional[str]:
+        """Caminho do artefato pronto (marcando-o como usado recentemente para o LRU)"""
+        if not JOB_ID_PATTERN.match(job_id):
+            return None
+        job = self.status(job_id)
+        path = self._artifact_path(job_id, job.params) if job else self._find_artifact(job_id)
+        if path is None or not os.path.exists(path):
+            return None
+        os.utime(path)
+        return path
+    
+    def acquire_artifact(self, job_id: str) -> Optional[str]:
+        """Como artifact(), mas o arquivo não é removido até release_artifact(path)"""
+        path = self.artifact(job_id)
+        if path is None:
+            return None
+        with self._lock:
+            # Pode ter sido removido entre a busca e a referência
+            if not os.path.exists(path):
+                return None
+            self._serving[path] = self._serving.get(path, 0) + 1
+        return path
+    
+    def release_artifact(self, path: str):
+        with self._lock:
+            remaining = self._serving.get(path, 0) - 1
+            if remaining > 0:
+                self._serving[path] = remaining
+            else:
+                self._serving.pop(path, None)
+
+
+dataset_jobs = DatasetJobManager()
@@ -0,0 +1,165 @@
+from typing import Any, Dict, Optional
+from datetime import datetime
+import numpy as np
+import threading
+import json
+import time
+import os
+
+
+# Diretório dos artefatos de modelo e arquivo que aponta para o modelo ativo
+ML_MODEL_DIR = os.getenv('ML_MODEL_DIR', 'ml_artifacts')
+CURRENT_POINTER = 'CURRENT'
+
+# Versão do formato do artefato (muda só se o layout do arquivo mudar)
+ARTIFACT_FORMAT_VERSION = 1
+
+# Intervalo mínimo entre verificações do ponteiro CURRENT (hot-swap)
+RELOAD_CHECK_SECONDS = 5
+
+MODEL_FEATURES = [
+    'titulo_length', 'titulo_word_count', 'preco_euros', 'review_score',
+    'price_budget', 'price_mid', 'price_premium'
+]
+
+
+def model_matrix(columns: Dict[str, np.ndarray]) -> np.ndarray:
+    """Monta a matriz de entrada do modelo a partir das colunas do MLDataProcessor"""
+    price_category = columns['price_category']
+    return np.column_stack([
+        columns['titulo_length'],
+        columns['titulo_word_count'],
+        columns['preco_euros'],
+        columns['review_score'],
+        price_category == 'budget',
+        price_category == 'mid',
+        price_category == 'premium',
+    ]).astype(np.float64)
+
+
+class PopularityModel:
+    """Regressão logística em NumPy para a variável target_popular"""
+    
+    def __init__(self, weights: np.ndarray, bias: float, means: np.ndarray, stds: np.ndarray,
+                 metadata: Dict[str, Any]):
+        self.weights = weights
+        self.bias = bias
+        self.means = means
+        self.stds = stds
+        self.metadata = metadata
+    
+    @property
+    def version(self) -> str:
+        return self.metadata['version']
+    
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Probabilidade de target_popular para um lote inteiro numa única chamada"""
+        logits = ((X - self.means) / self.stds) @ self.weights + self.bias
+        return 1.0 / (1.0 + np.exp(-logits))
+    
+    @classmethod
+    def train(cls, X: np.ndarray, y: np.ndarray, epochs: int = 500, learning_rate: float = 0.5,
+              l2: float = 1e-3, metadata: Optional[Dict[str, Any]] = None) -> "PopularityModel":
+        """Treina com gradiente descendente em lote (features padronizadas)"""
+        means = X.mean(axis=0)
+        stds = X.std(axis=0)
+        stds[stds == 0] = 1.0
+        Xs = (X - means) / stds
+        
+        weights = np.zeros(X.shape[1])
+        bias = 0.0
+        for _ in range(epochs):
+            predictions = 1.0 / (1.0 + np.exp(-(Xs @ weights + bias)))
+            error = predictions - y
+            weights -= learning_rate * (Xs.T @ error / len(y) + l2 * weights)
+            bias -= learning_rate * error.mean()
+        
+        metadata = dict(metadata or {})
+        metadata.setdefault('version', datetime.now().strftime('%Y%m%d%H%M%S'))
+        metadata.update({
+            'format_version': ARTIFACT_FORMAT_VERSION,
+            'model_type': 'logistic_regression',
+            'feature_names': MODEL_FEATURES,
+            'trained_at': datetime.now().isoformat(),
+            'hyperparameters': {'epochs': epochs, 'learning_rate': learning_rate, 'l2': l2},
+        })
+        return cls(weights, bias, means, stds, metadata)
+    
+    def save(self, model_dir: str = ML_MODEL_DIR, activate: bool = True) -> str:
+        """Grava o artefato versionado e, opcionalmente, o torna o modelo ativo"""
+        os.makedirs(model_dir, exist_ok=True)
+        filename = f"popularity-{self.version}.npz"
+        path = os.path.join(model_dir, filename)
+        
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, weights=self.weights, bias=np.array(self.bias), means=self.means, stds=self.stds,
+                     __metadata__=np.array(json.dumps(self.metadata, ensure_ascii=False)))
+        os.replace(tmp_path, path)
+        
+        if activate:
+            pointer_tmp = os.path.join(model_dir, f"{CURRENT_POINTER}.tmp.{os.getpid()}")
+            with open(pointer_tmp, 'w') as f:
+                f.write(filename)
+            os.replace(pointer_tmp, os.path.join(model_dir, CURRENT_POINTER))
+        return path
+    
+    @classmethod
+    def load(cls, path: str) -> "PopularityModel":
+        with np.load(path) as artifact:
+            metadata = json.loads(str(artifact['__metadata__']))
+            if metadata.get('format_version') != ARTIFACT_FORMAT_VERSION:
+                raise ValueError(f"Formato de artefato não suportado: {metadata.get('format_version')}")
+            if metadata.get('feature_names') != MODEL_FEATURES:
+                raise ValueError("Artefato foi treinado com outro conjunto de features")
+            return cls(artifact['weights'], float(artifact['bias']), artifact['means'], artifact['stds'], metadata)
+
+
+class ModelRegistry:
+    """
+    Mantém o modelo ativo em memória.
+    
+    O ativo é o artefato apontado por CURRENT; quando o ponteiro muda (novo treino),
+    o modelo é recarregado na próxima requisição, sem reiniciar os workers.
+    """
+    
+    def __init__(self, model_dir: str = ML_MODEL_DIR):
+        self.model_dir = model_dir
+        self._lock = threading.Lock()
+        self._model: Optional[PopularityModel] = None
+        self._pointer_mtime: Optional[float] = None
+        self._checked_at = 0.0
+    
+    def _pointer_path(self) -> str:
+        return os.path.join(self.model_dir, CURRENT_POINTER)
+    
+    def load(self) -> Optional[PopularityModel]:
+        """Carrega (ou recarrega) o modelo apontado por CURRENT"""
+        with self._lock:
+            pointer = self._pointer_path()
+            self._checked_at = time.monotonic()
+            if not os.path.exists(pointer):
+                return self._model
+            
+            mtime = os.stat(pointer).st_mtime
+            if self._model is not None and mtime == self._pointer_mtime:
+                return self._model
+            
+            with open(pointer) as f:
+                filename = f.read().strip()
+            self._model = PopularityModel.load(os.path.join(self.model_dir, filename))
+            self._pointer_mtime = mtime
+            return self._model
+    
+    def loaded(self) -> Optional[PopularityModel]:
+        """Modelo já carregado neste processo, sem verificar o ponteiro"""
+        return self._model
+    
+    def get(self) -> Optional[PopularityModel]:
+        """Retorna o modelo ativo, verificando o ponteiro no máximo a cada RELOAD_CHECK_SECONDS"""
+        if self._model is None or time.monotonic() - self._checked_at > RELOAD_CHECK_SECONDS:
+            return self.load()
+        return self._model
+
+
+model_registry = ModelRegistry()
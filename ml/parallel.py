@@ -0,0 +1,260 @@
+"""
+Montagem das features em paralelo (process pool persistente).
+
+As linhas são buscadas uma única vez. As colunas de texto vão para blocos de
+memória compartilhada (bytes UTF-8 separados por \\x00 + offsets) e as numéricas
+para arrays compartilhados; cada tarefa recebe uma faixa contígua de linhas,
+monta ali todas as colunas de saída (o trabalho por linha) e escreve direto nos
+arrays de saída compartilhados. Como as faixas são disjuntas, o resultado é
+idêntico (e na mesma ordem) ao da execução serial.
+
+O pool é criado na primeira chamada e reaproveitado pelas seguintes.
+
+Benchmark (catálogo sintético, sem banco):
+    python -m ml.parallel --rows 1000000 --workers 1 2 4 8
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context, shared_memory
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import atexit
+import os
+import threading
+import time
+
+
+# Número de processos padrão para os caminhos offline (CLI e refresh de features)
+ML_FEATURE_WORKERS = int(os.getenv('ML_FEATURE_WORKERS', '1'))
+
+# Faixas por worker: mais de uma para equilibrar a carga entre processos
+PARTITIONS_PER_WORKER = 4
+
+# Abaixo disso o custo de copiar as colunas e despachar as faixas não compensa
+PARALLEL_MIN_ROWS = 20_000
+
+_SEPARATOR = '\x00'
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    """Pool compartilhado do processo; só é recriado se o número de workers mudar"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=True)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'))
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+
+atexit.register(shutdown_pool)
+
+
+def use_parallel(rows: int, workers: int) -> bool:
+    return workers > 1 and rows >= max(PARALLEL_MIN_ROWS, workers * PARTITIONS_PER_WORKER)
+
+
+def _pack_strings(values: Sequence[Optional[str]]) -> Tuple[bytes, np.ndarray]:
+    """Concatena as strings em UTF-8 e retorna o buffer e os offsets de início de cada uma"""
+    buffer = _SEPARATOR.join(v or '' for v in values).encode('utf-8')
+    separators = np.flatnonzero(np.frombuffer(buffer, dtype=np.uint8) == 0)
+    offsets = np.empty(len(values) + 1, dtype=np.int64)
+    offsets[0] = 0
+    offsets[1:-1] = separators + 1
+    offsets[-1] = len(buffer) + 1
+    return buffer, offsets
+
+
+class _SharedBlock:
+    """Bloco de memória compartilhada exposto como array NumPy"""
+
+    def __init__(self, nbytes: int):
+        self.shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+
+    def array(self, dtype, shape) -> np.ndarray:
+        return np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+
+    def release(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _attach(name: str, dtype, shape) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _worker(function: Callable, args: tuple, strings: Dict[str, Tuple[str, str, int]],
+            numbers: Dict[str, Tuple[str, str]], outputs: Dict[str, Tuple[str, str]],
+            n_rows: int, start: int, stop: int):
+    """Monta as linhas [start, stop): lê as entradas e escreve as saídas na memória compartilhada"""
+    handles = []
+    try:
+        raw = {}
+        for column, (buffer_name, offsets_name, nbytes) in strings.items():
+            buffer_shm, buffer = _attach(buffer_name, np.uint8, (max(nbytes, 1),))
+            offsets_shm, offsets = _attach(offsets_name, np.int64, (n_rows + 1,))
+            handles.extend([buffer_shm, offsets_shm])
+            raw[column] = buffer[offsets[start]:offsets[stop] - 1].tobytes().decode('utf-8').split(_SEPARATOR)
+            del buffer, offsets
+
+        for column, (name, dtype) in numbers.items():
+            shm, values = _attach(name, dtype, (n_rows,))
+            handles.append(shm)
+            raw[column] = values[start:stop].copy()
+            del values
+
+        results = function(raw, *args)
+
+        for column, (name, dtype) in outputs.items():
+            shm, out = _attach(name, dtype, (n_rows,))
+            handles.append(shm)
+            out[start:stop] = results[column]
+            del out
+    finally:
+        for shm in handles:
+            shm.close()
+
+
+def map_row_ranges(function: Callable, args: tuple, strings: Dict[str, Sequence[Optional[str]]],
+                   numbers: Dict[str, np.ndarray], outputs: Dict[str, np.dtype],
+                   workers: int) -> Dict[str, np.ndarray]:
+    """
+    Executa function(raw, *args) em faixas de linhas no pool, onde `raw` traz a
+    faixa de cada coluna de entrada (listas de str para `strings`, arrays para
+    `numbers`) e function retorna um array por coluna de `outputs` (nome -> dtype).
+    Retorna as colunas de saída completas, na ordem das linhas.
+    """
+    n = len(next(iter(strings.values())))
+    blocks: List[_SharedBlock] = []
+    try:
+        string_specs = {}
+        for column, values in strings.items():
+            buffer, offsets = _pack_strings(values)
+            buffer_block, offsets_block = _SharedBlock(len(buffer)), _SharedBlock(offsets.nbytes)
+            blocks.extend([buffer_block, offsets_block])
+            buffer_block.shm.buf[:len(buffer)] = buffer
+            offsets_block.array(np.int64, offsets.shape)[:] = offsets
+            string_specs[column] = (buffer_block.shm.name, offsets_block.shm.name, len(buffer))
+
+        number_specs = {}
+        for column, values in numbers.items():
+            block = _SharedBlock(values.nbytes)
+            blocks.append(block)
+            block.array(values.dtype, (n,))[:] = values
+            number_specs[column] = (block.shm.name, values.dtype.str)
+
+        output_specs = {}
+        output_blocks = {}
+        for column, dtype in outputs.items():
+            dtype = np.dtype(dtype)
+            block = _SharedBlock(n * dtype.itemsize)
+            blocks.append(block)
+            output_specs[column] = (block.shm.name, dtype.str)
+            output_blocks[column] = (block, dtype)
+
+        bounds = np.linspace(0, n, workers * PARTITIONS_PER_WORKER + 1, dtype=np.int64)
+        pool = get_pool(workers)
+        try:
+            futures = [
+                pool.submit(_worker, function, args, string_specs, number_specs, output_specs, n, int(start), int(stop))
+                for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start
+            ]
+            for future in futures:
+                future.result()
+        except BrokenProcessPool:
+            # Um worker morreu: descarta o pool para a próxima chamada criar outro
+            global _pool
+            with _pool_lock:
+                if _pool is pool:
+                    _pool = None
+            raise
+
+        return {column: block.array(dtype, (n,)).copy() for column, (block, dtype) in output_blocks.items()}
+    finally:
+        for block in blocks:
+            block.release()
+
+
+def _synthetic_catalog(rows: int, seed: int = 0) -> Dict[str, tuple]:
+    """Catálogo sintético no formato de MLDataProcessor._fetch_columns"""
+    rng = np.random.default_rng(seed)
+    words = np.array(['the', 'light', 'attic', 'secret', 'history', 'night', 'garden', 'of', 'a', 'river',
+                      'black', 'dust', 'love', 'in', 'time', 'sharp', 'objects', 'soumission', 'world', 'tipping'])
+    lengths = rng.integers(1, 12, size=rows)
+    tokens = words[rng.integers(0, len(words), size=lengths.sum())]
+    cuts = np.cumsum(lengths)[:-1]
+    titulos = [' '.join(chunk) for chunk in np.split(tokens, cuts)]
+
+    categories = [f'Category {i}' for i in range(50)]
+    euros = np.round(rng.uniform(10, 60, size=rows), 2)
+    return {
+        'upc_livro': tuple(f'{i:016x}' for i in range(rows)),
+        'titulo': tuple(titulos),
+        'categoria': tuple(categories[i] for i in rng.integers(0, 50, size=rows)),
+        'preco_euros': tuple(euros.tolist()),
+        'preco_reais': tuple(np.round(euros * 6.35, 2).tolist()),
+        'review': tuple(['One', 'Two', 'Three', 'Four', 'Five'][i] for i in rng.integers(0, 5, size=rows)),
+        'link': tuple(f'https://books.toscrape.com/catalogue/livro_{i}/index.html' for i in range(rows)),
+    }
+
+
+def benchmark(rows: int, worker_counts: Sequence[int], repeat: int = 3):
+    from ml.data_processor import MLDataProcessor
+
+    processor = MLDataProcessor()
+    raw = _synthetic_catalog(rows)
+    euros = np.array(raw['preco_euros'])
+    reais = np.array(raw['preco_reais'])
+    reference = {
+        'price_stats': {'euros': (float(euros.mean()), float(euros.std(ddof=1))),
+                        'reais': (float(reais.mean()), float(reais.std(ddof=1)))},
+        'median_price': float(np.median(euros)),
+    }
+    category_mapping = {c: i + 1 for i, c in enumerate(sorted(set(raw['categoria'])))}
+
+    baseline = None
+    reference_columns = None
+    print(f"{'workers':>8} {'melhor (s)':>12} {'linhas/s':>14} {'speedup':>8}")
+    for workers in worker_counts:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            columns = processor.compute_columns(raw, reference, category_mapping, with_target=True, workers=workers)
+            timings.append(time.perf_counter() - started)
+
+        if reference_columns is None:
+            reference_columns = columns
+        elif any(not np.array_equal(reference_columns[c], columns[c]) or reference_columns[c].dtype != columns[c].dtype
+                 for c in reference_columns):
+            raise SystemExit(f"Resultado com {workers} workers difere da execução serial")
+
+        best = min(timings)
+        baseline = baseline or best
+        print(f"{workers:>8} {best:>12.3f} {rows / best:>14,.0f} {baseline / best:>8.2f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark da montagem de features em paralelo")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    benchmark(args.rows, args.workers, args.repeat)
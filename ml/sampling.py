@@ -0,0 +1,122 @@
+from database.currency import currency_rates
+from typing import List, NamedTuple, Optional, Tuple
+
+
+class SplitSpec(NamedTuple):
+    """Parâmetros de amostragem/divisão treino-teste resolvidos no SQL"""
+    split: Optional[str] = None       # 'train', 'test' ou None (todos os registros)
+    seed: int = 0
+    fraction: float = 0.8             # fração destinada ao treino
+    stratify: bool = False            # estratifica por target_popular
+    sample: Optional[float] = None    # percentual da tabela via TABLESAMPLE
+
+    def describe(self) -> dict:
+        return {
+            'split': self.split,
+            'seed': self.seed,
+            'train_fraction': self.fraction,
+            'test_fraction': round(1 - self.fraction, 6),
+            'stratify_by': 'target_popular' if self.stratify else None,
+            'sample_percent': self.sample,
+            'assignment': "md5(upc_livro || ':' || seed) mapeado para [0, 1)"
+        }
+
+
+NO_SPLIT = SplitSpec()
+
+# Valor determinístico em [0, 1) por livro e seed: os 32 bits iniciais do md5
+_HASH_EXPRESSION = "('x' || substr(md5(upc_livro || ':' || %s), 1, 8))::bit(32)::bigint / 4294967296.0"
+
+_SELECT_COLUMNS = """
+        upc_livro,
+        titulo,
+        categoria,
+        valor_principal_em_euros,
+        valor_principal_em_reais,
+        review,
+        link"""
+
+
+def _source_columns() -> str:
+    """Colunas lidas de livros; o preço em reais não é guardado, vem da cotação vigente"""
+    return f"""
+        upc_livro,
+        titulo,
+        categoria,
+        valor_principal_em_euros,
+        {currency_rates.price_sql('reais', required=False)} AS valor_principal_em_reais,
+        review,
+        link"""
+
+
+def build_eligible_query(spec: SplitSpec = NO_SPLIT) -> Tuple[str, List]:
+    """
+    Livros elegíveis para ML (com o TABLESAMPLE, se houver), antes do filtro de
+    partição e do limit. É a população de referência das estatísticas: treino e
+    teste são normalizados e rotulados com os mesmos números.
+    """
+    # Parâmetros na ordem em que os placeholders aparecem no SQL
+    params: List = [str(spec.seed)]
+    
+    tablesample = ""
+    if spec.sample is not None:
+        tablesample = "TABLESAMPLE BERNOULLI (%s) REPEATABLE (%s)"
+        params.extend([spec.sample, spec.seed])
+    
+    eligible = f"""
+        SELECT {_source_columns()},
+            {_HASH_EXPRESSION} AS split_hash
+        FROM livros {tablesample}
+        WHERE titulo IS NOT NULL 
+        AND categoria IS NOT NULL 
+        AND valor_principal_em_euros IS NOT NULL
+    """
+    return eligible, params
+
+
+def build_source_query(spec: SplitSpec = NO_SPLIT) -> Tuple[str, List]:
+    """
+    Monta a consulta dos livros elegíveis para ML já filtrada pela partição pedida.
+    
+    Retorna (sql, params). O SQL termina em `LIMIT %s`, então quem chama acrescenta
+    o limit (ou None para sem limite) ao final dos parâmetros.
+    """
+    eligible, params = build_eligible_query(spec)
+    
+    source = "eligible"
+    where_clause = ""
+    ranked = ""
+    
+    if spec.split is not None and not spec.stratify:
+        where_clause = "WHERE split_hash < %s" if spec.split == 'train' else "WHERE split_hash >= %s"
+        params.append(spec.fraction)
+    elif spec.split is not None:
+        # Dentro de cada estrato, os primeiros round(fraction * n) pelo hash vão para treino
+        source = "ranked"
+        ranked = """,
+        ranked AS (
+            SELECT s.*,
+                ROW_NUMBER() OVER (PARTITION BY stratum ORDER BY split_hash, upc_livro) AS stratum_rank,
+                COUNT(*) OVER (PARTITION BY stratum) AS stratum_size
+            FROM (
+                SELECT eligible.*,
+                    (review IN ('Four', 'Five') AND valor_principal_em_euros <= (
+                        SELECT PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY valor_principal_em_euros) FROM eligible
+                    )) AS stratum
+                FROM eligible
+            ) s
+        )"""
+        where_clause = ("WHERE stratum_rank <= ROUND(%s * stratum_size)" if spec.split == 'train'
+                        else "WHERE stratum_rank > ROUND(%s * stratum_size)")
+        params.append(spec.fraction)
+    
+    sql = f"""
+        WITH eligible AS ({eligible}){ranked}
+        SELECT {_SELECT_COLUMNS}
+        FROM {source}
+        {where_clause}
+        ORDER BY titulo, upc_livro
+        LIMIT %s
+    """
+    return sql, params
+
@@ -0,0 +1,169 @@
+from ml.data_processor import MLDataProcessor
+from ml.dataset_version import dataset_version
+from ml.text_features import text_feature_store, CSRMatrix
+from ml.parallel import ML_FEATURE_WORKERS
+from ml.state import ml_state
+from typing import List, Optional, Tuple
+import numpy as np
+import threading
+
+
+# Dimensões para onde os n-grams do título são "dobrados" no vetor denso
+TITLE_DIMS = 256
+
+# Peso de cada bloco de features no vetor final
+FEATURE_WEIGHTS = {
+    'price': 1.0,
+    'rating': 1.0,
+    'category': 1.5,
+    'title': 2.0,
+}
+
+# A partir de quantos livros o índice é particionado (IVF) em vez de busca exaustiva
+IVF_MIN_ROWS = 50_000
+IVF_NPROBE = 8
+IVF_ITERATIONS = 10
+
+# Tamanho dos blocos de linhas nas multiplicações de matriz
+SEARCH_BATCH_ROWS = 65_536
+
+
+def _fold_title_vectors(matrix: CSRMatrix, rows: np.ndarray, dims: int = TITLE_DIMS) -> np.ndarray:
+    """Projeta as linhas pedidas (-1 = sem texto) dos vetores hashed em `dims` dimensões densas"""
+    valid = rows >= 0
+    starts = np.where(valid, matrix.indptr[np.maximum(rows, 0)], 0)
+    lengths = np.where(valid, matrix.indptr[np.maximum(rows, 0) + 1] - starts, 0)
+    
+    # Posição em indices/data de cada elemento não-nulo das linhas selecionadas
+    row_ids = np.repeat(np.arange(len(rows)), lengths)
+    positions = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(starts, lengths)
+    
+    dense = np.zeros((len(rows), dims), dtype=np.float32)
+    np.add.at(dense, (row_ids, matrix.indices[positions] % dims), matrix.data[positions])
+    return _normalize_rows(dense)
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+class VectorIndex:
+    """Matriz float32 contígua de vetores normalizados com busca por produto interno"""
+    
+    def __init__(self, version: str, vectors: np.ndarray, upcs: np.ndarray,
+                 titulos: np.ndarray, categorias: np.ndarray):
+        self.version = version
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.upcs = upcs
+        self.titulos = titulos
+        self.categorias = categorias
+        self.row_by_upc = {upc: idx for idx, upc in enumerate(upcs.tolist())}
+        
+        self.centroids: Optional[np.ndarray] = None
+        self.list_offsets: Optional[np.ndarray] = None
+        self.list_members: Optional[np.ndarray] = None
+        if len(self.vectors) >= IVF_MIN_ROWS:
+            self._build_ivf()
+    
+    def _assign(self, centroids: np.ndarray) -> np.ndarray:
+        """Centroide mais próximo de cada vetor, processado em blocos"""
+        assignment = np.empty(len(self.vectors), dtype=np.int32)
+        for start in range(0, len(self.vectors), SEARCH_BATCH_ROWS):
+            block = self.vectors[start:start + SEARCH_BATCH_ROWS]
+            assignment[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        return assignment
+    
+    def _build_ivf(self):
+        """Particiona o índice com k-means esférico (IVF)"""
+        n_lists = int(np.sqrt(len(self.vectors)))
+        rng = np.random.default_rng(0)
+        centroids = self.vectors[rng.choice(len(self.vectors), n_lists, replace=False)].copy()
+        
+        for _ in range(IVF_ITERATIONS):
+            assignment = self._assign(centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, self.vectors)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]
+            centroids = _normalize_rows(sums)
+        
+        assignment = self._assign(centroids)
+        self.centroids = centroids
+        self.list_members = np.argsort(assignment, kind='stable').astype(np.int64)
+        self.list_offsets = np.concatenate(([0], np.cumsum(np.bincount(assignment, minlength=n_lists))))
+    
+    def _candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        if self.centroids is None:
+            return None
+        nearest_lists = np.argsort(self.centroids @ query)[::-1][:nprobe]
+        return np.concatenate([
+            self.list_members[self.list_offsets[l]:self.list_offsets[l + 1]] for l in nearest_lists
+        ])
+    
+    def search(self, row: int, k: int = 10, nprobe: int = IVF_NPROBE) -> List[Tuple[int, float]]:
+        """Retorna os k vizinhos mais próximos (índice, similaridade) de uma linha do índice"""
+        query = self.vectors[row]
+        candidates = self._candidates(query, nprobe)
+        
+        if candidates is None:
+            scores = self.vectors @ query
+            candidate_rows = np.arange(len(scores))
+        else:
+            scores = self.vectors[candidates] @ query
+            candidate_rows = candidates
+        
+        scores[candidate_rows == row] = -np.inf
+        k = min(k, len(scores) - 1)
+        if k <= 0:
+            return []
+        
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(candidate_rows[i]), float(scores[i])) for i in top]
+
+
+class SimilarityIndexStore:
+    """Mantém o índice de similaridade da versão atual do dataset, reconstruindo quando ela muda"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index: Optional[VectorIndex] = None
+        self._processor = MLDataProcessor()
+    
+    def _build(self, version: str) -> VectorIndex:
+        columns, metadata = self._processor.get_training_columns(limit=None, workers=ML_FEATURE_WORKERS)
+        text_features = text_feature_store.get(version)
+        
+        n_categories = max(metadata['categorical_mappings']['categoria'].values(), default=0) + 1
+        category_one_hot = np.zeros((len(columns['upc_livro']), n_categories), dtype=np.float32)
+        category_one_hot[np.arange(len(columns['upc_livro'])), columns['categoria_encoded']] = 1.0
+        
+        text_rows = np.array([text_features.row_by_upc.get(upc, -1) for upc in columns['upc_livro'].tolist()], dtype=np.int64)
+        
+        blocks = [
+            FEATURE_WEIGHTS['price'] * columns['preco_euros_normalized'].astype(np.float32)[:, None],
+            FEATURE_WEIGHTS['rating'] * ((columns['review_score'].astype(np.float32) - 3) / 2)[:, None],
+            FEATURE_WEIGHTS['category'] * category_one_hot,
+            FEATURE_WEIGHTS['title'] * _fold_title_vectors(text_features.matrices['titulo'], text_rows),
+        ]
+        vectors = _normalize_rows(np.hstack(blocks).astype(np.float32))
+        return VectorIndex(version, vectors, columns['upc_livro'], columns['titulo'], columns['categoria'])
+    
+    def loaded(self) -> Optional[VectorIndex]:
+        return self._index
+    
+    def get(self) -> VectorIndex:
+        version = dataset_version.current()
+        index = self._index
+        if index is not None and index.version == version:
+            return index
+        
+        with self._lock:
+            if self._index is None or self._index.version != version:
+                with ml_state.track('similarity_index', version):
+                    self._index = self._build(version)
+            return self._index
+
+
+similarity_index = SimilarityIndexStore()
@@ -0,0 +1,35 @@
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Optional
+import threading
+import time
+
+
+class MLBuildState:
+    """Registro em memória das últimas construções de artefatos de ML (features, índices...)"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._builds: Dict[str, Dict[str, Any]] = {}
+    
+    @contextmanager
+    def track(self, name: str, version: Optional[Any] = None):
+        """Mede a duração de uma construção e registra quando ela termina com sucesso"""
+        started = time.perf_counter()
+        yield
+        self.record(name, time.perf_counter() - started, version)
+    
+    def record(self, name: str, duration_seconds: float, version: Optional[Any] = None):
+        with self._lock:
+            self._builds[name] = {
+                'finished_at': datetime.now().isoformat(),
+                'duration_ms': round(duration_seconds * 1000, 2),
+                'version': version,
+            }
+    
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {name: dict(build) for name, build in self._builds.items()}
+
+
+ml_state = MLBuildState()
@@ -0,0 +1,115 @@
+from database.connection import get_connection
+from ml.data_processor import MLDataProcessor
+from ml.dataset_version import dataset_version
+from ml.vocabulary import STATIC_VOCABULARIES
+from ml.state import ml_state
+from models.ml_responses import MLStats
+from typing import Dict, Optional
+import psycopg2.extras
+import threading
+
+
+class MLStatsCache:
+    """Estatísticas de ML calculadas numa única leitura de livros e guardadas por versão do dataset"""
+    
+    def __init__(self, processor: Optional[MLDataProcessor] = None):
+        self.processor = processor or MLDataProcessor()
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._stats: Optional[MLStats] = None
+    
+    def _sql(self) -> str:
+        buckets = list(self.processor.price_categories)
+        reviews = STATIC_VOCABULARIES['review']
+        
+        bucket_counts = ",\n".join(
+            f"COUNT(*) FILTER (WHERE price_category = '{bucket}') AS bucket_{bucket}" for bucket in buckets
+        )
+        review_counts = ",\n".join(
+            f"COUNT(*) FILTER (WHERE review = '{token}') AS review_{code}" for token, code in reviews.items()
+        )
+        
+        # GROUPING SETS: uma linha por categoria + a linha de totais, na mesma leitura da tabela
+        return f"""
+            SELECT
+                categoria_key,
+                GROUPING(categoria_key) = 1 AS is_total,
+                COUNT(*) AS total_books,
+                {bucket_counts},
+                {review_counts},
+                COUNT(*) FILTER (WHERE titulo IS NULL OR titulo = '') AS missing_titles,
+                COUNT(*) FILTER (WHERE categoria_key IS NULL) AS missing_categories,
+                COUNT(*) FILTER (WHERE valor_principal_em_euros IS NULL) AS missing_prices,
+                COUNT(*) FILTER (WHERE review IS NULL OR review = '') AS missing_reviews
+            FROM (
+                SELECT
+                    titulo,
+                    review,
+                    valor_principal_em_euros,
+                    NULLIF(categoria, '') AS categoria_key,
+                    {self.processor.price_category_sql('valor_principal_em_euros')} AS price_category
+                FROM livros
+            ) l
+            GROUP BY GROUPING SETS ((categoria_key), ())
+        """
+    
+    def _compute(self, version: str) -> MLStats:
+        conn = get_connection()
+        try:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            cursor.execute(self._sql())
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+        
+        buckets = list(self.processor.price_categories)
+        
+        def price_distribution(row) -> Dict[str, int]:
+            return {bucket: row[f'bucket_{bucket}'] for bucket in buckets}
+        
+        def missing_values(row) -> Dict[str, int]:
+            return {
+                'titles': row['missing_titles'],
+                'categories': row['missing_categories'],
+                'prices': row['missing_prices'],
+                'reviews': row['missing_reviews']
+            }
+        
+        totals = next(row for row in rows if row['is_total'])
+        categories = [row for row in rows if not row['is_total'] and row['categoria_key'] is not None]
+        categories.sort(key=lambda row: row['total_books'], reverse=True)
+        
+        return MLStats(
+            total_books=totals['total_books'],
+            total_categories=len(categories),
+            price_distribution=price_distribution(totals),
+            review_distribution={
+                str(code): totals[f'review_{code}'] for code in STATIC_VOCABULARIES['review'].values()
+            },
+            category_distribution={row['categoria_key']: row['total_books'] for row in categories[:10]},
+            missing_values=missing_values(totals),
+            category_breakdown={
+                row['categoria_key']: {
+                    'total_books': row['total_books'],
+                    'price_distribution': price_distribution(row),
+                    'missing_values': missing_values(row)
+                }
+                for row in categories
+            },
+            dataset_version=version
+        )
+    
+    def get(self) -> MLStats:
+        version = dataset_version.current()
+        if self._stats is not None and self._version == version:
+            return self._stats
+        
+        with self._lock:
+            if self._stats is None or self._version != version:
+                with ml_state.track('stats', version):
+                    self._stats = self._compute(version)
+                self._version = version
+            return self._stats
+
+
+ml_stats_cache = MLStatsCache()
@@ -0,0 +1,250 @@
+from database.connection import get_connection
+from ml.dataset_version import dataset_version
+from ml.state import ml_state
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import glob
+import threading
+import time
+import zlib
+import os
+import re
+
+
+# Diretório dos artefatos de ML calculados por versão do dataset
+ML_CACHE_DIR = os.getenv('ML_CACHE_DIR', '.ml_cache')
+
+# Configuração dos vetores hashed de cada campo de texto
+TEXT_FIELDS = {
+    'titulo': {'analyzer': 'char', 'ngram_range': (3, 4), 'n_features': 2 ** 16},
+    'sinopse': {'analyzer': 'word', 'ngram_range': (1, 2), 'n_features': 2 ** 18},
+}
+
+_WORD_PATTERN = re.compile(r'\w\w+', re.UNICODE)
+
+# Caches de versões sem ordem (fingerprints) parados há mais que isso são removidos
+TEXT_CACHE_MAX_IDLE_SECONDS = int(os.getenv('TEXT_CACHE_MAX_IDLE_SECONDS', '3600'))
+
+# Textos por lote em hash_vectorize (limita a memória dos arrays de n-grams)
+HASH_BATCH_ROWS = 8192
+
+
+class CSRMatrix:
+    """Matriz esparsa no formato CSR (mesmos arrays de scipy.sparse.csr_matrix)"""
+    
+    __slots__ = ('indptr', 'indices', 'data', 'shape')
+    
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, shape: Tuple[int, int]):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.shape = shape
+    
+    @property
+    def nnz(self) -> int:
+        return int(self.indptr[-1])
+    
+    def slice_rows(self, start: int, stop: int) -> "CSRMatrix":
+        stop = min(stop, self.shape[0])
+        start = min(start, stop)
+        lo, hi = self.indptr[start], self.indptr[stop]
+        return CSRMatrix(
+            self.indptr[start:stop + 1] - lo,
+            self.indices[lo:hi],
+            self.data[lo:hi],
+            (stop - start, self.shape[1])
+        )
+
+
+def _ngrams(text: str, analyzer: str, ngram_range: Tuple[int, int]) -> List[str]:
+    low, high = ngram_range
+    if analyzer == 'char':
+        text = f" {' '.join(text.lower().split())} "
+        return [text[i:i + n] for n in range(low, high + 1) for i in range(len(text) - n + 1)]
+    
+    tokens = _WORD_PATTERN.findall(text.lower())
+    return [' '.join(tokens[i:i + n]) for n in range(low, high + 1) for i in range(len(tokens) - n + 1)]
+
+
+def _vectorize_batch(texts: List[Optional[str]], analyzer: str, ngram_range: Tuple[int, int],
+                     n_features: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(contagem por linha, colunas, valores) de um lote, com um único np.unique para o lote todo"""
+    grams_per_row = [_ngrams(text or '', analyzer, ngram_range) for text in texts]
+    counts = np.fromiter((len(grams) for grams in grams_per_row), dtype=np.int64, count=len(texts))
+    total = int(counts.sum())
+    
+    hashes = np.fromiter((zlib.crc32(g.encode('utf-8')) for grams in grams_per_row for g in grams),
+                         dtype=np.uint32, count=total)
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+    rows = np.repeat(np.arange(len(texts), dtype=np.int64), counts)
+    
+    # Soma os sinais de cada par (linha, coluna); a chave ordenada já deixa as colunas em ordem por linha
+    keys = rows * n_features + ((hashes & 0x7FFFFFFF) % n_features)
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    values = np.bincount(inverse, weights=signs, minlength=len(unique_keys))
+    
+    nonzero = values != 0
+    unique_keys, values = unique_keys[nonzero], values[nonzero]
+    key_rows = unique_keys // n_features
+    
+    # Norma L2 por linha
+    norms = np.sqrt(np.bincount(key_rows, weights=values * values, minlength=len(texts)))
+    values = values / norms[key_rows]
+    
+    row_counts = np.bincount(key_rows, minlength=len(texts))
+    return row_counts, (unique_keys % n_features).astype(np.int32), values.astype(np.float32)
+
+
+def hash_vectorize(texts: Iterable[Optional[str]], analyzer: str = 'char',
+                   ngram_range: Tuple[int, int] = (3, 4), n_features: int = 2 ** 16,
+                   batch_rows: int = HASH_BATCH_ROWS) -> CSRMatrix:
+    """
+    Vetoriza um lote de textos com feature hashing de n-grams (sinal alternado, norma L2).
+    
+    Usa crc32 para o hash, então os índices são estáveis entre processos e execuções.
+    Os n-grams de `batch_rows` textos por vez são hasheados num único array e a
+    matriz CSR sai de operações vetorizadas sobre os pares (linha, coluna).
+    """
+    texts = list(texts)
+    row_counts, indices, data = [np.zeros(1, dtype=np.int64)], [], []
+    for start in range(0, len(texts), batch_rows):
+        counts, columns, values = _vectorize_batch(texts[start:start + batch_rows], analyzer, ngram_range, n_features)
+        row_counts.append(counts)
+        indices.append(columns)
+        data.append(values)
+    
+    return CSRMatrix(
+        np.cumsum(np.concatenate(row_counts)).astype(np.int64),
+        np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32),
+        np.concatenate(data) if data else np.zeros(0, dtype=np.float32),
+        (len(texts), n_features)
+    )
+
+
+class TextFeatureSet:
+    """Vetores de texto de todos os livros para uma versão do dataset"""
+    
+    def __init__(self, version: str, upcs: np.ndarray, matrices: Dict[str, CSRMatrix]):
+        self.version = version
+        self.upcs = upcs
+        self.matrices = matrices
+        self.row_by_upc = {upc: idx for idx, upc in enumerate(upcs.tolist())}
+    
+    def save(self, path: str):
+        arrays = {'upcs': self.upcs}
+        for field, matrix in self.matrices.items():
+            arrays[f'{field}_indptr'] = matrix.indptr
+            arrays[f'{field}_indices'] = matrix.indices
+            arrays[f'{field}_data'] = matrix.data
+        
+        # Grava em arquivo temporário e renomeia para não deixar cache pela metade
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, version: str, path: str) -> "TextFeatureSet":
+        with np.load(path) as arrays:
+            upcs = arrays['upcs']
+            matrices = {
+                field: CSRMatrix(
+                    arrays[f'{field}_indptr'], arrays[f'{field}_indices'], arrays[f'{field}_data'],
+                    (len(upcs), config['n_features'])
+                )
+                for field, config in TEXT_FIELDS.items()
+            }
+        return cls(version, upcs, matrices)
+
+
+def _version_number(version: str) -> Optional[int]:
+    """n de uma versão registrada pelo loader ("v<n>"); None para fingerprints"""
+    return int(version[1:]) if re.fullmatch(r'v\d+', version) else None
+
+
+class TextFeatureStore:
+    """Calcula os vetores de texto uma vez por versão do dataset e mantém cache em disco"""
+    
+    def __init__(self, cache_dir: str = ML_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._current: Optional[TextFeatureSet] = None
+    
+    def _cache_path(self, version: str) -> str:
+        return os.path.join(self.cache_dir, f"text_features_{version}.npz")
+    
+    def _evict(self, version: str):
+        """
+        Remove os caches que ficaram para trás depois de gravar `version`. Outro worker
+        da API pode ainda estar numa versão anterior (ou já numa mais nova), então só
+        sai o que é com certeza antigo: versões do loader ("v<n>") menores que a
+        gravada e, sem ordem entre fingerprints, os arquivos parados há mais de
+        TEXT_CACHE_MAX_IDLE_SECONDS.
+        """
+        written = _version_number(version)
+        idle_limit = time.time() - TEXT_CACHE_MAX_IDLE_SECONDS
+        prefix, suffix = self._cache_path('*').split('*')
+        for path in glob.glob(self._cache_path('*')):
+            other = path[len(prefix):-len(suffix)]
+            if other == version:
+                continue
+            number = _version_number(other)
+            try:
+                if number is not None:
+                    stale = written is not None and number < written
+                else:
+                    stale = os.path.getmtime(path) < idle_limit
+                if stale:
+                    os.remove(path)
+            except FileNotFoundError:
+                # Outro worker da API já removeu
+                pass
+    
+    def _build(self, version: str) -> TextFeatureSet:
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT upc_livro, titulo, sinopse FROM livros ORDER BY upc_livro")
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+        
+        upcs, titulos, sinopses = zip(*rows) if rows else ((), (), ())
+        texts = {'titulo': titulos, 'sinopse': sinopses}
+        matrices = {field: hash_vectorize(texts[field], **config) for field, config in TEXT_FIELDS.items()}
+        return TextFeatureSet(version, np.array(upcs, dtype=str), matrices)
+    
+    def loaded(self) -> Optional[TextFeatureSet]:
+        return self._current
+    
+    def get(self, version: Optional[str] = None) -> TextFeatureSet:
+        """Retorna os vetores da versão pedida (ou da atual), calculando só se não houver cache"""
+        version = version or dataset_version.current()
+        current = self._current
+        if current is not None and current.version == version:
+            return current
+        
+        with self._lock:
+            if self._current is not None and self._current.version == version:
+                return self._current
+            
+            path = self._cache_path(version)
+            if os.path.exists(path):
+                feature_set = TextFeatureSet.load(version, path)
+                # Marca o uso: a limpeza por tempo parado olha o mtime
+                try:
+                    os.utime(path)
+                except FileNotFoundError:
+                    pass
+            else:
+                with ml_state.track('text_features', version):
+                    feature_set = self._build(version)
+                os.makedirs(self.cache_dir, exist_ok=True)
+                feature_set.save(path)
+                self._evict(version)
+            
+            self._current = feature_set
+            return feature_set
+
+
+text_feature_store = TextFeatureStore()
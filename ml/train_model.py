@@ -0,0 +1,71 @@
+"""
+Treina o modelo de popularidade a partir do dataset de treinamento e grava o artefato.
+
+Uso:
+    python -m ml.train_model --limit 5000 --seed 42 --workers 4
+"""
+
+import argparse
+import numpy as np
+
+from ml.data_processor import MLDataProcessor
+from ml.dataset_version import dataset_version
+from ml.model import PopularityModel, model_matrix, ML_MODEL_DIR
+from ml.sampling import SplitSpec
+from ml.parallel import ML_FEATURE_WORKERS
+
+
+def train(limit=None, seed=0, fraction=0.8, epochs=500, learning_rate=0.5, l2=1e-3,
+          model_dir=ML_MODEL_DIR, activate=True, workers=ML_FEATURE_WORKERS):
+    processor = MLDataProcessor()
+    train_columns, metadata = processor.get_training_columns(
+        limit=limit, split=SplitSpec('train', seed, fraction, True), workers=workers)
+    test_columns, _ = processor.get_training_columns(
+        limit=limit, split=SplitSpec('test', seed, fraction, True), workers=workers)
+    
+    if not len(train_columns['upc_livro']):
+        raise SystemExit("Nenhum dado de treino encontrado")
+    
+    model = PopularityModel.train(
+        model_matrix(train_columns),
+        train_columns['target_popular'].astype(np.float64),
+        epochs=epochs,
+        learning_rate=learning_rate,
+        l2=l2,
+        metadata={
+            'dataset_version': dataset_version.current(),
+            'vocabulary_version': metadata['vocabulary_version'],
+            'train_records': int(len(train_columns['upc_livro'])),
+            'test_records': int(len(test_columns['upc_livro'])),
+            'split': {'seed': seed, 'train_fraction': fraction, 'stratify_by': 'target_popular'},
+        }
+    )
+    
+    if len(test_columns['upc_livro']):
+        predicted = model.predict_proba(model_matrix(test_columns)) >= 0.5
+        model.metadata['metrics'] = {
+            'test_accuracy': round(float((predicted == test_columns['target_popular']).mean()), 4)
+        }
+    
+    path = model.save(model_dir, activate=activate)
+    print(f"Modelo {model.version} gravado em {path}" + (" (ativo)" if activate else ""))
+    print(f"Métricas: {model.metadata.get('metrics', {})}")
+    return model
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Treina o modelo de popularidade de livros")
+    parser.add_argument('--limit', type=int, default=None, help="Limite de registros (todos se omitido)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed da divisão treino/teste")
+    parser.add_argument('--fraction', type=float, default=0.8, help="Fração destinada ao treino")
+    parser.add_argument('--epochs', type=int, default=500)
+    parser.add_argument('--learning-rate', type=float, default=0.5)
+    parser.add_argument('--l2', type=float, default=1e-3)
+    parser.add_argument('--model-dir', default=ML_MODEL_DIR)
+    parser.add_argument('--workers', type=int, default=ML_FEATURE_WORKERS, help="Processos para extração de features")
+    parser.add_argument('--no-activate', action='store_true', help="Grava o artefato sem torná-lo o modelo ativo")
+    args = parser.parse_args()
+    
+    train(limit=args.limit, seed=args.seed, fraction=args.fraction, epochs=args.epochs,
+          learning_rate=args.learning_rate, l2=args.l2, model_dir=args.model_dir,
+          activate=not args.no_activate, workers=args.workers)
@@ -0,0 +1,185 @@
+from database.connection import get_connection
+from types import MappingProxyType
+from typing import Dict, Iterable, Mapping, Optional
+import threading
+
+
+# Vocabulários fixos, gravados na primeira carga junto com as categorias
+STATIC_VOCABULARIES = {
+    'review': {'One': 1, 'Two': 2, 'Three': 3, 'Four': 4, 'Five': 5},
+    'price_category': {'budget': 0, 'mid': 1, 'premium': 2},
+}
+
+# Chave do advisory lock usado para serializar inserções entre workers
+_VOCABULARY_LOCK_KEY = 7_301_028
+
+
+class VocabularySnapshot:
+    """Versão imutável do vocabulário, compartilhada entre requisições"""
+    
+    __slots__ = ('version', 'mappings')
+    
+    def __init__(self, version: int, mappings: Dict[str, Dict[str, int]]):
+        self.version = version
+        self.mappings: Mapping[str, Mapping[str, int]] = MappingProxyType(
+            {field: MappingProxyType(dict(tokens)) for field, tokens in mappings.items()}
+        )
+    
+    def encode(self, field: str, token: Optional[str], default: int = 0) -> int:
+        return self.mappings.get(field, {}).get(token, default)
+    
+    def missing(self, field: str, tokens: Iterable[Optional[str]]) -> set:
+        known = self.mappings.get(field, {})
+        return {token for token in tokens if token and token not in known}
+    
+    def sizes(self) -> Dict[str, int]:
+        return {field: len(tokens) for field, tokens in self.mappings.items()}
+    
+    def as_dict(self) -> Dict[str, Dict[str, int]]:
+        return {field: dict(tokens) for field, tokens in self.mappings.items()}
+
+
+class VocabularyStore:
+    """
+    Vocabulário persistido (tabela ml_vocabulary) para as variáveis categóricas.
+    
+    É append-only: um token recebe um código uma única vez e nunca muda, e cada
+    lote de novos tokens gera uma nova versão. É carregado uma vez por processo e
+    só é recarregado quando aparece um token desconhecido.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot: Optional[VocabularySnapshot] = None
+    
+    def _ensure_table(self, cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ml_vocabulary (
+                field VARCHAR(50) NOT NULL,
+                token TEXT NOT NULL,
+                code INTEGER NOT NULL,
+                version INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (field, token),
+                UNIQUE (field, code)
+            )
+        """)
+    
+    def _read(self, cursor, version: Optional[int] = None) -> VocabularySnapshot:
+        cursor.execute("""
+            SELECT field, token, code, version
+            FROM ml_vocabulary
+            WHERE %s IS NULL OR version <= %s
+            ORDER BY field, code
+        """, (version, version))
+        
+        mappings: Dict[str, Dict[str, int]] = {}
+        latest = 0
+        for field, token, code, token_version in cursor.fetchall():
+            mappings.setdefault(field, {})[token] = code
+            latest = max(latest, token_version)
+        return VocabularySnapshot(latest if version is None else min(version, latest), mappings)
+    
+    def _append(self, new_tokens: Dict[str, Iterable[str]]) -> VocabularySnapshot:
+        """Acrescenta tokens novos numa nova versão e retorna o vocabulário atualizado"""
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            self._ensure_table(cursor)
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (_VOCABULARY_LOCK_KEY,))
+            
+            # Relê dentro do lock: outro worker pode ter inserido os mesmos tokens
+            current = self._read(cursor)
+            next_version = current.version + 1
+            inserted = False
+            
+            for field, tokens in new_tokens.items():
+                known = current.mappings.get(field, {})
+                static = STATIC_VOCABULARIES.get(field)
+                next_code = max(known.values(), default=-1) + 1
+                
+                for token in sorted(set(tokens) - set(known)):
+                    code = static[token] if static else next_code
+                    next_code = max(next_code, code + 1)
+                    cursor.execute("""
+                        INSERT INTO ml_vocabulary (field, token, code, version)
+                        VALUES (%s, %s, %s, %s)
+                    """, (field, token, code, next_version))
+                    inserted = True
+            
+            snapshot = self._read(cursor) if inserted else current
+            conn.commit()
+            return snapshot
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def _load(self) -> VocabularySnapshot:
+        """Carrega o vocabulário; na primeira execução cria a versão 1 a partir de livros"""
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            self._ensure_table(cursor)
+            conn.commit()
+            snapshot = self._read(cursor)
+            
+            missing = {field: set(tokens) - set(snapshot.mappings.get(field, {}))
+                       for field, tokens in STATIC_VOCABULARIES.items()}
+            
+            cursor.execute("""
+                SELECT DISTINCT categoria
+                FROM livros
+                WHERE categoria IS NOT NULL AND categoria != ''
+            """)
+            missing['categoria'] = snapshot.missing('categoria', (row[0] for row in cursor.fetchall()))
+        finally:
+            conn.close()
+        
+        if any(missing.values()):
+            snapshot = self._append(missing)
+        return snapshot
+    
+    def current(self) -> VocabularySnapshot:
+        """Retorna a versão mais recente carregada neste processo"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = self._load()
+                snapshot = self._snapshot
+        return snapshot
+    
+    def loaded(self) -> Optional[VocabularySnapshot]:
+        """Vocabulário já carregado neste processo, sem acessar o banco"""
+        return self._snapshot
+    
+    def ensure(self, field: str, tokens: Iterable[Optional[str]]) -> VocabularySnapshot:
+        """Garante que todos os tokens tenham código, acrescentando os que faltarem"""
+        tokens = set(tokens)
+        snapshot = self.current()
+        if not snapshot.missing(field, tokens):
+            return snapshot
+        
+        with self._lock:
+            missing = self._snapshot.missing(field, tokens)
+            if missing:
+                self._snapshot = self._append({field: missing})
+            return self._snapshot
+    
+    def get_version(self, version: Optional[int] = None) -> VocabularySnapshot:
+        """Retorna o vocabulário como era numa versão específica (ou a mais recente)"""
+        current = self.current()
+        if version is None or version == current.version:
+            return current
+        
+        conn = get_connection()
+        try:
+            return self._read(conn.cursor(), version)
+        finally:
+            conn.close()
+
+
+# Instância compartilhada por todo o processo
+vocabulary_store = VocabularyStore()
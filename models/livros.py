@@ -5,11 +5,17 @@ from typing import List, Optional
 class Livro_Generico(BaseModel):
     upc_livro: str
     titulo: str
-    categoria: str
+    # None enquanto o livro só foi carregado pela listagem (detalhes pendentes)
+    categoria: Optional[str] = None
+    # Id em /api/v1/categories; filtro exato em /api/v1/books/search?category_id=
+    categoria_id: Optional[int] = None
     valor_principal_em_euros: float
-    valor_principal_em_reais: float
+    # None se não houver cotação de BRL vigente em cotacoes
+    valor_principal_em_reais: Optional[float] = None
     review: str
     link: str
+    # Capa no armazém local, servida em /api/v1/images/{imagem_sha256}; None se ainda não baixada
+    imagem_sha256: Optional[str] = None
 
 
 class Response_Livro_Generico(BaseModel):
@@ -20,9 +26,16 @@ class Response_Livro_Generico(BaseModel):
     books: List[Livro_Generico]
 
 
+class Categoria(BaseModel):
+    id: int
+    nome: str
+    total_livros: int
+
+
 class Response_Categories(BaseModel):
     categories: List[str]
     total_categories: int
+    category_details: List[Categoria]
 
 
 class HealthCheck(BaseModel):
@@ -31,12 +44,17 @@ class HealthCheck(BaseModel):
     database_message: Optional[str] = None
 
 
+class Livro_Preco(Livro_Generico):
+    # Preço na moeda do filtro (cotação vigente)
+    valor_na_moeda: float
+
+
 class Response_Price_Range(BaseModel):
     limit: int
     offset: int
     has_more: bool
     results_returned: int
-    books: List[Livro_Generico]
+    books: List[Livro_Preco]
     filter_currency: str
     min_price: Optional[float]
     max_price: Optional[float]
\ No newline at end of file
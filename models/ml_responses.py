@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
@@ -52,6 +52,12 @@ class TrainingDataset(BaseModel):
     statistics: Dict[str, Any]
     created_at: datetime
 
+class CategoryMLStats(BaseModel):
+    """Estatísticas de ML de uma categoria"""
+    total_books: int
+    price_distribution: Dict[str, int]
+    missing_values: Dict[str, int]
+
 class MLStats(BaseModel):
     """Estatísticas gerais para ML"""
     total_books: int
@@ -59,4 +65,89 @@ class MLStats(BaseModel):
     price_distribution: Dict[str, int]
     review_distribution: Dict[str, int]
     category_distribution: Dict[str, int]
-    missing_values: Dict[str, int]
\ No newline at end of file
+    missing_values: Dict[str, int]
+    category_breakdown: Dict[str, CategoryMLStats] = {}
+    dataset_version: Optional[str] = None
+
+class Vocabulary(BaseModel):
+    """Vocabulário persistido das variáveis categóricas"""
+    version: int
+    mappings: Dict[str, Dict[str, int]]
+    sizes: Dict[str, int]
+
+class TextFeatures(BaseModel):
+    """Vetores hashed de n-grams de um campo de texto, codificados em CSR"""
+    dataset_version: str
+    field: str
+    analyzer: str
+    ngram_range: List[int]
+    n_features: int
+    total_records: int
+    offset: int
+    upc_livro: List[str]
+    indptr: List[int]
+    indices: List[int]
+    data: List[float]
+
+class SimilarBook(BaseModel):
+    """Livro similar com o score de similaridade (cosseno)"""
+    upc_livro: str
+    titulo: str
+    categoria: str
+    score: float
+
+class SimilarBooksResponse(BaseModel):
+    """Response para endpoint de livros similares"""
+    upc_livro: str
+    dataset_version: str
+    k: int
+    results: List[SimilarBook]
+
+class PredictFeatureRow(BaseModel):
+    """Features brutas de um livro para predição"""
+    titulo_length: int
+    titulo_word_count: int
+    preco_euros: float
+    review_score: int
+
+class PredictRequest(BaseModel):
+    """Lote para o endpoint de predição: UPCs do catálogo e/ou linhas de features"""
+    upcs: List[str] = []
+    rows: List[PredictFeatureRow] = []
+
+class Prediction(BaseModel):
+    """Resultado da predição de popularidade de um livro"""
+    upc_livro: Optional[str] = None
+    probability: float
+    popular: bool
+
+class PredictResponse(BaseModel):
+    """Response para endpoint de predição"""
+    model_version: str
+    model_type: str
+    predictions: List[Prediction]
+    not_found: List[str]
+
+class DatasetJobRequest(BaseModel):
+    """Parâmetros de um job de geração de dataset"""
+    dataset: str = Field("training-data", pattern="^(features|training-data)$")
+    format: str = Field("parquet", pattern="^(arrow|parquet|npz|ndjson)$")
+    limit: Optional[int] = Field(None, ge=10)
+    split: Optional[str] = Field(None, pattern="^(train|test)$")
+    seed: int = 0
+    fraction: float = Field(0.8, gt=0, lt=1)
+    stratify: bool = False
+    sample: Optional[float] = Field(None, gt=0, le=100)
+
+class DatasetJobStatus(BaseModel):
+    """Estado de um job de geração de dataset"""
+    job_id: str
+    status: str
+    dataset_version: str
+    params: DatasetJobRequest
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    artifact_size_bytes: Optional[int] = None
+    cached: bool = False
+    error: Optional[str] = None
\ No newline at end of file
@@ -12,7 +12,11 @@ class CategoryCount(BaseModel):
 class OverviewStats(BaseModel):
     total_books: int
     average_price_euros: float
-    average_price_reais: float
+    # None se não houver cotação de BRL vigente
+    average_price_reais: Optional[float] = None
+    # Preenchidos quando o parâmetro currency é informado
+    currency: Optional[str] = None
+    average_price: Optional[float] = None
     ratings_distribution: Dict[str, int]
     top_categories: List[CategoryCount]
 
@@ -23,11 +27,15 @@ class CategoryStats(BaseModel):
     avg_price_euros: float
     min_price_euros: float
     max_price_euros: float
-    avg_price_reais: float
-    min_price_reais: float
-    max_price_reais: float
+    avg_price_reais: Optional[float] = None
+    min_price_reais: Optional[float] = None
+    max_price_reais: Optional[float] = None
+    avg_price: Optional[float] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
 
 
 class CategoryStatsResponse(BaseModel):
     categories: List[CategoryStats]
-    total_categories: int
\ No newline at end of file
+    total_categories: int
+    currency: Optional[str] = None
\ No newline at end of file
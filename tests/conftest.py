@@ -0,0 +1,22 @@
+import threading
+
+import pytest
+
+from books_data.servidor_teste import SiteSimulado
+
+
+@pytest.fixture
+def servir_site():
+    """Sobe um SiteSimulado (ou subclasse) numa porta livre; retorna a URL base"""
+    servidores = []
+
+    def servir(site):
+        servidor = site.servidor(porta=0)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        servidores.append(servidor)
+        return f'http://127.0.0.1:{servidor.server_address[1]}/'
+
+    yield servir
+    for servidor in servidores:
+        servidor.shutdown()
+        servidor.server_close()
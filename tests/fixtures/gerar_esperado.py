@@ -0,0 +1,92 @@
+"""
+Gera tests/fixtures/esperado.json rodando o código de extração ORIGINAL do loader
+(commit baseline, books_data/loader_data.py) sobre as páginas de tests/fixtures/site.
+
+As funções abaixo são cópias das linhas de extração do baseline, sem a gravação no
+banco. Como no baseline, o HTML é decodificado como o requests fazia: o site não
+informa o charset no Content-Type, então resposta.text vinha em ISO-8859-1 (daí o
+`encode('latin1').decode('utf-8')` da sinopse).
+
+Uso (só quando as páginas de fixture mudarem):
+    python tests/fixtures/gerar_esperado.py
+"""
+import json
+import os
+import re
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+SITE = os.path.join(DIRETORIO, 'site')
+URL_BASE = 'https://books.toscrape.com/'
+
+### Baseline (books_data/loader_data.py) ###
+url_principal = 'https://books.toscrape.com/'
+valor_euro_para_real = 6.35
+
+
+def coleta_de_links_pagina(texto):
+    """Corpo do laço de coleta_de_links para uma página, mais a correção de link do __main__"""
+    soup = BeautifulSoup(texto, 'html.parser')
+    livros_links = []
+    books = soup.find_all('article', class_='product_pod')
+    for book in books:
+        link = book.find('a')['href']
+        livros_links.append(link)
+
+    completos = []
+    for link in livros_links:
+        if 'catalogue/' not in link:
+            link = 'catalogue/' + link.lstrip('./')
+        completos.append(urljoin(url_principal, link))
+    return {'links': completos, 'tem_proxima': bool(soup.find('li', class_='next'))}
+
+
+def coleta_atributos_livro(texto, link):
+    soup = BeautifulSoup(texto, 'html.parser')
+
+    # Extraindo atributos do livro
+    titulo = soup.find('h1').text
+    imagem = 'https://books.toscrape.com/' + soup.find('img')['src'].replace('../', '')
+    categoria = soup.find('ul', class_='breadcrumb').find_all('li')[2].text.strip()
+
+    preco_eur = float(re.search(r'\d+\.\d+', soup.find('p', class_='price_color').text).group())
+    preco_brl = round(preco_eur * valor_euro_para_real, 2)
+
+    estoque = int(re.search(r'\d+', soup.find('p', class_='instock availability').text.strip()).group())
+    review = soup.find('p', class_='star-rating')['class'][1]
+    sinopse = soup.find('meta', attrs={'name': 'description'})['content'].strip()
+    sinopse = sinopse.encode('latin1').decode('utf-8')
+    upc = soup.find('th', text='UPC').find_next_sibling('td').text
+    num_reviews = int(soup.find('th', text='Number of reviews').find_next_sibling('td').text)
+
+    # Mesma ordem das colunas do INSERT original
+    colunas = ['upc_livro', 'titulo', 'imagem', 'categoria', 'valor_principal_em_euros', 'valor_principal_em_reais',
+               'inventario', 'review', 'sinopse', 'num_reviews', 'link']
+    return dict(zip(colunas, (upc, titulo, imagem, categoria, preco_eur, preco_brl, estoque, review, sinopse,
+                              num_reviews, link)))
+### Fim do baseline ###
+
+
+def paginas():
+    for raiz, _, arquivos in sorted(os.walk(SITE)):
+        for arquivo in sorted(arquivos):
+            caminho = os.path.join(raiz, arquivo)
+            url = urljoin(URL_BASE, os.path.relpath(caminho, SITE).replace(os.sep, '/'))
+            with open(caminho, 'rb') as f:
+                yield url, f.read().decode('iso-8859-1')
+
+
+if __name__ == "__main__":
+    esperado = {'livros': {}, 'listagens': {}}
+    for url, texto in paginas():
+        if 'product_page' in texto:
+            esperado['livros'][url] = coleta_atributos_livro(texto, url)
+        else:
+            esperado['listagens'][url] = coleta_de_links_pagina(texto)
+
+    with open(os.path.join(DIRETORIO, 'esperado.json'), 'w', encoding='utf-8') as f:
+        json.dump(esperado, f, ensure_ascii=False, indent=1, sort_keys=True)
+        f.write('\n')
+    print(f"{len(esperado['livros'])} livros e {len(esperado['listagens'])} listagens")
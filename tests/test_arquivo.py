@@ -0,0 +1,64 @@
+#Arquivo local das páginas (frames zstd + índice SQLite), sem rede
+import os
+
+import pytest
+
+from books_data.arquivo import ArquivoPaginas
+
+
+@pytest.fixture
+def arquivo(tmp_path):
+    arquivo = ArquivoPaginas(str(tmp_path))
+    yield arquivo
+    arquivo.fechar()
+
+
+def test_grava_e_le_com_cabecalhos(arquivo):
+    assert arquivo.gravar('u1', b'<html>1</html>', cabecalhos={'ETag': '"a"', 'Server': 'x'})
+    cabecalho, corpo = arquivo.ler('u1')
+    assert corpo == b'<html>1</html>'
+    assert cabecalho['url'] == 'u1' and cabecalho['status'] == 200
+    # Só os cabeçalhos da lista são guardados
+    assert cabecalho['cabecalhos'] == {'ETag': '"a"'}
+    assert arquivo.ler('u2') is None
+
+
+def test_nao_grava_versao_repetida(arquivo):
+    assert arquivo.gravar('u1', b'v1')
+    assert not arquivo.gravar('u1', b'v1')
+    assert arquivo.gravar('u1', b'v2')
+    # Voltar ao conteúdo anterior é uma nova versão: compara só com a última
+    assert arquivo.gravar('u1', b'v1')
+    assert arquivo.resumo()['registros'] == 3
+    assert arquivo.ler('u1')[1] == b'v1'
+
+
+def test_registros_traz_a_ultima_versao_de_cada_url(arquivo):
+    arquivo.gravar('u1', b'u1-v1')
+    arquivo.gravar('u2', b'u2-v1')
+    arquivo.gravar('u1', b'u1-v2')
+
+    assert [(cabecalho['url'], corpo) for cabecalho, corpo in arquivo.registros()] == [
+        ('u2', b'u2-v1'),
+        ('u1', b'u1-v2'),
+    ]
+    resumo = arquivo.resumo()
+    assert (resumo['urls'], resumo['registros']) == (2, 3)
+
+
+def test_descarta_frame_incompleto_ao_reabrir(tmp_path):
+    arquivo = ArquivoPaginas(str(tmp_path))
+    arquivo.gravar('u1', b'completo')
+    tamanho = os.path.getsize(tmp_path / 'paginas.zst')
+    # Processo morto no meio de uma escrita: bytes no fim sem entrada no índice
+    arquivo.dados.write(b'\x28\xb5\x2f\xfd meio frame')
+    arquivo.fechar()
+
+    reaberto = ArquivoPaginas(str(tmp_path))
+    try:
+        assert os.path.getsize(tmp_path / 'paginas.zst') == tamanho
+        reaberto.gravar('u2', b'depois')
+        assert reaberto.ler('u1')[1] == b'completo'
+        assert reaberto.ler('u2')[1] == b'depois'
+    finally:
+        reaberto.fechar()
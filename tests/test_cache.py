@@ -0,0 +1,62 @@
+#Cache de livros por UPC da API: LRU, invalidação pelos avisos do loader e gerações
+import pytest
+
+from api.cache import BookCache
+from database.notifications import dataset_listener
+
+
+@pytest.fixture
+def conectado(monkeypatch):
+    monkeypatch.setattr(dataset_listener, 'connected', True)
+
+
+def test_desligado_sem_listener(monkeypatch):
+    monkeypatch.setattr(dataset_listener, 'connected', False)
+    cache = BookCache()
+    cache.put('a', {'upc': 'a'}, cache.generation)
+    assert cache.get('a') == (False, None)
+    assert cache.stats()['size'] == 0
+
+
+def test_guarda_inclusive_livro_inexistente(conectado):
+    cache = BookCache()
+    cache.put('a', {'upc': 'a'}, cache.generation)
+    cache.put('x', None, cache.generation)
+    assert cache.get('a') == (True, {'upc': 'a'})
+    assert cache.get('x') == (True, None)
+    assert cache.get('b') == (False, None)
+
+
+def test_leitura_anterior_a_invalidacao_nao_entra(conectado):
+    cache = BookCache()
+    # Consulta começou (geração lida) e o loader publicou uma versão no meio dela
+    geracao = cache.generation
+    cache.on_change(7, ['a'])
+    cache.put('a', {'preco': 'antigo'}, geracao)
+    assert cache.get('a') == (False, None)
+
+    cache.put('a', {'preco': 'novo'}, cache.generation)
+    assert cache.get('a') == (True, {'preco': 'novo'})
+
+
+def test_invalida_so_os_upcs_alterados(conectado):
+    cache = BookCache()
+    for upc in 'abc':
+        cache.put(upc, upc, cache.generation)
+    cache.on_change(1, ['b', 'z'])
+    assert [cache.get(upc)[0] for upc in 'abc'] == [True, False, True]
+
+    # Sem lista de UPCs, a versão pode ter mudado qualquer livro
+    cache.on_change(2, None)
+    assert cache.stats() == {'enabled': True, 'size': 0, 'generation': 2}
+
+
+def test_lru_descarta_o_menos_usado(conectado):
+    cache = BookCache(max_size=2)
+    cache.put('a', 1, cache.generation)
+    cache.put('b', 2, cache.generation)
+    cache.get('a')
+    cache.put('c', 3, cache.generation)
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, 1)
+    assert cache.get('c') == (True, 3)
@@ -0,0 +1,98 @@
+#Limite adaptativo (AIMD) do ControleConcorrencia, com janelas sintéticas (sem relógio nem rede)
+import asyncio
+import statistics
+
+from books_data.concorrencia import ControleConcorrencia
+
+LIMITE_429 = 12
+
+
+def _janela(controle, status, saturado=False):
+    """Fecha uma janela com o mínimo de amostras, todas com o mesmo status"""
+    controle.janela = 0
+    controle._saturado = saturado
+    for _ in range(controle.amostras_minimas):
+        controle.registrar(0.01, status)
+
+
+def test_aumenta_um_por_janela_saturada():
+    async def executar():
+        controle = ControleConcorrencia(4, minimo=2, maximo=6)
+        for _ in range(4):
+            _janela(controle, 200, saturado=True)
+        return controle
+    controle = asyncio.run(executar())
+    assert [registro['limite'] for registro in controle.historico] == [5, 6, 6, 6]
+
+
+def test_nao_aumenta_sem_saturar():
+    controle = ControleConcorrencia(4, minimo=2, maximo=6)
+    _janela(controle, 200)
+    assert controle.limite == 4
+    assert controle.historico[-1]['motivo'] == 'estável'
+
+
+def test_reduz_pela_metade_com_429():
+    controle = ControleConcorrencia(10, minimo=3, maximo=20)
+    _janela(controle, 429)
+    assert controle.limite == 5
+    _janela(controle, 429)
+    assert controle.limite == 3
+    assert [registro['motivo'] for registro in controle.historico] == ['429', '429']
+
+
+def test_limite_fixo_nao_se_ajusta():
+    controle = ControleConcorrencia(4)
+    _janela(controle, 429)
+    assert controle.limite == 4
+    assert controle.historico == []
+
+
+def _janela_com_limite_429(controle):
+    """Janela contra um servidor que responde 429 quando há mais de LIMITE_429 requisições em voo"""
+    controle.janela = 0
+    controle._saturado = True
+    for i in range(controle.amostras_minimas):
+        controle.registrar(0.01, 429 if controle.limite > LIMITE_429 and i == 0 else 200)
+
+
+def test_converge_abaixo_do_limite_de_429():
+    async def executar():
+        controle = ControleConcorrencia(8, minimo=2, maximo=32)
+        for _ in range(60):
+            _janela_com_limite_429(controle)
+        return controle.historico
+    historico = asyncio.run(executar())
+    limites = [8] + [registro['limite'] for registro in historico]
+
+    # Sobe de um em um enquanto o servidor aguenta e, ao receber 429, corta pela metade
+    cortes = [i for i, registro in enumerate(historico, start=1) if registro['motivo'] == '429']
+    # O primeiro corte vem na janela em que o limite passou do ponto dos 429
+    assert limites[cortes[0] - 1] == LIMITE_429 + 1
+    for i in range(1, len(limites)):
+        if i in cortes:
+            assert limites[i] == max(2, limites[i - 1] // 2)
+        else:
+            assert limites[i] == limites[i - 1] + 1
+
+    # Depois do primeiro corte, o limite oscila (dente de serra) sem passar do ponto dos 429
+    assert max(limites[cortes[0]:]) == LIMITE_429 + 1
+    assert statistics.median(limites[cortes[0]:]) < LIMITE_429
+
+
+def test_aumento_libera_quem_espera_vaga():
+    async def executar():
+        controle = ControleConcorrencia(1, minimo=1, maximo=2)
+        await controle.__aenter__()
+        esperando = asyncio.create_task(controle.__aenter__())
+        await asyncio.sleep(0)
+        assert not esperando.done()
+
+        # A janela saturada aumenta o limite; o aviso acorda a tarefa sem ninguém sair
+        _janela(controle, 200, saturado=True)
+        assert controle._tarefas
+        await asyncio.wait_for(esperando, 1)
+        return controle
+    controle = asyncio.run(executar())
+    assert controle.em_voo == 2
+    assert not controle._tarefas
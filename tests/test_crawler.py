@@ -0,0 +1,118 @@
+#AsyncCrawler contra o site simulado local (books_data/servidor_teste.py)
+import asyncio
+
+import httpx
+import pytest
+
+from books_data.arquivo import ArquivoPaginas
+from books_data.crawler import AsyncCrawler
+from books_data.servidor_teste import POR_PAGINA, SiteSimulado, _catalogo
+
+PAGINAS = 3
+
+
+class SiteInstavel(SiteSimulado):
+    """Responde `falhas` vezes com `status` a cada caminho antes de servir a página"""
+
+    def __init__(self, status, falhas=1, **kwargs):
+        super().__init__(paginas=PAGINAS, latencia=0, **kwargs)
+        self.status = status
+        self.falhas = falhas
+        self.tentativas = {}
+
+    def responder(self, caminho, if_none_match):
+        with self._lock:
+            self.tentativas[caminho] = self.tentativas.get(caminho, 0) + 1
+            falhar = self.tentativas[caminho] <= self.falhas
+        if falhar:
+            return self.status, {'Retry-After': '0'}, b''
+        return super().responder(caminho, if_none_match)
+
+
+def _links_esperados(url_base):
+    return [f"{url_base}catalogue/{livro['slug']}/index.html" for livro in _catalogo(PAGINAS)]
+
+
+def _coletar(url_base, corrotina, **opcoes):
+    async def executar():
+        async with AsyncCrawler(concorrencia=4, backoff=0.01, **opcoes) as crawler:
+            return await corrotina(crawler)
+    return asyncio.run(executar())
+
+
+def test_coletar_links_percorre_todas_as_listagens(servir_site):
+    url_base = servir_site(SiteSimulado(paginas=PAGINAS, latencia=0))
+    links = _coletar(url_base, lambda crawler: crawler.coletar_links(url_base))
+    assert links == _links_esperados(url_base)
+    assert len(links) == PAGINAS * POR_PAGINA
+
+
+def test_coletar_livros_extrai_cada_pagina(servir_site):
+    url_base = servir_site(SiteSimulado(paginas=PAGINAS, latencia=0))
+    catalogo = {f"{url_base}catalogue/{livro['slug']}/index.html": livro for livro in _catalogo(PAGINAS)}
+
+    async def coletar(crawler):
+        return [resultado async for resultado in crawler.coletar_livros(list(catalogo))]
+
+    resultados = _coletar(url_base, coletar)
+    assert {link for link, _, _ in resultados} == set(catalogo)
+    for link, livro, erro in resultados:
+        assert erro is None
+        esperado = catalogo[link]
+        assert livro['upc_livro'] == esperado['upc']
+        assert livro['titulo'] == esperado['titulo']
+        assert livro['categoria'] == esperado['categoria']
+        assert livro['valor_principal_em_euros'] == esperado['preco']
+        assert livro['inventario'] == esperado['estoque']
+        assert livro['review'] == esperado['estrela']
+        assert livro['link'] == link
+
+
+@pytest.mark.parametrize('status', [429, 503])
+def test_repete_apos_falha_temporaria(servir_site, status):
+    site = SiteInstavel(status, falhas=2)
+    url_base = servir_site(site)
+    links = _coletar(url_base, lambda crawler: crawler.coletar_links(url_base), tentativas=3)
+
+    assert links == _links_esperados(url_base)
+    # Cada listagem: duas falhas e o sucesso na terceira tentativa
+    assert site.contagem == {status: 2 * PAGINAS, 200: PAGINAS}
+
+
+def test_desiste_quando_as_tentativas_acabam(servir_site):
+    site = SiteInstavel(503, falhas=5)
+    url_base = servir_site(site)
+    with pytest.raises(httpx.HTTPStatusError):
+        _coletar(url_base, lambda crawler: crawler.buscar(url_base), tentativas=3)
+    assert site.tentativas['/'] == 3
+
+
+@pytest.mark.parametrize('tentativas', [0, -1])
+def test_recusa_menos_de_uma_tentativa(tentativas):
+    with pytest.raises(ValueError, match='tentativas'):
+        AsyncCrawler(tentativas=tentativas)
+
+
+def test_retry_after_respeita_a_espera_maxima():
+    crawler = AsyncCrawler(backoff=100, espera_maxima=5)
+    assert crawler._espera(0, httpx.Response(429, headers={'Retry-After': '3'})) == 3
+    assert crawler._espera(0, httpx.Response(429, headers={'Retry-After': '86400'})) == 5
+    # O backoff exponencial também não passa do teto
+    assert crawler._espera(3) == 5
+
+
+def test_arquiva_paginas_sem_repetir(servir_site, tmp_path):
+    site = SiteSimulado(paginas=PAGINAS, latencia=0)
+    url_base = servir_site(site)
+    arquivo = ArquivoPaginas(str(tmp_path))
+    try:
+        for _ in range(2):
+            _coletar(url_base, lambda crawler: crawler.coletar_links(url_base), arquivo=arquivo)
+        resumo = arquivo.resumo()
+        # A segunda coleta baixa as mesmas páginas, que já estão arquivadas
+        assert resumo['urls'] == resumo['registros'] == PAGINAS
+        cabecalho, corpo = arquivo.ler(url_base)
+        assert cabecalho['status'] == 200
+        assert corpo == site.paginas['/']
+    finally:
+        arquivo.fechar()
@@ -0,0 +1,85 @@
+#Cotações e limites de preço em euros, sem banco (cotações injetadas no cache)
+import time
+from decimal import Decimal, ROUND_HALF_UP
+
+import pytest
+
+from database.currency import CurrencyRates
+
+TAXA_REAIS = 6.35
+
+
+@pytest.fixture
+def cotacoes():
+    rates = CurrencyRates()
+    rates._rates = {'EUR': 1.0, 'BRL': TAXA_REAIS, 'USD': 1.08}
+    rates._checked_at = time.monotonic()
+    return rates
+
+
+def _exibido(euros, taxa):
+    """Mesmo arredondamento do price_sql: ROUND((euros * taxa)::numeric, 2), float8 com 15 dígitos"""
+    return Decimal(f'{euros * taxa:.15g}').quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def _dentro(euros, limites):
+    minimo, maximo, maximo_inclusivo = limites
+    if minimo is not None and euros < minimo:
+        return False
+    if maximo is not None:
+        return euros <= maximo if maximo_inclusivo else euros < maximo
+    return True
+
+
+def test_resolve_aceita_apelidos_e_recusa_moeda_sem_cotacao(cotacoes):
+    assert cotacoes.resolve('reais') == ('BRL', TAXA_REAIS)
+    assert cotacoes.resolve('eur') == ('EUR', 1.0)
+    with pytest.raises(ValueError, match='not configured'):
+        cotacoes.resolve('JPY')
+
+
+def test_euro_nao_converte(cotacoes):
+    assert cotacoes.euro_bounds('euros', 10.0, 20.0) == (10.0, 20.0, True)
+    assert cotacoes.price_sql('euros') == 'valor_principal_em_euros'
+
+
+def test_limites_seguem_o_preco_exibido(cotacoes):
+    # Todos os preços de 10,00 a 60,00 euros, e como limites os próprios preços
+    # exibidos (o caso de empate) e valores entre dois centavos
+    precos = [centavos / 100 for centavos in range(1000, 6001)]
+    exibidos = sorted({_exibido(euros, TAXA_REAIS) for euros in precos[::7]})
+    limites = [float(valor) for valor in exibidos[::25]] + [100.001, 100.009, 250.5]
+
+    for limite in limites:
+        alvo = Decimal(str(limite))
+        acima = cotacoes.euro_bounds('reais', min_price=limite)
+        abaixo = cotacoes.euro_bounds('reais', max_price=limite)
+        for euros in precos:
+            exibido = _exibido(euros, TAXA_REAIS)
+            assert _dentro(euros, acima) == (exibido >= alvo), (euros, limite)
+            assert _dentro(euros, abaixo) == (exibido <= alvo), (euros, limite)
+
+
+def test_caso_da_correcao_de_arredondamento(cotacoes):
+    # 10,02 euros aparecem como R$63,63 e precisam entrar em min=max=63,63
+    assert _exibido(10.02, TAXA_REAIS) == Decimal('63.63')
+    assert _dentro(10.02, cotacoes.euro_bounds('reais', 63.63, 63.63))
+    assert not _dentro(10.01, cotacoes.euro_bounds('reais', 63.63, 63.63))
+
+
+def test_sem_cotacao_de_reais_a_coluna_derivada_vira_nula():
+    rates = CurrencyRates()
+    rates._rates = {'EUR': 1.0}
+    rates._checked_at = time.monotonic()
+    assert rates.rate('reais') is None
+    assert rates.price_sql('reais', required=False) == 'NULL::double precision'
+    # O filtro por moeda continua recusando (erro 400 na API)
+    with pytest.raises(ValueError, match='not configured'):
+        rates.price_sql('reais')
+
+
+def test_price_sql_com_cotacao(cotacoes):
+    esperado = 'ROUND((valor_principal_em_euros * 6.35)::numeric, 2)::double precision'
+    assert cotacoes.rate('reais') == TAXA_REAIS
+    assert cotacoes.price_sql('reais') == esperado
+    assert cotacoes.price_sql('reais', required=False) == esperado
@@ -0,0 +1,64 @@
+#Exportação das colunas de features em Arrow, Parquet e npz: ida e volta e metadados
+import io
+import json
+
+import numpy as np
+import pytest
+
+from ml.export import serialize_columns
+
+pa = pytest.importorskip('pyarrow')
+import pyarrow.ipc  # noqa: E402
+import pyarrow.parquet as pq  # noqa: E402
+
+COLUNAS = {
+    'upc_livro': np.array(['a1', 'b2', 'c3']),
+    'titulo': np.array(['Sapiens', 'Ação e reação', '']),
+    'categoria': np.array(['History', 'Poetry', 'History']),
+    'category_encoded': np.array([1, 2, 1], dtype=np.int32),
+    'preco_euros': np.array([10.5, np.nan, 3.0]),
+    'eh_gratuito': np.array([False, True, False]),
+}
+METADADOS = {'dataset_version': 'v12', 'split': 'train', 'category_mapping': {'History': 1, 'Poetry': 2}}
+
+
+def _conferir(colunas):
+    assert list(colunas) == list(COLUNAS)
+    for nome, esperado in COLUNAS.items():
+        np.testing.assert_array_equal(np.asarray(colunas[nome]), esperado)
+
+
+@pytest.mark.parametrize('formato', ['arrow', 'parquet'])
+def test_arrow_e_parquet_ida_e_volta(formato):
+    conteudo, media_type, extensao = serialize_columns(COLUNAS, METADADOS, formato)
+    assert extensao == formato and media_type.startswith('application/')
+
+    if formato == 'arrow':
+        tabela = pa.ipc.open_stream(conteudo).read_all()
+    else:
+        tabela = pq.read_table(io.BytesIO(conteudo))
+
+    # Categóricas viram dictionary arrays; as demais mantêm o tipo
+    assert pa.types.is_dictionary(tabela.schema.field('categoria').type)
+    assert tabela.schema.field('category_encoded').type == pa.int32()
+    assert tabela.schema.field('eh_gratuito').type == pa.bool_()
+    _conferir({nome: tabela.column(nome).to_pylist() for nome in tabela.column_names})
+
+    metadados = {chave.decode(): json.loads(valor) for chave, valor in tabela.schema.metadata.items()
+                 if not chave.startswith(b'ARROW:')}
+    assert metadados == METADADOS
+
+
+def test_npz_ida_e_volta_sem_pickle():
+    conteudo, _, extensao = serialize_columns(COLUNAS, METADADOS, 'npz')
+    assert extensao == 'npz'
+    with np.load(io.BytesIO(conteudo), allow_pickle=False) as arquivo:
+        assert json.loads(str(arquivo['__metadata__'])) == METADADOS
+        colunas = {nome: arquivo[nome] for nome in arquivo.files if nome != '__metadata__'}
+    _conferir(colunas)
+    assert colunas['category_encoded'].dtype == np.int32
+
+
+def test_formato_desconhecido():
+    with pytest.raises(ValueError):
+        serialize_columns(COLUNAS, METADADOS, 'csv')
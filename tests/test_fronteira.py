@@ -0,0 +1,161 @@
+#Fronteira persistente da carga (SQLite): reivindicação, prazo, liberação e trabalho de outros processos
+import pytest
+
+from books_data.fronteira import Fronteira
+
+
+@pytest.fixture
+def caminho(tmp_path):
+    return str(tmp_path / 'fronteira.sqlite')
+
+
+def _fronteira(caminho, dono, **opcoes):
+    fronteira = Fronteira(caminho, **opcoes)
+    fronteira.dono = dono
+    return fronteira
+
+
+def test_adicionar_ignora_urls_conhecidas(caminho):
+    fronteira = _fronteira(caminho, 'a')
+    assert fronteira.adicionar(['u1', 'u2'], 'livro') == 2
+    assert fronteira.adicionar(['u2', 'u3'], 'livro') == 1
+    assert fronteira.contagem()['descoberto'] == 3
+
+
+def test_reivindica_listagens_primeiro_e_sem_repetir(caminho):
+    fronteira = _fronteira(caminho, 'a')
+    fronteira.adicionar(['livro1', 'livro2'], 'livro')
+    fronteira.adicionar(['pagina1'], 'pagina')
+
+    # A ordem do RETURNING não é garantida; o que importa é quem foi escolhido
+    assert set(fronteira.reivindicar(2)) == {('pagina1', 'pagina'), ('livro1', 'livro')}
+    assert fronteira.reivindicar(5) == [('livro2', 'livro')]
+    assert fronteira.reivindicar(5) == []
+    assert fronteira.contagem()['em_andamento'] == 3
+
+
+def test_dois_processos_nao_pegam_a_mesma_url(caminho):
+    a, b = _fronteira(caminho, 'a'), _fronteira(caminho, 'b')
+    a.adicionar([f'u{i}' for i in range(10)], 'livro')
+
+    urls_a = {url for url, _ in a.reivindicar(6)}
+    urls_b = {url for url, _ in b.reivindicar(6)}
+    assert len(urls_a) == 6 and len(urls_b) == 4
+    assert not urls_a & urls_b
+
+
+def test_reivindicacao_expirada_volta_a_ficar_disponivel(caminho):
+    a = _fronteira(caminho, 'a', prazo_reivindicacao=600)
+    b = _fronteira(caminho, 'b', prazo_reivindicacao=600)
+    a.adicionar(['u1'], 'livro')
+    assert a.reivindicar(1) == [('u1', 'livro')]
+
+    # Dentro do prazo, ninguém mais pega
+    assert b.reivindicar(1) == []
+
+    # O processo "a" morreu há mais tempo que o prazo
+    a.con.execute("UPDATE fronteira SET reivindicado_em = reivindicado_em - 601")
+    assert b.reivindicar(1) == [('u1', 'livro')]
+    dono, tentativas = b.con.execute("SELECT dono, tentativas FROM fronteira").fetchone()
+    assert (dono, tentativas) == ('b', 2)
+
+
+def test_liberar_devolve_so_o_que_e_deste_processo(caminho):
+    a, b = _fronteira(caminho, 'a'), _fronteira(caminho, 'b')
+    a.adicionar(['u1', 'u2', 'u3'], 'livro')
+    a.reivindicar(2)
+    b.reivindicar(1)
+    a.concluir(['u1'])
+
+    assert a.liberar() == 1
+    assert a.contagem() == {'descoberto': 1, 'em_andamento': 1, 'concluido': 1, 'falhou': 0}
+    assert b.con.execute("SELECT dono FROM fronteira WHERE estado = 'em_andamento'").fetchone() == ('b',)
+
+
+def test_tem_trabalho_de_outros(caminho):
+    a, b = _fronteira(caminho, 'a'), _fronteira(caminho, 'b')
+    assert not a.tem_trabalho_de_outros()
+
+    a.adicionar(['u1'], 'livro')
+    assert a.tem_trabalho_de_outros()
+
+    # Em andamento aqui não conta; em andamento no outro processo conta
+    a.reivindicar(1)
+    assert not a.tem_trabalho_de_outros()
+    assert b.tem_trabalho_de_outros()
+
+    a.concluir(['u1'])
+    assert not b.tem_trabalho_de_outros()
+
+
+def test_falhas_voltam_para_a_fila(caminho):
+    fronteira = _fronteira(caminho, 'a')
+    fronteira.adicionar(['u1'], 'livro')
+    fronteira.reivindicar(1)
+    fronteira.falhar('u1', RuntimeError('timeout'))
+    assert fronteira.contagem()['falhou'] == 1
+
+    assert fronteira.repetir_falhas() == 1
+    assert fronteira.reivindicar(1) == [('u1', 'livro')]
+
+
+def test_continua_de_onde_parou_ao_reabrir(caminho):
+    fronteira = _fronteira(caminho, 'a')
+    fronteira.adicionar(['u1', 'u2'], 'livro')
+    fronteira.reivindicar(1)
+    fronteira.concluir(['u1'])
+    fronteira.fechar()
+
+    reaberta = _fronteira(caminho, 'a')
+    assert reaberta.contagem()['concluido'] == 1
+    assert reaberta.reivindicar(5) == [('u2', 'livro')]
+
+
+def test_iniciar_retoma_varredura_em_andamento(caminho):
+    fronteira = _fronteira(caminho, 'a')
+    assert not fronteira.iniciar('inicio')
+    fronteira.reivindicar(1)
+    fronteira.concluir(['inicio'])
+    fronteira.adicionar(['u1'], 'livro')
+
+    # Ainda há livro descoberto: a varredura continua
+    assert not fronteira.iniciar('inicio')
+    assert fronteira.contagem()['concluido'] == 1
+
+
+def test_iniciar_depois_de_terminada_comeca_nova_varredura(caminho):
+    fronteira = _fronteira(caminho, 'a')
+    fronteira.iniciar('inicio')
+    fronteira.adicionar(['u1', 'u2'], 'livro')
+    fronteira.reivindicar(3)
+    fronteira.concluir(['inicio', 'u1'])
+    fronteira.falhar('u2', RuntimeError('404'))
+
+    assert fronteira.iniciar('inicio')
+    assert fronteira.contagem() == {'descoberto': 1, 'em_andamento': 0, 'concluido': 0, 'falhou': 0}
+    assert fronteira.reivindicar(5) == [('inicio', 'listagem')]
+
+    # Outro processo que chega agora entra na varredura nova, sem zerá-la de novo
+    assert not _fronteira(caminho, 'b').iniciar('inicio')
+    assert fronteira.contagem()['em_andamento'] == 1
+
+
+def test_sincronizar_segue_a_lista_de_pendentes(caminho):
+    a, b = _fronteira(caminho, 'a'), _fronteira(caminho, 'b')
+    assert a.sincronizar(['u1', 'u2', 'u3', 'u4'], 'livro') == 4
+    assert a.reivindicar(1) == [('u1', 'livro')]
+    assert b.reivindicar(2) == [('u2', 'livro'), ('u3', 'livro')]
+    a.concluir(['u1'])
+    b.falhar('u3', ValueError('x'))
+
+    # u1 foi gravado e saiu dos pendentes; u2 está com "b"; u3 falhou; u5 é novo
+    assert a.sincronizar(['u2', 'u3', 'u4', 'u5'], 'livro') == 3
+    estados = dict(a.con.execute("SELECT url, estado FROM fronteira").fetchall())
+    assert estados == {'u2': 'em_andamento', 'u3': 'descoberto', 'u4': 'descoberto', 'u5': 'descoberto'}
+
+    # Livro concluído que voltou a ficar pendente é buscado de novo
+    a.concluir(['u4'])
+    a.sincronizar(['u4'], 'livro')
+    assert dict(a.con.execute("SELECT url, estado FROM fronteira").fetchall()) == {
+        'u2': 'em_andamento', 'u4': 'descoberto',
+    }
@@ -0,0 +1,54 @@
+#Cache da carga incremental (SQLite): validadores HTTP e hashes por URL
+from books_data.incremental import CacheIncremental, hash_html, hash_livro
+
+
+def test_hash_livro_independe_da_ordem_das_chaves():
+    assert hash_livro({'titulo': 'A', 'preco': 1}) == hash_livro({'preco': 1, 'titulo': 'A'})
+    assert hash_livro({'titulo': 'A'}) != hash_livro({'titulo': 'B'})
+    assert hash_html('<p>é</p>') == hash_html('<p>é</p>')
+
+
+def test_registra_atualiza_e_persiste(tmp_path):
+    caminho = str(tmp_path / 'incremental.sqlite')
+    cache = CacheIncremental(caminho)
+    assert cache.obter('u1') is None
+
+    cache.registrar([('u1', '"e1"', None, 'h1', 'l1'), ('u2', None, 'Mon', 'h2', None)])
+    cache.registrar([('u1', '"e2"', 'Tue', 'h3', 'l3')])
+    assert cache.obter('u1') == {'etag': '"e2"', 'last_modified': 'Tue', 'hash_html': 'h3', 'hash_livro': 'l3'}
+    cache.fechar()
+
+    reaberto = CacheIncremental(caminho)
+    try:
+        assert reaberto.obter('u2') == {'etag': None, 'last_modified': 'Mon', 'hash_html': 'h2', 'hash_livro': None}
+    finally:
+        reaberto.fechar()
+
+
+def test_cabecalhos_condicionais(tmp_path):
+    cache = CacheIncremental(str(tmp_path / 'incremental.sqlite'))
+    try:
+        assert cache.cabecalhos_condicionais(None) == {}
+        cache.registrar([('u1', '"e1"', 'Mon', 'h1', 'l1'), ('u2', None, None, 'h2', 'l2')])
+        assert cache.cabecalhos_condicionais(cache.obter('u1')) == {
+            'If-None-Match': '"e1"',
+            'If-Modified-Since': 'Mon',
+        }
+        assert cache.cabecalhos_condicionais(cache.obter('u2')) == {}
+    finally:
+        cache.fechar()
+
+
+def test_vincular_descarta_cache_de_outro_destino(tmp_path):
+    cache = CacheIncremental(str(tmp_path / 'incremental.sqlite'))
+    try:
+        assert not cache.vincular('host/5432/livros_dev/16400')
+        cache.registrar([('u1', '"e1"', None, 'h1', 'l1')])
+        assert not cache.vincular('host/5432/livros_dev/16400')
+        assert cache.obter('u1') is not None
+
+        # Tabela recriada ou restaurada (outra OID), ou outro banco
+        assert cache.vincular('host/5432/livros_dev/16999')
+        assert cache.obter('u1') is None
+    finally:
+        cache.fechar()
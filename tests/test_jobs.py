@@ -0,0 +1,163 @@
+#Jobs de geração de dataset com um build falso: deduplicação, cache em disco e remoção por espaço
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+import ml.endpoints as endpoints
+import ml.jobs as jobs_module
+from ml.dataset_version import dataset_version
+from ml.jobs import DatasetJobManager
+from models.ml_responses import DatasetJobRequest
+
+
+class JobsFalsos(DatasetJobManager):
+    """Build que só grava `tamanho` bytes; `liberar` segura o build até o teste deixar"""
+
+    def __init__(self, artifact_dir, tamanho=100, **kwargs):
+        super().__init__(artifact_dir=artifact_dir, workers=2, **kwargs)
+        self.tamanho = tamanho
+        self.builds = []
+        self.liberar = threading.Event()
+        self.liberar.set()
+
+    def _build(self, params, path):
+        self.liberar.wait(5)
+        self.builds.append(params)
+        with open(path, 'wb') as f:
+            f.write(b'x' * self.tamanho)
+
+
+@pytest.fixture(autouse=True)
+def versao(monkeypatch):
+    monkeypatch.setattr(dataset_version, 'current', lambda: 'v1')
+
+
+@pytest.fixture
+def sem_carencia(monkeypatch):
+    monkeypatch.setattr(jobs_module, 'ML_ARTIFACT_GRACE_SECONDS', 0)
+
+
+def _esperar(jobs, job_id):
+    for _ in range(500):
+        job = jobs.status(job_id)
+        if job.status in ('done', 'failed'):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f'job {job_id} não terminou')
+
+
+def test_pedidos_iguais_reaproveitam_o_job(tmp_path):
+    jobs = JobsFalsos(str(tmp_path))
+    jobs.liberar.clear()
+    primeiro = jobs.submit(DatasetJobRequest(limit=100))
+    segundo = jobs.submit(DatasetJobRequest(limit=100))
+    outro = jobs.submit(DatasetJobRequest(limit=200))
+    assert segundo is primeiro
+    assert outro.job_id != primeiro.job_id
+
+    jobs.liberar.set()
+    assert _esperar(jobs, primeiro.job_id).artifact_size_bytes == 100
+    _esperar(jobs, outro.job_id)
+    assert len(jobs.builds) == 2
+    assert jobs.artifact(primeiro.job_id).endswith(f'{primeiro.job_id}.parquet')
+
+
+def test_id_muda_com_a_versao_do_dataset(tmp_path, monkeypatch):
+    jobs = JobsFalsos(str(tmp_path))
+    antes = jobs.submit(DatasetJobRequest())
+    monkeypatch.setattr(dataset_version, 'current', lambda: 'v2')
+    depois = jobs.submit(DatasetJobRequest())
+    assert antes.job_id != depois.job_id
+
+
+def test_artefato_em_disco_serve_outro_processo(tmp_path):
+    jobs = JobsFalsos(str(tmp_path))
+    job = _esperar(jobs, jobs.submit(DatasetJobRequest(format='npz')).job_id)
+
+    # Outro worker da API, sem o job em memória
+    outro = JobsFalsos(str(tmp_path))
+    cacheado = outro.submit(DatasetJobRequest(format='npz'))
+    assert (cacheado.job_id, cacheado.status, cacheado.cached) == (job.job_id, 'done', True)
+    assert outro.builds == []
+    assert outro.artifact(job.job_id) == jobs.artifact(job.job_id)
+
+
+def test_remove_os_menos_usados_acima_do_limite(tmp_path, sem_carencia):
+    jobs = JobsFalsos(str(tmp_path), tamanho=100, max_cache_bytes=250)
+    ids = []
+    for limite in (100, 200):
+        ids.append(_esperar(jobs, jobs.submit(DatasetJobRequest(limit=limite)).job_id).job_id)
+    # O primeiro foi lido por último: o menos usado passa a ser o segundo
+    caminho = jobs.artifact(ids[0])
+    os.utime(caminho, (time.time() + 10, time.time() + 10))
+
+    ids.append(_esperar(jobs, jobs.submit(DatasetJobRequest(limit=300)).job_id).job_id)
+    assert jobs.artifact(ids[0]) is not None
+    assert jobs.artifact(ids[1]) is None and jobs.status(ids[1]) is None
+    assert jobs.artifact(ids[2]) is not None
+
+
+def test_build_que_falha_nao_deixa_arquivo(tmp_path):
+    class JobsComFalha(JobsFalsos):
+        def _build(self, params, path):
+            raise RuntimeError('banco fora do ar')
+
+    jobs = JobsComFalha(str(tmp_path))
+    job = _esperar(jobs, jobs.submit(DatasetJobRequest()).job_id)
+    assert (job.status, job.error) == ('failed', 'banco fora do ar')
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize('job_id', ['*', '?' * 32, '[0-9a-f]*', '../datasets/x', 'A' * 32, '0' * 31])
+def test_id_invalido_nao_chega_ao_disco(tmp_path, job_id):
+    jobs = JobsFalsos(str(tmp_path))
+    _esperar(jobs, jobs.submit(DatasetJobRequest()).job_id)
+    assert jobs.artifact(job_id) is None
+    assert jobs.acquire_artifact(job_id) is None
+
+
+def test_artefato_sendo_baixado_nao_e_removido(tmp_path, sem_carencia):
+    jobs = JobsFalsos(str(tmp_path), tamanho=100, max_cache_bytes=150)
+    primeiro = _esperar(jobs, jobs.submit(DatasetJobRequest(limit=100)).job_id).job_id
+    caminho = jobs.acquire_artifact(primeiro)
+    os.utime(caminho, (0, 0))
+
+    _esperar(jobs, jobs.submit(DatasetJobRequest(limit=200)).job_id)
+    assert os.path.exists(caminho)
+
+    # Terminado o download, volta a ser candidato
+    jobs.release_artifact(caminho)
+    os.utime(caminho, (0, 0))
+    _esperar(jobs, jobs.submit(DatasetJobRequest(limit=300)).job_id)
+    assert not os.path.exists(caminho)
+
+
+def test_artefato_lido_ha_pouco_nao_e_removido(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs_module, 'ML_ARTIFACT_GRACE_SECONDS', 600)
+    jobs = JobsFalsos(str(tmp_path), tamanho=100, max_cache_bytes=150)
+    ids = [_esperar(jobs, jobs.submit(DatasetJobRequest(limit=limite)).job_id).job_id for limite in (100, 200, 300)]
+    # Outro worker pode estar enviando qualquer um deles: o limite é excedido por um tempo
+    assert len(os.listdir(tmp_path)) == 3
+    assert all(jobs.artifact(job_id) is not None for job_id in ids)
+
+
+def test_resposta_devolve_a_referencia_se_o_cliente_desconectar(tmp_path, monkeypatch):
+    jobs = JobsFalsos(str(tmp_path))
+    monkeypatch.setattr(endpoints, 'dataset_jobs', jobs)
+    job_id = _esperar(jobs, jobs.submit(DatasetJobRequest()).job_id).job_id
+    caminho = jobs.acquire_artifact(job_id)
+    assert jobs._serving == {caminho: 1}
+
+    async def receive():
+        return {'type': 'http.request'}
+
+    async def send(mensagem):
+        raise OSError('cliente desconectou')
+
+    resposta = endpoints.ArtifactResponse(caminho)
+    with pytest.raises(OSError):
+        asyncio.run(resposta({'type': 'http', 'method': 'GET', 'headers': []}, receive, send))
+    assert jobs._serving == {}
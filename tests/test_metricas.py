@@ -0,0 +1,95 @@
+#Histogramas e exposição no formato do Prometheus das métricas da carga
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from books_data.metricas import Histograma, MetricasCarga
+
+
+def test_histograma_vazio():
+    histograma = Histograma((1, 2))
+    assert histograma.percentil(0.5) is None
+    assert histograma.resumo()['media'] is None
+
+
+def test_bucket_inclui_o_limite_superior():
+    histograma = Histograma((1, 2, 4))
+    for valor in (1, 2, 4, 4.5):
+        histograma.observar(valor)
+    assert histograma.contagens == [1, 1, 1, 1]
+
+
+def test_percentil_interpola_dentro_do_bucket():
+    histograma = Histograma((1, 2, 4))
+    for valor in (0.5, 0.5, 1.5, 1.5):
+        histograma.observar(valor)
+
+    assert histograma.percentil(0.25) == pytest.approx(0.5)
+    assert histograma.percentil(0.5) == pytest.approx(1.0)
+    assert histograma.percentil(0.75) == pytest.approx(1.5)
+    # Não passa do maior valor visto, mesmo com o bucket indo até 2
+    assert histograma.percentil(1.0) == pytest.approx(1.5)
+
+
+def test_percentil_no_bucket_infinito_usa_o_maximo():
+    histograma = Histograma((1,))
+    histograma.observar(0.5)
+    histograma.observar(30.0)
+    assert histograma.percentil(0.99) == pytest.approx(1 + 29 * 0.98)
+    assert histograma.percentil(1.0) == 30.0
+
+
+def test_prometheus_do_histograma_acumula_buckets():
+    histograma = Histograma((0.1, 1))
+    for valor in (0.05, 0.5, 0.7, 3):
+        histograma.observar(valor)
+    assert histograma.prometheus('x_seconds', 'ajuda') == [
+        '# HELP x_seconds ajuda',
+        '# TYPE x_seconds histogram',
+        'x_seconds_bucket{le="0.1"} 1',
+        'x_seconds_bucket{le="1"} 3',
+        'x_seconds_bucket{le="+Inf"} 4',
+        'x_seconds_sum 4.25',
+        'x_seconds_count 4',
+    ]
+
+
+def test_prometheus_da_carga():
+    metricas = MetricasCarga()
+    metricas.registrar_busca(0.2, 200, tamanho=1000)
+    metricas.registrar_busca(0.3, None)
+    metricas.registrar_escrita(0.05, inseridas=3, atualizadas=1, inalteradas=2)
+    metricas.registrar_erro('parse', ValueError('x'))
+
+    texto = metricas.prometheus()
+    linhas = texto.splitlines()
+    assert texto.endswith('\n')
+    assert 'loader_fetch_responses_total{status="200"} 1' in linhas
+    assert 'loader_fetch_responses_total{status="erro_rede"} 1' in linhas
+    assert 'loader_fetch_bytes_total 1000' in linhas
+    assert 'loader_fetch_duration_seconds_count 2' in linhas
+    assert 'loader_rows_total{result="inseridas"} 3' in linhas
+    assert 'loader_errors_total{stage="parse",type="ValueError"} 1' in linhas
+
+    # Cada métrica declara HELP e TYPE uma única vez
+    tipos = [linha.split()[2] for linha in linhas if linha.startswith('# TYPE')]
+    assert len(tipos) == len(set(tipos))
+
+    relatorio = metricas.relatorio()
+    assert relatorio['escrita']['linhas'] == {'inseridas': 3, 'atualizadas': 1, 'inalteradas': 2}
+    assert relatorio['erros'] == {'parse': {'ValueError': 1}}
+
+
+def test_servir_expoe_metrics_sem_alterar_a_stdlib():
+    daemon_threads = ThreadingHTTPServer.daemon_threads
+    metricas = MetricasCarga()
+    metricas.registrar_busca(0.1, 200)
+    metricas.servir(0, host='127.0.0.1')
+    try:
+        porta = metricas._servidor.server_address[1]
+        with urllib.request.urlopen(f'http://127.0.0.1:{porta}/metrics') as resposta:
+            assert 'loader_fetch_responses_total{status="200"} 1' in resposta.read().decode('utf-8')
+    finally:
+        metricas.parar()
+    assert ThreadingHTTPServer.daemon_threads == daemon_threads
@@ -0,0 +1,30 @@
+#Status do health check de ML derivado da prontidão dos componentes e do listener
+import asyncio
+
+import pytest
+
+import ml.endpoints as endpoints
+from ml.endpoints import _health_status
+
+PRONTOS = {'vocabulary': True, 'model': True, 'text_features': True, 'similarity_index': True}
+
+
+@pytest.mark.parametrize('ready, connected, status', [
+    (PRONTOS, True, 'healthy'),
+    (PRONTOS, False, 'degraded'),
+    ({**PRONTOS, 'model': False}, True, 'degraded'),
+    (dict.fromkeys(PRONTOS, False), True, 'not_ready'),
+    (dict.fromkeys(PRONTOS, False), False, 'not_ready'),
+])
+def test_status_segue_a_prontidao(ready, connected, status):
+    assert _health_status(ready, {'connected': connected}) == status
+
+
+def test_health_sem_nada_carregado_nao_e_healthy(monkeypatch):
+    for componente in ('vocabulary_store', 'model_registry', 'text_feature_store', 'similarity_index'):
+        monkeypatch.setattr(getattr(endpoints, componente), 'loaded', lambda: None)
+    monkeypatch.setattr(endpoints.dataset_listener, 'status', lambda: {'connected': False})
+
+    resposta = asyncio.run(endpoints.ml_health_check(current_user=None))
+    assert resposta['status'] == 'not_ready'
+    assert not any(resposta['ready'].values())
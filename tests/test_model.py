@@ -0,0 +1,80 @@
+#Modelo de popularidade: treino, artefato versionado (save/load) e troca do modelo ativo
+import json
+import os
+
+import numpy as np
+import pytest
+
+from ml.model import MODEL_FEATURES, ModelRegistry, PopularityModel, model_matrix
+
+
+def _dados(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    columns = {
+        'titulo_length': rng.integers(5, 80, size=n),
+        'titulo_word_count': rng.integers(1, 12, size=n),
+        'preco_euros': rng.uniform(10, 60, size=n),
+        'review_score': rng.integers(1, 6, size=n),
+        'price_category': rng.choice(['budget', 'mid', 'premium'], size=n),
+    }
+    # Popular: boa avaliação e preço baixo, como o target do MLDataProcessor
+    y = ((columns['review_score'] >= 4) & (columns['preco_euros'] <= 35)).astype(float)
+    return model_matrix(columns), y
+
+
+def test_model_matrix_colunas_na_ordem_das_features():
+    X, _ = _dados(5)
+    assert X.shape == (5, len(MODEL_FEATURES))
+    # Exatamente uma faixa de preço por linha
+    np.testing.assert_array_equal(X[:, 4:].sum(axis=1), 1)
+
+
+def test_treino_separa_as_classes():
+    X, y = _dados()
+    model = PopularityModel.train(X, y, metadata={'version': 'teste'})
+    proba = model.predict_proba(X)
+    assert proba.shape == (len(y),)
+    assert ((proba >= 0.5) == y).mean() > 0.85
+    assert model.metadata['feature_names'] == MODEL_FEATURES
+    assert model.version == 'teste'
+
+
+def test_save_load_preserva_as_previsoes(tmp_path):
+    X, y = _dados()
+    model = PopularityModel.train(X, y, epochs=50, metadata={'version': 'v1', 'dataset_version': 'd3'})
+    path = model.save(str(tmp_path))
+
+    assert os.path.basename(path) == 'popularity-v1.npz'
+    assert (tmp_path / 'CURRENT').read_text() == 'popularity-v1.npz'
+    assert not [nome for nome in os.listdir(tmp_path) if '.tmp.' in nome]
+
+    carregado = PopularityModel.load(path)
+    np.testing.assert_array_equal(carregado.predict_proba(X), model.predict_proba(X))
+    assert carregado.metadata == json.loads(json.dumps(model.metadata))
+
+
+def test_load_recusa_outras_features(tmp_path):
+    X, y = _dados(50)
+    model = PopularityModel.train(X, y, epochs=5, metadata={'version': 'v1'})
+    model.metadata['feature_names'] = MODEL_FEATURES[:-1]
+    with pytest.raises(ValueError):
+        PopularityModel.load(model.save(str(tmp_path)))
+
+
+def test_registry_troca_quando_o_ponteiro_muda(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    assert registry.load() is None
+
+    X, y = _dados(50)
+    PopularityModel.train(X, y, epochs=5, metadata={'version': 'v1'}).save(str(tmp_path))
+    assert registry.load().version == 'v1'
+
+    # Treino sem ativar não muda o modelo servido
+    PopularityModel.train(X, y, epochs=5, metadata={'version': 'v2'}).save(str(tmp_path), activate=False)
+    assert registry.load().version == 'v1'
+
+    PopularityModel.train(X, y, epochs=5, metadata={'version': 'v3'}).save(str(tmp_path))
+    # Garante mtime diferente mesmo em sistemas de arquivos com resolução grossa
+    ponteiro = tmp_path / 'CURRENT'
+    os.utime(ponteiro, (ponteiro.stat().st_atime, ponteiro.stat().st_mtime + 10))
+    assert registry.load().version == 'v3'
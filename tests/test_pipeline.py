@@ -0,0 +1,197 @@
+#PipelineCarga com crawler e escritor falsos: ordem das etapas, commit antes de concluir e backpressure
+import asyncio
+import time
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+from books_data.fronteira import Fronteira
+from books_data.incremental import CacheIncremental
+from books_data.pipeline import PipelineCarga
+from books_data.servidor_teste import SiteSimulado, _catalogo
+
+PAGINAS = 3
+URL_BASE = 'http://site.local/'
+
+
+class CrawlerFalso:
+    """Serve as páginas do SiteSimulado direto da memória, sem HTTP"""
+
+    def __init__(self, concorrencia=2):
+        self.site = SiteSimulado(paginas=PAGINAS, latencia=0)
+        self.concorrencia_maxima = concorrencia
+        self.controle = SimpleNamespace(adaptativo=False)
+        self.buscados = []
+
+    async def buscar_resposta(self, url, cabecalhos=None):
+        await asyncio.sleep(0)
+        self.buscados.append(url)
+        corpo = self.site.paginas[urlsplit(url).path]
+        return SimpleNamespace(status_code=200, content=corpo, headers={})
+
+    async def buscar(self, url):
+        return (await self.buscar_resposta(url)).content.decode('utf-8')
+
+
+class EscritorFalso:
+    """Mesma interface do EscritorLivros; `ao_gravar` roda a cada lote, antes do "commit" """
+
+    def __init__(self, tamanho_lote=5, atraso=0.0, ao_gravar=None):
+        self.tamanho_lote = tamanho_lote
+        self.atraso = atraso
+        self.ao_gravar = ao_gravar
+        self.buffer = []
+        self.gravados = []
+        self.fechado = False
+
+    def adicionar(self, livro):
+        assert not self.fechado
+        self.buffer.append(livro)
+        if len(self.buffer) >= self.tamanho_lote:
+            return self.flush()
+        return None
+
+    def flush(self):
+        if not self.buffer:
+            return []
+        time.sleep(self.atraso)
+        if self.ao_gravar is not None:
+            self.ao_gravar(self.buffer)
+        self.gravados.extend(self.buffer)
+        alterados = [(livro['upc_livro'], True) for livro in self.buffer]
+        self.buffer = []
+        return alterados
+
+    def fechar(self):
+        self.flush()
+        self.fechado = True
+
+
+def _links():
+    return [f"{URL_BASE}catalogue/{livro['slug']}/index.html" for livro in _catalogo(PAGINAS)]
+
+
+def test_grava_todos_os_livros_uma_vez():
+    crawler, escritor = CrawlerFalso(), EscritorFalso()
+    pipeline = PipelineCarga(crawler, escritor, processos=0, tamanho_fila=4, intervalo_relatorio=60)
+    relatorio = asyncio.run(pipeline.executar(_links()))
+
+    assert escritor.fechado
+    assert sorted(livro['link'] for livro in escritor.gravados) == sorted(_links())
+    assert relatorio['etapas']['escrita']['processados'] == len(_links())
+    assert relatorio['etapas']['busca']['erros'] == 0
+
+
+def test_backpressure_limita_o_que_fica_a_frente_do_escritor():
+    crawler = CrawlerFalso(concorrencia=2)
+    a_frente = []
+
+    def ao_gravar(lote):
+        # Quantas páginas já foram buscadas e ainda não chegaram ao escritor
+        a_frente.append(len(crawler.buscados) - len(escritor.gravados) - len(lote))
+
+    escritor = EscritorFalso(tamanho_lote=1, atraso=0.01, ao_gravar=ao_gravar)
+    pipeline = PipelineCarga(crawler, escritor, processos=0, tamanho_fila=2, intervalo_relatorio=60)
+    relatorio = asyncio.run(pipeline.executar(_links()))
+
+    assert len(escritor.gravados) == len(_links())
+    assert relatorio['profundidade_maxima'] == {'páginas': 2, 'livros': 2}
+    # Filas (2 + 2), o que o escritor já tirou da fila de livros para o lote (2) e
+    # uma página em cada buscador e no parser; sem backpressure as buscas
+    # terminariam antes do primeiro lote lento
+    assert max(a_frente) <= 2 + 2 + 2 + crawler.concorrencia_maxima + 1
+    assert a_frente[0] < len(_links()) // 4
+
+
+def test_fronteira_so_conclui_depois_do_commit(tmp_path):
+    fronteira = Fronteira(str(tmp_path / 'fronteira.sqlite'))
+    incremental = CacheIncremental(str(tmp_path / 'incremental.sqlite'))
+    estados_no_commit = set()
+
+    def ao_gravar(lote):
+        for livro in lote:
+            estado, = fronteira.con.execute("SELECT estado FROM fronteira WHERE url = ?", (livro['link'],)).fetchone()
+            estados_no_commit.add(estado)
+            assert incremental.obter(livro['link']) is None
+
+    escritor = EscritorFalso(tamanho_lote=7, ao_gravar=ao_gravar)
+    pipeline = PipelineCarga(CrawlerFalso(), escritor, processos=0, tamanho_fila=4, intervalo_relatorio=60,
+                             incremental=incremental, fronteira=fronteira)
+    try:
+        relatorio = asyncio.run(pipeline.executar_fronteira(URL_BASE))
+
+        assert estados_no_commit == {'em_andamento'}
+        assert sorted(livro['link'] for livro in escritor.gravados) == sorted(_links())
+        assert relatorio['listagens'] == PAGINAS
+        assert relatorio['fronteira']['concluido'] == PAGINAS + len(_links())
+        assert all(incremental.obter(link)['hash_livro'] for link in _links())
+    finally:
+        fronteira.fechar()
+        incremental.fechar()
+
+
+def test_fronteira_terminada_comeca_nova_varredura(tmp_path):
+    fronteira = Fronteira(str(tmp_path / 'fronteira.sqlite'))
+    try:
+        asyncio.run(PipelineCarga(CrawlerFalso(), EscritorFalso(), processos=0, intervalo_relatorio=60,
+                                  fronteira=fronteira).executar_fronteira(URL_BASE))
+        escritor = EscritorFalso()
+        relatorio = asyncio.run(PipelineCarga(CrawlerFalso(), escritor, processos=0, intervalo_relatorio=60,
+                                              fronteira=fronteira).executar_fronteira(URL_BASE))
+        # Sem isso, a segunda carga terminaria com 0 livros e "sucesso"
+        assert len(escritor.gravados) == len(_links())
+        assert relatorio['listagens'] == PAGINAS
+    finally:
+        fronteira.fechar()
+
+
+def test_segunda_carga_incremental_nao_regrava(tmp_path):
+    incremental = CacheIncremental(str(tmp_path / 'incremental.sqlite'))
+    try:
+        asyncio.run(PipelineCarga(CrawlerFalso(), EscritorFalso(), processos=0, intervalo_relatorio=60,
+                                  incremental=incremental).executar(_links()))
+        escritor = EscritorFalso()
+        relatorio = asyncio.run(PipelineCarga(CrawlerFalso(), escritor, processos=0, intervalo_relatorio=60,
+                                              incremental=incremental).executar(_links()))
+        assert escritor.gravados == []
+        assert relatorio['ignorados']['html_identico'] == len(_links())
+    finally:
+        incremental.fechar()
+
+
+def test_incremental_nao_pula_livro_ausente_do_banco(tmp_path):
+    incremental = CacheIncremental(str(tmp_path / 'incremental.sqlite'))
+    try:
+        asyncio.run(PipelineCarga(CrawlerFalso(), EscritorFalso(), processos=0, intervalo_relatorio=60,
+                                  incremental=incremental).executar(_links()))
+
+        # Banco truncado depois da carga, exceto por 10 livros: o cache diz "igual", o banco não tem
+        gravados = set(_links()[:10])
+        escritor = EscritorFalso()
+        relatorio = asyncio.run(PipelineCarga(CrawlerFalso(), escritor, processos=0, intervalo_relatorio=60,
+                                              incremental=incremental, gravados=gravados).executar(_links()))
+        assert sorted(livro['link'] for livro in escritor.gravados) == sorted(_links()[10:])
+        assert relatorio['ignorados']['html_identico'] == 10
+    finally:
+        incremental.fechar()
+
+
+def test_enriquecimento_consome_os_pendentes_pela_fronteira(tmp_path):
+    fronteira = Fronteira(str(tmp_path / 'enriquecimento.sqlite'))
+    pendentes = _links()[:15]
+    try:
+        escritor = EscritorFalso()
+        relatorio = asyncio.run(PipelineCarga(CrawlerFalso(), escritor, processos=0, intervalo_relatorio=60,
+                                              fronteira=fronteira).executar_pendentes(pendentes))
+        assert sorted(livro['link'] for livro in escritor.gravados) == sorted(pendentes)
+        # Só páginas de livro: nenhuma listagem é buscada
+        assert relatorio['listagens'] == 0
+        assert relatorio['fronteira']['concluido'] == len(pendentes)
+
+        # Próxima execução: os gravados saíram dos pendentes, sobra só o que entrou depois
+        escritor = EscritorFalso()
+        asyncio.run(PipelineCarga(CrawlerFalso(), escritor, processos=0, intervalo_relatorio=60,
+                                  fronteira=fronteira).executar_pendentes(_links()[15:20]))
+        assert sorted(livro['link'] for livro in escritor.gravados) == sorted(_links()[15:20])
+        assert fronteira.contagem()['concluido'] == 5
+    finally:
+        fronteira.fechar()
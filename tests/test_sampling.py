@@ -0,0 +1,70 @@
+#SQL da amostragem/divisão treino-teste (texto e parâmetros; sem banco)
+import re
+import time
+
+import pytest
+
+from database.currency import currency_rates
+from ml.sampling import NO_SPLIT, SplitSpec, build_source_query
+
+
+@pytest.fixture(autouse=True)
+def cotacoes(monkeypatch):
+    monkeypatch.setattr(currency_rates, '_rates', {'EUR': 1.0, 'BRL': 6.35})
+    monkeypatch.setattr(currency_rates, '_checked_at', time.monotonic())
+
+
+def _normalizar(sql):
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+def _placeholders(sql):
+    return sql.count('%s')
+
+
+def test_sem_divisao():
+    sql, params = build_source_query(NO_SPLIT)
+    texto = _normalizar(sql)
+    assert params == ['0']
+    # O LIMIT fica para quem chama
+    assert _placeholders(sql) == len(params) + 1
+    assert texto.endswith('ORDER BY titulo, upc_livro LIMIT %s')
+    assert 'TABLESAMPLE' not in texto and 'split_hash <' not in texto
+    assert 'ROUND((valor_principal_em_euros * 6.35)::numeric, 2)::double precision AS valor_principal_em_reais' in texto
+    assert 'WHERE titulo IS NOT NULL AND categoria IS NOT NULL AND valor_principal_em_euros IS NOT NULL' in texto
+
+
+def test_treino_e_teste_sao_complementares():
+    treino, params_treino = build_source_query(SplitSpec(split='train', seed=7, fraction=0.7))
+    teste, params_teste = build_source_query(SplitSpec(split='test', seed=7, fraction=0.7))
+    assert 'WHERE split_hash < %s' in treino
+    assert 'WHERE split_hash >= %s' in teste
+    assert params_treino == params_teste == ['7', 0.7]
+    assert _normalizar(treino.replace('<', '>=')) == _normalizar(teste)
+
+
+def test_tablesample_com_parametros_na_ordem_do_sql():
+    sql, params = build_source_query(SplitSpec(split='train', seed=3, sample=10.0))
+    assert 'TABLESAMPLE BERNOULLI (%s) REPEATABLE (%s)' in sql
+    # seed do hash (no SELECT), depois percentual e seed do TABLESAMPLE, depois a fração
+    assert params == ['3', 10.0, 3, 0.8]
+    assert _placeholders(sql) == len(params) + 1
+
+
+def test_estratificado():
+    treino, params = build_source_query(SplitSpec(split='train', seed=1, fraction=0.8, stratify=True))
+    teste, _ = build_source_query(SplitSpec(split='test', seed=1, fraction=0.8, stratify=True))
+    texto = _normalizar(treino)
+    assert 'ROW_NUMBER() OVER (PARTITION BY stratum ORDER BY split_hash, upc_livro)' in texto
+    assert 'PERCENTILE_CONT(0.5)' in texto
+    assert 'WHERE stratum_rank <= ROUND(%s * stratum_size)' in texto
+    assert 'WHERE stratum_rank > ROUND(%s * stratum_size)' in teste
+    assert params == ['1', 0.8]
+    assert _placeholders(treino) == len(params) + 1
+
+
+def test_describe():
+    assert SplitSpec(split='test', fraction=0.75, stratify=True).describe() | {'assignment': None} == {
+        'split': 'test', 'seed': 0, 'train_fraction': 0.75, 'test_fraction': 0.25,
+        'stratify_by': 'target_popular', 'sample_percent': None, 'assignment': None,
+    }
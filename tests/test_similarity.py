@@ -0,0 +1,98 @@
+#Índice de similaridade: busca exaustiva e IVF contra força bruta, e a projeção dos títulos
+import numpy as np
+import pytest
+
+import ml.similarity as similarity
+from ml.similarity import VectorIndex, _fold_title_vectors, _normalize_rows
+from ml.text_features import CSRMatrix
+
+
+def _indice(vectors):
+    n = len(vectors)
+    upcs = np.array([f'{i:016x}' for i in range(n)])
+    return VectorIndex('v1', vectors, upcs, upcs, np.zeros(n, dtype=np.int32))
+
+
+def _forca_bruta(vectors, row, k):
+    scores = vectors @ vectors[row]
+    scores[row] = -np.inf
+    ordem = sorted(range(len(vectors)), key=lambda i: (-scores[i], i))[:k]
+    return [(i, float(scores[i])) for i in ordem]
+
+
+def _agrupados(n, dims=16, grupos=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centros = rng.normal(size=(grupos, dims))
+    vetores = centros[rng.integers(0, grupos, size=n)] + 0.3 * rng.normal(size=(n, dims))
+    return _normalize_rows(vetores.astype(np.float32))
+
+
+def test_busca_exaustiva_igual_a_forca_bruta():
+    vectors = _agrupados(500)
+    indice = _indice(vectors)
+    assert indice.centroids is None
+    for row in (0, 17, 499):
+        resultado = indice.search(row, k=10)
+        esperado = _forca_bruta(indice.vectors, row, 10)
+        assert [i for i, _ in resultado] == [i for i, _ in esperado]
+        np.testing.assert_allclose([s for _, s in resultado], [s for _, s in esperado], rtol=1e-6)
+        assert row not in [i for i, _ in resultado]
+
+
+def test_k_maior_que_o_indice():
+    indice = _indice(_agrupados(3))
+    assert len(indice.search(0, k=10)) == 2
+    assert _indice(_agrupados(1)).search(0) == []
+
+
+def test_ivf_com_todas_as_listas_e_exato(monkeypatch):
+    monkeypatch.setattr(similarity, 'IVF_MIN_ROWS', 100)
+    vectors = _agrupados(2000)
+    indice = _indice(vectors)
+    n_listas = len(indice.centroids)
+    assert n_listas == int(np.sqrt(2000))
+    # Cada vetor em exatamente uma lista
+    assert sorted(indice.list_members.tolist()) == list(range(2000))
+
+    for row in (3, 1000):
+        assert [i for i, _ in indice.search(row, k=10, nprobe=n_listas)] == \
+               [i for i, _ in _forca_bruta(indice.vectors, row, 10)]
+
+
+def test_ivf_recall_com_poucas_listas(monkeypatch):
+    monkeypatch.setattr(similarity, 'IVF_MIN_ROWS', 100)
+    vectors = _agrupados(3000)
+    indice = _indice(vectors)
+
+    acertos = 0
+    linhas = range(0, 3000, 100)
+    for row in linhas:
+        encontrados = {i for i, _ in indice.search(row, k=10, nprobe=8)}
+        acertos += len(encontrados & {i for i, _ in _forca_bruta(indice.vectors, row, 10)})
+    assert acertos / (10 * len(linhas)) >= 0.9
+
+
+def test_fold_title_vectors():
+    # Linha 0: colunas 1 e 5 (que caem juntas em dims=4); linha 1 vazia
+    matriz = CSRMatrix(np.array([0, 2, 2]), np.array([1, 5]), np.array([0.6, 0.8], dtype=np.float32), (2, 8))
+    denso = _fold_title_vectors(matriz, np.array([0, -1, 1, 0]), dims=4)
+    assert denso.shape == (4, 4)
+    np.testing.assert_allclose(denso[0], [0, 1, 0, 0])
+    np.testing.assert_array_equal(denso[1], 0)
+    np.testing.assert_array_equal(denso[2], 0)
+    np.testing.assert_array_equal(denso[3], denso[0])
+
+
+@pytest.mark.parametrize('dims', [3, 8])
+def test_fold_igual_a_dobrar_a_matriz_densa(dims):
+    rng = np.random.default_rng(1)
+    densa = (rng.random((6, 20)) < 0.3) * rng.random((6, 20)).astype(np.float32)
+    indptr = np.concatenate(([0], np.cumsum((densa != 0).sum(axis=1))))
+    linhas, colunas = np.nonzero(densa)
+    matriz = CSRMatrix(indptr, colunas, densa[linhas, colunas].astype(np.float32), densa.shape)
+
+    esperado = np.zeros((6, dims), dtype=np.float32)
+    for coluna in range(20):
+        esperado[:, coluna % dims] += densa[:, coluna]
+    np.testing.assert_allclose(_fold_title_vectors(matriz, np.arange(6), dims=dims), _normalize_rows(esperado),
+                               rtol=1e-5, atol=1e-6)
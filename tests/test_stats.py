@@ -0,0 +1,85 @@
+#Estatísticas de ML: SQL com GROUPING SETS e montagem do MLStats a partir das linhas, sem banco
+import pytest
+
+import ml.stats as stats
+from ml.dataset_version import dataset_version
+from ml.stats import MLStatsCache
+
+
+def _linha(categoria, total, buckets=(0, 0, 0), reviews=(0, 0, 0, 0, 0), faltando=(0, 0, 0, 0)):
+    linha = {'categoria_key': categoria, 'is_total': categoria == '__total__', 'total_books': total}
+    if linha['is_total']:
+        linha['categoria_key'] = None
+    linha.update(zip(('bucket_budget', 'bucket_mid', 'bucket_premium'), buckets))
+    linha.update(zip((f'review_{codigo}' for codigo in range(1, 6)), reviews))
+    linha.update(zip(('missing_titles', 'missing_categories', 'missing_prices', 'missing_reviews'), faltando))
+    return linha
+
+
+class BancoFalso:
+    def __init__(self, linhas):
+        self.linhas = linhas
+        self.consultas = []
+
+    def cursor(self, cursor_factory=None):
+        return self
+
+    def execute(self, sql):
+        self.consultas.append(sql)
+
+    def fetchall(self):
+        return self.linhas
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    categorias = [_linha(f'Cat {i:02d}', 20 - i, buckets=(20 - i, 0, 0)) for i in range(12)]
+    linhas = categorias + [
+        # Livros sem categoria formam um grupo próprio, que não entra nas distribuições
+        _linha(None, 3, faltando=(0, 3, 0, 0)),
+        _linha('__total__', 177, buckets=(150, 20, 4), reviews=(10, 20, 30, 40, 77), faltando=(1, 3, 3, 2)),
+    ]
+    banco = BancoFalso(linhas)
+    monkeypatch.setattr(stats, 'get_connection', lambda: banco)
+    return banco
+
+
+def test_sql_agrupa_numa_leitura():
+    sql = ' '.join(MLStatsCache()._sql().split())
+    assert 'GROUP BY GROUPING SETS ((categoria_key), ())' in sql
+    assert sql.count('FROM livros') == 1
+    for bucket in ('budget', 'mid', 'premium'):
+        assert f"COUNT(*) FILTER (WHERE price_category = '{bucket}') AS bucket_{bucket}" in sql
+    assert "COUNT(*) FILTER (WHERE review = 'Five') AS review_5" in sql
+
+
+def test_monta_estatisticas(banco):
+    resultado = MLStatsCache()._compute('v9')
+    assert resultado.dataset_version == 'v9'
+    assert resultado.total_books == 177
+    assert resultado.total_categories == 12
+    assert resultado.price_distribution == {'budget': 150, 'mid': 20, 'premium': 4}
+    assert resultado.review_distribution == {'1': 10, '2': 20, '3': 30, '4': 40, '5': 77}
+    assert resultado.missing_values == {'titles': 1, 'categories': 3, 'prices': 3, 'reviews': 2}
+
+    # Top 10 por quantidade de livros; o detalhamento traz todas as categorias
+    assert list(resultado.category_distribution) == [f'Cat {i:02d}' for i in range(10)]
+    assert len(resultado.category_breakdown) == 12
+    assert resultado.category_breakdown['Cat 11'].price_distribution == {'budget': 9, 'mid': 0, 'premium': 0}
+
+
+def test_recalcula_so_quando_a_versao_muda(banco, monkeypatch):
+    versao = {'atual': 'v1'}
+    monkeypatch.setattr(dataset_version, 'current', lambda: versao['atual'])
+    cache = MLStatsCache()
+
+    primeiro = cache.get()
+    assert cache.get() is primeiro
+    assert len(banco.consultas) == 1
+
+    versao['atual'] = 'v2'
+    assert cache.get().dataset_version == 'v2'
+    assert len(banco.consultas) == 2
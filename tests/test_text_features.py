@@ -0,0 +1,88 @@
+#Vetores hashed de n-grams e limpeza do cache em disco (ml/text_features.py)
+import os
+import time
+
+import numpy as np
+import pytest
+
+from ml import text_features
+from ml.text_features import TEXT_FIELDS, TextFeatureSet, TextFeatureStore, _ngrams, hash_vectorize
+
+TEXTOS = [None, '', 'A Light in the Attic', 'Tipping the Velvet', 'a light in the attic', 'Soumission']
+
+
+def _linha(matriz, linha):
+    inicio, fim = matriz.indptr[linha], matriz.indptr[linha + 1]
+    return matriz.indices[inicio:fim], matriz.data[inicio:fim]
+
+
+@pytest.mark.parametrize('campo', list(TEXT_FIELDS))
+def test_lote_igual_a_linha_por_linha(campo):
+    config = TEXT_FIELDS[campo]
+    lote = hash_vectorize(TEXTOS, batch_rows=4, **config)
+    assert lote.shape == (len(TEXTOS), config['n_features'])
+
+    for i, texto in enumerate(TEXTOS):
+        colunas, valores = _linha(lote, i)
+        sozinho = hash_vectorize([texto], **config)
+        np.testing.assert_array_equal(colunas, sozinho.indices)
+        np.testing.assert_allclose(valores, sozinho.data, rtol=1e-6)
+        assert list(colunas) == sorted(set(colunas))
+        if len(valores):
+            assert np.dot(valores, valores) == pytest.approx(1.0, rel=1e-5)
+
+
+def test_textos_vazios_e_maiusculas():
+    matriz = hash_vectorize(TEXTOS, **TEXT_FIELDS['titulo'])
+    assert matriz.indptr[0] == matriz.indptr[1] == matriz.indptr[2] == 0
+    # O analisador de caracteres ignora maiúsculas
+    np.testing.assert_array_equal(_linha(matriz, 2)[0], _linha(matriz, 4)[0])
+    assert hash_vectorize([], **TEXT_FIELDS['titulo']).indptr.tolist() == [0]
+
+
+def test_ngrams_de_palavras():
+    assert _ngrams('The black MARIA', 'word', (1, 2)) == ['the', 'black', 'maria', 'the black', 'black maria']
+
+
+def _gravar(store, versao, idade=0):
+    caminho = store._cache_path(versao)
+    conjunto = TextFeatureSet(versao, np.array(['u1']),
+                              {campo: hash_vectorize(['abc'], **config) for campo, config in TEXT_FIELDS.items()})
+    conjunto.save(caminho)
+    antigo = time.time() - idade
+    os.utime(caminho, (antigo, antigo))
+    return caminho
+
+
+def test_limpeza_so_remove_versoes_antigas(tmp_path, monkeypatch):
+    monkeypatch.setattr(text_features, 'TEXT_CACHE_MAX_IDLE_SECONDS', 60)
+    store = TextFeatureStore(str(tmp_path))
+    for versao in ('v3', 'v5', 'v7'):
+        _gravar(store, versao)
+    _gravar(store, '10-abc', idade=600)
+    _gravar(store, '12-def')
+
+    # Um worker ainda na v5 não pode apagar a v7 que outro está servindo
+    store._evict('v5')
+    assert sorted(os.listdir(tmp_path)) == [f'text_features_{v}.npz' for v in ('12-def', 'v5', 'v7')]
+
+    store._evict('v7')
+    assert sorted(os.listdir(tmp_path)) == [f'text_features_{v}.npz' for v in ('12-def', 'v7')]
+
+
+def test_get_usa_o_cache_e_limpa_depois_de_gravar(tmp_path, monkeypatch):
+    store = TextFeatureStore(str(tmp_path))
+    _gravar(store, 'v1')
+    construidas = []
+
+    def construir(versao):
+        construidas.append(versao)
+        return TextFeatureSet(versao, np.array(['u2']),
+                              {campo: hash_vectorize(['xyz'], **config) for campo, config in TEXT_FIELDS.items()})
+    monkeypatch.setattr(store, '_build', construir)
+
+    assert store.get('v1').upcs.tolist() == ['u1']
+    assert store.get('v2').upcs.tolist() == ['u2']
+    assert construidas == ['v2']
+    assert os.listdir(tmp_path) == ['text_features_v2.npz']
+    assert TextFeatureStore(str(tmp_path)).get('v2').upcs.tolist() == ['u2']
@@ -0,0 +1,106 @@
+#Vocabulário persistido das categóricas, com uma conexão falsa que imita a tabela ml_vocabulary
+import pytest
+
+import ml.vocabulary as vocabulary
+from ml.vocabulary import STATIC_VOCABULARIES, VocabularySnapshot, VocabularyStore
+
+
+class CursorFalso:
+    def __init__(self, banco):
+        self.banco = banco
+        self.resultado = []
+
+    def execute(self, sql, params=None):
+        sql = ' '.join(sql.split())
+        if sql.startswith('SELECT field, token, code, version FROM ml_vocabulary'):
+            versao = params[0]
+            self.resultado = sorted(linha for linha in self.banco.linhas if versao is None or linha[3] <= versao)
+        elif sql.startswith('INSERT INTO ml_vocabulary'):
+            field, token, code, _ = params
+            # PRIMARY KEY (field, token) e UNIQUE (field, code)
+            assert not any(l[:2] == (field, token) or (l[0], l[2]) == (field, code) for l in self.banco.linhas)
+            self.banco.linhas.append(params)
+        elif sql.startswith('SELECT DISTINCT categoria FROM livros'):
+            self.resultado = [(categoria,) for categoria in self.banco.categorias]
+        elif sql.startswith('SELECT pg_advisory_xact_lock'):
+            self.banco.locks += 1
+        else:
+            assert sql.startswith('CREATE TABLE IF NOT EXISTS ml_vocabulary'), sql
+
+    def fetchall(self):
+        return self.resultado
+
+
+class BancoFalso:
+    def __init__(self, categorias):
+        self.linhas = []
+        self.categorias = categorias
+        self.locks = 0
+
+    def cursor(self):
+        return CursorFalso(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    banco = BancoFalso(['Poetry', 'History', ''])
+    monkeypatch.setattr(vocabulary, 'get_connection', lambda: banco)
+    return banco
+
+
+def test_snapshot_imutavel():
+    snapshot = VocabularySnapshot(3, {'categoria': {'Poetry': 0}})
+    assert snapshot.encode('categoria', 'Poetry') == 0
+    assert snapshot.encode('categoria', 'Travel', default=-1) == -1
+    assert snapshot.missing('categoria', ['Poetry', 'Travel', None, '']) == {'Travel'}
+    assert snapshot.sizes() == {'categoria': 1}
+    with pytest.raises(TypeError):
+        snapshot.mappings['categoria']['Travel'] = 1
+
+
+def test_primeira_carga_cria_a_versao_1(banco):
+    snapshot = VocabularyStore().current()
+    assert snapshot.version == 1
+    assert snapshot.as_dict() == {
+        'categoria': {'History': 0, 'Poetry': 1},
+        **STATIC_VOCABULARIES,
+    }
+
+
+def test_novos_tokens_ganham_versao_sem_mudar_os_codigos(banco):
+    store = VocabularyStore()
+    v1 = store.current()
+    v2 = store.ensure('categoria', ['Poetry', 'Art'])
+    assert v2.version == 2
+    assert v2.mappings['categoria'] == {'History': 0, 'Poetry': 1, 'Art': 2}
+
+    # Token já conhecido não vai ao banco
+    locks = banco.locks
+    assert store.ensure('categoria', ['Art', None]) is v2
+    assert banco.locks == locks
+
+    # A versão antiga continua legível como era
+    assert store.get_version(1).as_dict() == v1.as_dict()
+    assert store.get_version(2) is v2
+
+
+def test_outro_worker_reaproveita_tokens_ja_inseridos(banco):
+    primeiro, segundo = VocabularyStore(), VocabularyStore()
+    primeiro.current()
+    segundo.current()
+    primeiro.ensure('categoria', ['Art'])
+
+    # O segundo ainda não viu 'Art': relê dentro do lock e não insere de novo
+    snapshot = segundo.ensure('categoria', ['Art'])
+    assert snapshot.version == 2
+    assert snapshot.encode('categoria', 'Art') == 2
+    assert sum(1 for linha in banco.linhas if linha[1] == 'Art') == 1